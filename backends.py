@@ -0,0 +1,583 @@
+"""
+Motores de base de datos.
+
+La app habla T-SQL por pyodbc contra SQL Server. Para poder correrla (y
+medirla) en una notebook sin SQL Server hay un segundo motor, SQLite en
+proceso, que se elige con config.BACKEND:
+
+    VENTAS_BACKEND=sqlite VENTAS_SQLITE=ventas.db python ventas_app.py
+
+- SqlServer: el de siempre (pyodbc, pool, esquema de config.ensure_schema).
+- Sqlite: ConexionSqlite imita lo que los repos usan de pyodbc (cursor,
+  execute con '?', fetch*, description, rowcount, autocommit, timeout,
+  commit/rollback) y traduce cada sentencia al dialecto de SQLite: dbo.,
+  TOP, OUTPUT INSERTED, hints de bloqueo, (VALUES ...) v(cols),
+  DATEADD/DATEDIFF, ISNULL, LEFT, etc. La traducción se cachea por texto.
+  Lo que no tiene traducción mecánica (MERGE, ROWVERSION) se resuelve con
+  una rama por dialecto en repos.py; ver es_sqlite().
+
+El esquema SQLite equivale al de config.ensure_schema, más IngresosStock
+e HistorialPrecios, que IngresoStockRepo necesita.
+"""
+import re
+import sqlite3
+import threading
+from collections import deque
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from functools import lru_cache
+from typing import Optional, Tuple
+
+import config
+
+
+class Motor:
+    """Lo que config necesita de cada base: conectar, crear el esquema y leer el catálogo."""
+    nombre = ""
+    # (esquema, tabla, columna) de cada tabla, para config.SchemaCache
+    sql_catalogo = ""
+
+    def conectar(self, database: str):
+        raise NotImplementedError
+
+    def crear_base(self):
+        """Crea la base si hace falta (antes de pedir conexiones del pool)."""
+
+    def crear_esquema(self, conn) -> bool:
+        """Crea tablas e índices. Devuelve True si creó los resúmenes (hay que reconstruirlos)."""
+        raise NotImplementedError
+
+
+class SqlServer(Motor):
+    nombre = "sqlserver"
+    sql_catalogo = """
+        SELECT s.name, t.name, c.name
+          FROM sys.tables t
+          JOIN sys.schemas s ON s.schema_id = t.schema_id
+          LEFT JOIN sys.columns c ON c.object_id = t.object_id
+    """
+
+    def conectar(self, database: str):
+        if config.pyodbc is None:
+            raise RuntimeError("Falta pyodbc para conectar a SQL Server "
+                               "(pip install pyodbc, o VENTAS_BACKEND=sqlite para trabajar local).")
+        return config._connect(database)
+
+    def crear_base(self):
+        config._ensure_database()
+
+    def crear_esquema(self, conn) -> bool:
+        config._ensure_core_tables(conn)
+        config._ensure_indices_listado(conn)
+        config._ensure_usuario_venta(conn)
+        config._ensure_rowversion(conn)
+        config._ensure_idempotencia(conn)
+        config._ensure_optional_tables(conn)
+        resumen_nuevo = config._ensure_summary_tables(conn)
+        config._ensure_ticket_archive(conn)
+        config._ensure_default_admin(conn)
+        return resumen_nuevo
+
+
+# ---------------- SQLite ----------------
+
+_ESQUEMA_SQLITE = """
+CREATE TABLE IF NOT EXISTS Empresa(
+    EmpresaID     INTEGER PRIMARY KEY AUTOINCREMENT,
+    Nombre        NVARCHAR(160) NOT NULL,
+    CUIT          NVARCHAR(20)  NULL,
+    CondicionIVA  NVARCHAR(40)  NULL,
+    Direccion     NVARCHAR(200) NULL,
+    Telefono      NVARCHAR(60)  NULL,
+    Email         NVARCHAR(120) NULL,
+    LogoPath      NVARCHAR(260) NULL,
+    ActualizadoEn DATETIME2 NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+INSERT INTO Empresa(Nombre, CUIT, CondicionIVA, Direccion, Telefono, Email)
+SELECT 'Tu Empresa', '00-00000000-0', 'Responsable Inscripto', 'Dirección', 'Teléfono', 'correo@dominio.com'
+ WHERE NOT EXISTS (SELECT 1 FROM Empresa);
+
+CREATE TABLE IF NOT EXISTS Productos(
+    ProductoID   INTEGER PRIMARY KEY AUTOINCREMENT,
+    Nombre       NVARCHAR(120) NOT NULL,
+    Precio       DECIMAL(18,2) NOT NULL DEFAULT 0,
+    Stock        INT           NOT NULL DEFAULT 0,
+    Activo       BIT           NOT NULL DEFAULT 1,
+    CodigoBarras NVARCHAR(32)  NULL,
+    RowVer       BIGINT        NOT NULL DEFAULT 0
+);
+CREATE UNIQUE INDEX IF NOT EXISTS UX_Productos_CodigoBarras ON Productos(CodigoBarras) WHERE CodigoBarras IS NOT NULL;
+CREATE INDEX IF NOT EXISTS IX_Productos_RowVer ON Productos(RowVer);
+
+-- RowVer: un contador global por base, como ROWVERSION en SQL Server
+CREATE TABLE IF NOT EXISTS RowVerSeq(Valor BIGINT NOT NULL);
+INSERT INTO RowVerSeq(Valor) SELECT 0 WHERE NOT EXISTS (SELECT 1 FROM RowVerSeq);
+CREATE TRIGGER IF NOT EXISTS TR_Productos_RowVer_Ins AFTER INSERT ON Productos
+BEGIN
+    UPDATE RowVerSeq SET Valor = Valor + 1;
+    UPDATE Productos SET RowVer = (SELECT Valor FROM RowVerSeq) WHERE ProductoID = NEW.ProductoID;
+END;
+CREATE TRIGGER IF NOT EXISTS TR_Productos_RowVer_Upd
+AFTER UPDATE OF Nombre, Precio, Stock, Activo, CodigoBarras ON Productos
+BEGIN
+    UPDATE RowVerSeq SET Valor = Valor + 1;
+    UPDATE Productos SET RowVer = (SELECT Valor FROM RowVerSeq) WHERE ProductoID = NEW.ProductoID;
+END;
+
+CREATE TABLE IF NOT EXISTS Clientes(
+    ClienteID INTEGER PRIMARY KEY AUTOINCREMENT,
+    Nombre    NVARCHAR(120) NOT NULL,
+    Email     NVARCHAR(200) NULL,
+    Telefono  NVARCHAR(50)  NULL,
+    Activo    BIT NOT NULL DEFAULT 1
+);
+
+CREATE TABLE IF NOT EXISTS Ventas(
+    VentaID      INTEGER PRIMARY KEY AUTOINCREMENT,
+    ClienteID    INT NULL REFERENCES Clientes(ClienteID),
+    Fecha        DATETIME2 NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now')),   -- UTC, como SYSUTCDATETIME()
+    Total        DECIMAL(18,2) NOT NULL DEFAULT 0,
+    MetodoPago   NVARCHAR(30) NULL,
+    Entregado    DECIMAL(18,2) NULL,
+    Vuelto       DECIMAL(18,2) NULL,
+    DescuentoPct DECIMAL(5,2) NULL DEFAULT 0,
+    RecargoPct   DECIMAL(5,2) NULL DEFAULT 0,
+    UsuarioID    INT NULL,
+    ClaveIdem    VARCHAR(64) NULL
+);
+CREATE INDEX IF NOT EXISTS IX_Ventas_Fecha ON Ventas(Fecha DESC);
+CREATE INDEX IF NOT EXISTS IX_Ventas_Fecha_Metodo ON Ventas(Fecha, MetodoPago);
+CREATE INDEX IF NOT EXISTS IX_Ventas_Cliente_Fecha ON Ventas(ClienteID, Fecha DESC);
+CREATE INDEX IF NOT EXISTS IX_Ventas_Total ON Ventas(Total DESC);
+CREATE UNIQUE INDEX IF NOT EXISTS UX_Ventas_ClaveIdem ON Ventas(ClaveIdem) WHERE ClaveIdem IS NOT NULL;
+
+CREATE TABLE IF NOT EXISTS VentaDetalle(
+    DetalleID      INTEGER PRIMARY KEY AUTOINCREMENT,
+    VentaID        INT NOT NULL REFERENCES Ventas(VentaID),
+    ProductoID     INT NOT NULL REFERENCES Productos(ProductoID),
+    Cantidad       DECIMAL(18,3) NOT NULL,
+    PrecioUnitario DECIMAL(18,2) NOT NULL CHECK (PrecioUnitario >= 0)
+);
+
+CREATE TABLE IF NOT EXISTS Usuarios(
+    UsuarioID    INTEGER PRIMARY KEY AUTOINCREMENT,
+    Numero       NVARCHAR(50) NOT NULL UNIQUE,
+    Nombre       NVARCHAR(120) NULL,
+    Rol          NVARCHAR(20) NOT NULL DEFAULT 'Vendedor',
+    Hash         BLOB NOT NULL,
+    Salt         BLOB NOT NULL,
+    ForzarCambio BIT NOT NULL DEFAULT 0,
+    Activo       BIT NOT NULL DEFAULT 1,
+    CreadoEn     DATETIME2 NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS IngresosStock(
+    IngresoID     INTEGER PRIMARY KEY AUTOINCREMENT,
+    Fecha         DATETIME2 NOT NULL DEFAULT (datetime('now', 'localtime')),
+    UsuarioID     INT NULL,
+    ProductoID    INT NOT NULL REFERENCES Productos(ProductoID),
+    Cantidad      DECIMAL(18,3) NOT NULL,
+    CostoUnitario DECIMAL(18,2) NOT NULL,
+    PrecioVenta   DECIMAL(18,2) NOT NULL
+);
+CREATE TABLE IF NOT EXISTS HistorialPrecios(
+    HistID      INTEGER PRIMARY KEY AUTOINCREMENT,
+    ProductoID  INT NOT NULL REFERENCES Productos(ProductoID),
+    FechaHora   DATETIME2 NOT NULL,
+    CostoUnit   DECIMAL(18,2) NULL,
+    PrecioVenta DECIMAL(18,2) NOT NULL
+);
+CREATE INDEX IF NOT EXISTS IX_HistorialPrecios_Producto ON HistorialPrecios(ProductoID, HistID DESC);
+
+CREATE TABLE IF NOT EXISTS ResumenVentasHora(
+    Hora       DATETIME2     NOT NULL,
+    Medio      NVARCHAR(30)  NOT NULL,
+    UsuarioID  INT           NOT NULL,
+    Ventas     INT           NOT NULL,
+    Total      DECIMAL(18,2) NOT NULL,
+    PRIMARY KEY (Hora, Medio, UsuarioID)
+);
+CREATE TABLE IF NOT EXISTS ResumenProductoDia(
+    Dia        DATE          NOT NULL,
+    ProductoID INT           NOT NULL,
+    Cantidad   DECIMAL(18,3) NOT NULL,
+    Importe    DECIMAL(18,2) NOT NULL,
+    PRIMARY KEY (Dia, ProductoID)
+);
+
+CREATE TABLE IF NOT EXISTS TicketArchivo(
+    TicketArchivoID INTEGER PRIMARY KEY AUTOINCREMENT,
+    VentaID         INT      NOT NULL,
+    Sha256          CHAR(64) NOT NULL,
+    Bytes           INT      NOT NULL,
+    CreadoEn        DATETIME2 NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS IX_TicketArchivo_Venta ON TicketArchivo(VentaID, TicketArchivoID DESC);
+
+CREATE TABLE IF NOT EXISTS CierresCaja(
+    CierreID     INTEGER PRIMARY KEY AUTOINCREMENT,
+    Desde        DATETIME2 NOT NULL,
+    Hasta        DATETIME2 NOT NULL,
+    Apertura     DECIMAL(18,2) NOT NULL DEFAULT 0,
+    VentasEfvo   DECIMAL(18,2) NOT NULL DEFAULT 0,
+    VentasTarj   DECIMAL(18,2) NOT NULL DEFAULT 0,
+    VentasTrans  DECIMAL(18,2) NOT NULL DEFAULT 0,
+    IngresosExt  DECIMAL(18,2) NOT NULL DEFAULT 0,
+    Egresos      DECIMAL(18,2) NOT NULL DEFAULT 0,
+    Esperado     DECIMAL(18,2) NOT NULL DEFAULT 0,
+    Contado      DECIMAL(18,2) NOT NULL DEFAULT 0,
+    Diferencia   DECIMAL(18,2) NOT NULL DEFAULT 0,
+    Usuario      NVARCHAR(64) NULL,
+    Observacion  TEXT NULL,
+    CreadoEn     DATETIME2 NOT NULL DEFAULT (datetime('now', 'localtime'))
+);
+CREATE INDEX IF NOT EXISTS IX_CierresCaja_Periodo ON CierresCaja(Desde, Hasta);
+"""
+
+
+def _conv_fecha_hora(b: bytes):
+    s = b.decode()
+    try:
+        return datetime.fromisoformat(s)
+    except ValueError:
+        return s
+
+def _conv_fecha(b: bytes):
+    s = b.decode()
+    try:
+        return date.fromisoformat(s[:10])
+    except ValueError:
+        return s
+
+# columnas DATETIME2/DATE vuelven como datetime/date, igual que con pyodbc
+sqlite3.register_converter("DATETIME2", _conv_fecha_hora)
+sqlite3.register_converter("DATETIME", _conv_fecha_hora)
+sqlite3.register_converter("DATE", _conv_fecha)
+
+
+def _param(v):
+    """Parámetros que sqlite3 no adapta solo (o adapta distinto que SQL Server)."""
+    if isinstance(v, datetime):
+        return v.isoformat(" ")
+    if isinstance(v, date):
+        return v.isoformat()
+    if isinstance(v, Decimal):
+        return float(v)
+    return v
+
+
+# ---- funciones T-SQL que se registran en cada conexión ----
+_BASE_TSQL = datetime(1900, 1, 1)     # la fecha 0 de SQL Server
+
+def _a_fecha(v) -> Optional[datetime]:
+    if v is None:
+        return None
+    if isinstance(v, (int, float)):
+        return _BASE_TSQL + timedelta(days=v)
+    return datetime.fromisoformat(str(v))
+
+_PARTES = {"second": 1, "ss": 1, "minute": 60, "mi": 60, "hour": 3600, "hh": 3600, "day": 86400, "dd": 86400}
+
+def _dateadd(parte: str, n, v):
+    d = _a_fecha(v)
+    if d is None or n is None:
+        return None
+    return (d + timedelta(seconds=_PARTES[parte.lower()] * int(n))).isoformat(" ")
+
+def _datediff(parte: str, a, b):
+    """Cantidad de límites de `parte` cruzados entre a y b (como DATEDIFF)."""
+    da, db = _a_fecha(a), _a_fecha(b)
+    if da is None or db is None:
+        return None
+    seg = _PARTES[parte.lower()]
+    ea = int((da - _BASE_TSQL).total_seconds()) // seg
+    eb = int((db - _BASE_TSQL).total_seconds()) // seg
+    return eb - ea
+
+def _registrar_funciones(raw: sqlite3.Connection):
+    raw.create_function("LEN", 1, lambda s: None if s is None else len(str(s).rstrip()), deterministic=True)
+    raw.create_function("tsql_left", 2, lambda s, n: None if s is None else str(s)[:int(n)], deterministic=True)
+    raw.create_function("DATEADD", 3, _dateadd, deterministic=True)
+    raw.create_function("DATEDIFF", 3, _datediff, deterministic=True)
+    raw.create_function("SYSUTCDATETIME", 0, lambda: datetime.utcnow().isoformat(" "))
+    raw.create_function("GETUTCDATE", 0, lambda: datetime.utcnow().isoformat(" "))
+    raw.create_function("SYSDATETIME", 0, lambda: datetime.now().isoformat(" "))
+    raw.create_function("GETDATE", 0, lambda: datetime.now().isoformat(" "))
+
+
+# ---- traducción T-SQL -> SQLite ----
+_HINT = r"(?:ROWLOCK|UPDLOCK|HOLDLOCK|NOLOCK|READPAST|XLOCK|TABLOCKX?|PAGLOCK|SERIALIZABLE|READCOMMITTED)"
+_RE_HINTS = re.compile(rf"\s+WITH\s*\(\s*{_HINT}(?:\s*,\s*{_HINT})*\s*\)", re.I)
+_RE_BLOQUEO = re.compile(r"\b(?:UPDLOCK|XLOCK|HOLDLOCK|TABLOCKX)\b", re.I)
+_RE_DBO = re.compile(r"\bdbo\.", re.I)
+_RE_TOP = re.compile(r"^(\s*SELECT\s+(?:DISTINCT\s+)?)TOP\s*(?:\(\s*(\d+|\?)\s*\)|(\d+))\s*", re.I)
+_RE_OUTPUT = re.compile(r"\s+OUTPUT\s+(INSERTED\.\w+(?:\s*,\s*INSERTED\.\w+)*)", re.I)
+_RE_OFFSET = re.compile(r"\bOFFSET\s+(\?|\d+)\s+ROWS\s+FETCH\s+(?:NEXT|FIRST)\s+(\?|\d+)\s+ROWS\s+ONLY", re.I)
+_RE_VALUES = re.compile(
+    r"\(\s*VALUES\s+((?:\([^()]*\)\s*,\s*)*\([^()]*\))\s*\)\s*(?:AS\s+)?(\w+)\s*\(\s*(\w+(?:\s*,\s*\w+)*)\s*\)",
+    re.I)
+_RE_DATEPART = re.compile(r"\b(DATEADD|DATEDIFF)\s*\(\s*(\w+)\s*,", re.I)
+_RE_CAST_DATE = re.compile(r"\bCAST\(\s*([\w.]+)\s+AS\s+DATE\s*\)", re.I)
+_RE_CAST_DT = re.compile(r"\bAS\s+DATETIME2?\s*(?:\(\s*\d\s*\))?\s*\)", re.I)
+_RE_LEFT = re.compile(r"\bLEFT\s*\(", re.I)
+_RE_ISNULL = re.compile(r"\bISNULL\s*\(", re.I)      # en SQLite ISNULL es un operador
+_RE_NSTR = re.compile(r"(?<=[\s(,=])N'")
+_RE_SIN_TRADUCCION = re.compile(r"^\s*(MERGE|IF|BEGIN|DECLARE|EXEC)\b|\bsys\.\w+|\bOBJECT_ID\s*\(|\bCOL_LENGTH\s*\(", re.I)
+_RE_ESCRIBE = re.compile(r"^\s*(INSERT|UPDATE|DELETE|REPLACE|WITH|CREATE|ALTER|DROP)\b", re.I)
+
+
+def _valores_con_alias(m: "re.Match") -> str:
+    # SQLite no acepta (VALUES ...) AS v(a, b): las columnas se llaman column1, column2...
+    cols = [c.strip() for c in m.group(3).split(",")]
+    sel = ", ".join(f"column{i} AS {c}" for i, c in enumerate(cols, 1))
+    return f"(SELECT {sel} FROM (VALUES {m.group(1)})) AS {m.group(2)}"
+
+
+@lru_cache(maxsize=1024)
+def traducir(sql: str) -> Tuple[str, bool, bool, bool]:
+    """
+    T-SQL -> SQLite. Devuelve (sql, escribe, devuelve_filas, top_param):
+    `escribe` si la sentencia modifica o pide bloqueo (abre la transacción con
+    BEGIN IMMEDIATE), `devuelve_filas` si tenía OUTPUT INSERTED (ahora
+    RETURNING), `top_param` si era TOP (?) (ahora LIMIT ? al final).
+    """
+    m = _RE_SIN_TRADUCCION.search(sql)
+    if m:
+        raise sqlite3.NotSupportedError(
+            f"T-SQL sin traducción a SQLite ({m.group(0).strip()}); hace falta una rama por dialecto")
+    bloquea = bool(_RE_BLOQUEO.search(sql))
+    s = sql.strip().rstrip(";")
+    s = _RE_HINTS.sub("", s)
+    s = _RE_DBO.sub("", s)
+    s = _RE_NSTR.sub("'", s)
+
+    limite = None
+    m = _RE_TOP.match(s)
+    if m:
+        limite = m.group(2) or m.group(3)
+        s = m.group(1) + s[m.end():]
+    retorno = None
+    m = _RE_OUTPUT.search(s)
+    if m:
+        retorno = ", ".join(c.strip().split(".", 1)[1] for c in m.group(1).split(","))
+        s = s[:m.start()] + s[m.end():]
+    s = _RE_OFFSET.sub(r"LIMIT \1, \2", s)
+    s = _RE_VALUES.sub(_valores_con_alias, s)
+    s = _RE_DATEPART.sub(r"\1('\2',", s)
+    s = _RE_CAST_DATE.sub(r"date(\1)", s)
+    s = _RE_CAST_DT.sub("AS TEXT)", s)
+    s = _RE_LEFT.sub("tsql_left(", s)
+    s = _RE_ISNULL.sub("IFNULL(", s)
+    if limite is not None:
+        s += f" LIMIT {limite}"
+    if retorno is not None:
+        s += f" RETURNING {retorno}"
+    # TOP (?) pasa a LIMIT ? al final: el cursor mueve ese primer parámetro al último lugar
+    return s, bloquea or bool(_RE_ESCRIBE.match(s)), retorno is not None, limite == "?"
+
+
+class CursorSqlite:
+    """Cursor con la interfaz de pyodbc.Cursor que usa la app."""
+    def __init__(self, con: "ConexionSqlite"):
+        self._con = con
+        self._cur = con._raw.cursor()
+        self._filas: Optional[deque] = None     # resultado de RETURNING, ya leído
+        self.fast_executemany = False           # sin efecto: executemany ya es en proceso
+
+    def execute(self, sql: str, *params):
+        if len(params) == 1 and isinstance(params[0], (list, tuple)):
+            params = params[0]
+        texto, escribe, devuelve, rotar = traducir(sql)
+        if rotar:
+            params = tuple(params[1:]) + (params[0],)
+        if escribe:
+            self._con._empezar()
+        self._filas = None
+        self._cur.execute(texto, [_param(p) for p in params])
+        if devuelve:
+            # un INSERT ... RETURNING sin terminar de leer no deja hacer COMMIT
+            self._filas = deque(self._cur.fetchall())
+        return self
+
+    def executemany(self, sql: str, seq_params):
+        texto, escribe, _, _ = traducir(sql)
+        if escribe:
+            self._con._empezar()
+        self._filas = None
+        self._cur.executemany(texto, ([_param(p) for p in fila] for fila in seq_params))
+        return self
+
+    def fetchone(self):
+        if self._filas is not None:
+            return self._filas.popleft() if self._filas else None
+        return self._cur.fetchone()
+
+    def fetchall(self):
+        if self._filas is not None:
+            filas, self._filas = list(self._filas), deque()
+            return filas
+        return self._cur.fetchall()
+
+    def fetchmany(self, n: int = 1):
+        if self._filas is not None:
+            return [self._filas.popleft() for _ in range(min(n, len(self._filas)))]
+        return self._cur.fetchmany(n)
+
+    @property
+    def description(self):
+        return self._cur.description
+
+    @property
+    def rowcount(self) -> int:
+        return self._cur.rowcount
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def close(self):
+        self._cur.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # como pyodbc: al salir sin error se confirma lo pendiente
+        if exc_type is None and not self._con.autocommit:
+            self._con.commit()
+        self.close()
+        return False
+
+
+class ConexionSqlite:
+    """
+    Conexión SQLite con la interfaz de pyodbc.Connection que usa la app.
+    Con autocommit=False (el default de pyodbc) la transacción empieza en la
+    primera sentencia que escribe o bloquea; las lecturas sueltas ven lo
+    confirmado, como READ COMMITTED.
+    """
+    def __init__(self, path: str, espera: float = 5.0):
+        uri = path.startswith("file:")
+        if path == ":memory:":
+            # compartida entre las conexiones del pool mientras quede alguna abierta
+            path, uri = "file:ventas_memoria?mode=memory&cache=shared", True
+        self._raw = sqlite3.connect(path, timeout=espera, isolation_level=None, uri=uri,
+                                    check_same_thread=False, detect_types=sqlite3.PARSE_DECLTYPES)
+        self._espera = espera
+        self._autocommit = False
+        self._timeout = 0
+        self._raw.execute("PRAGMA foreign_keys=ON")
+        if "mode=memory" not in path:
+            self._raw.execute("PRAGMA journal_mode=WAL")
+            self._raw.execute("PRAGMA synchronous=NORMAL")
+        _registrar_funciones(self._raw)
+
+    def _empezar(self):
+        if not self._autocommit and not self._raw.in_transaction:
+            self._raw.execute("BEGIN IMMEDIATE")
+
+    @property
+    def autocommit(self) -> bool:
+        return self._autocommit
+
+    @autocommit.setter
+    def autocommit(self, valor: bool):
+        if valor and self._raw.in_transaction:
+            self._raw.execute("COMMIT")
+        self._autocommit = bool(valor)
+
+    @property
+    def timeout(self) -> int:
+        return self._timeout
+
+    @timeout.setter
+    def timeout(self, segundos: int):
+        # lo más parecido al timeout de consulta: cuánto esperar un bloqueo
+        self._timeout = int(segundos or 0)
+        ms = int((self._timeout or self._espera) * 1000)
+        self._raw.execute(f"PRAGMA busy_timeout={ms}")
+
+    def cursor(self) -> CursorSqlite:
+        return CursorSqlite(self)
+
+    def execute(self, sql: str, *params) -> CursorSqlite:
+        return self.cursor().execute(sql, *params)
+
+    def commit(self):
+        if self._raw.in_transaction:
+            self._raw.execute("COMMIT")
+
+    def rollback(self):
+        if self._raw.in_transaction:
+            self._raw.execute("ROLLBACK")
+
+    def script(self, sql: str):
+        """Varias sentencias SQLite tal cual (DDL); confirma lo pendiente antes."""
+        self._raw.executescript(sql)
+
+    def close(self):
+        self._raw.close()
+
+
+class Sqlite(Motor):
+    nombre = "sqlite"
+    sql_catalogo = """
+        SELECT 'dbo', m.name, c.name
+          FROM sqlite_master m
+          LEFT JOIN pragma_table_info(m.name) c
+         WHERE m.type = 'table' AND m.name NOT LIKE 'sqlite!_%' ESCAPE '!'
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def conectar(self, database: str) -> ConexionSqlite:
+        # una sola base: `database` (VentasDB/master) no aplica
+        return ConexionSqlite(self.path)
+
+    def crear_esquema(self, conn) -> bool:
+        cur = conn.cursor()
+        cur.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' "
+                    "AND name IN ('ResumenVentasHora', 'ResumenProductoDia')")
+        resumen_nuevo = cur.fetchone()[0] < 2
+        conn.script(_ESQUEMA_SQLITE)
+        self._admin_por_defecto(conn)
+        return resumen_nuevo
+
+    @staticmethod
+    def _admin_por_defecto(conn):
+        from security import hash_password
+        cur = conn.cursor()
+        cur.execute("SELECT COUNT(*) FROM Usuarios WHERE Rol = 'Admin'")
+        if cur.fetchone()[0] > 0:
+            return
+        salt, h = hash_password('1')
+        cur.execute("""
+            INSERT INTO Usuarios(Numero, Nombre, Rol, Hash, Salt, ForzarCambio, Activo)
+            VALUES (?,?,?,?,?,1,1)
+        """, ('1', 'Administrador', 'Admin', h, salt))
+        conn.commit()
+
+
+_motor: Optional[Motor] = None
+_motor_clave = None
+_motor_lock = threading.Lock()
+
+def motor() -> Motor:
+    """El motor elegido en config.BACKEND ("sqlserver" o "sqlite")."""
+    global _motor, _motor_clave
+    clave = (config.BACKEND, config.SQLITE_PATH)
+    if _motor_clave != clave:
+        with _motor_lock:
+            if _motor_clave != clave:
+                nombre = (config.BACKEND or "sqlserver").lower()
+                if nombre == "sqlite":
+                    _motor = Sqlite(config.SQLITE_PATH)
+                elif nombre == "sqlserver":
+                    _motor = SqlServer()
+                else:
+                    raise ValueError(f"Backend desconocido: {config.BACKEND!r} (sqlserver o sqlite)")
+                _motor_clave = clave
+    return _motor
+
+def es_sqlite() -> bool:
+    return motor().nombre == "sqlite"
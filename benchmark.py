@@ -0,0 +1,733 @@
+"""
+Benchmarks del sistema de ventas. Correr SIEMPRE contra una base de prueba:
+crean productos y ventas reales.
+
+    python benchmark.py venta --tamanos 1,5,20,60 --repeticiones 20
+    python benchmark.py stress --cajas 8 --stock 500 --productos 3
+    python benchmark.py busqueda --productos 100000 --consultas 2000   (no usa la DB)
+    python benchmark.py tickets --cantidad 200 --procesos 4            (usa ventas existentes)
+    python benchmark.py render --lineas 10,100,1000                    (no usa la DB)
+
+Suite de repos sobre datos sintéticos (por defecto en un SQLite temporal):
+
+    python benchmark.py repos --productos 5000 --ventas 20000 --json base.json
+    python benchmark.py repos --backend sqlserver ...                  (base configurada: ¡de prueba!)
+    python benchmark.py comparar base.json nuevo.json --tolerancia 0.2
+"""
+import argparse
+import io
+import json
+import math
+import os
+import platform
+import random
+import statistics
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+import config
+import instrumentacion
+import repos
+from repos import IngresoStockRepo, ProductoRepo, VentaRepo, _chunks
+from catalogo import CatalogoIndex
+
+
+def _percentil(valores: List[float], p: float) -> float:
+    if not valores:
+        return 0.0
+    orden = sorted(valores)
+    k = min(len(orden) - 1, max(0, int(round(p / 100.0 * (len(orden) - 1)))))
+    return orden[k]
+
+
+def _crear_productos_bench(n: int, stock: int = 1_000_000) -> List[int]:
+    """Crea n productos de prueba con stock alto y devuelve sus IDs."""
+    prefijo = f"BENCH-{int(time.time())}-"
+    return [ProductoRepo.crear(f"{prefijo}{i:05d}", 100.0 + i, stock) for i in range(n)]
+
+
+def bench_crear_venta(tamanos: List[int], repeticiones: int) -> List[dict]:
+    ids = _crear_productos_bench(max(tamanos))
+    resultados = []
+    try:
+        for n in tamanos:
+            items = [{"producto_id": pid, "cantidad": 1, "precio": 100.0} for pid in ids[:n]]
+            tiempos, viajes = [], []
+            for _ in range(repeticiones):
+                with instrumentacion.medir() as m:
+                    t0 = time.perf_counter()
+                    VentaRepo.crear_venta(None, items, metodo_pago="Efectivo", entregado=0.0, vuelto=0.0)
+                    tiempos.append((time.perf_counter() - t0) * 1000.0)
+                viajes.append(m.round_trips)
+            resultados.append({
+                "items": n,
+                "round_trips": statistics.median(viajes),
+                "p50_ms": _percentil(tiempos, 50),
+                "p95_ms": _percentil(tiempos, 95),
+                "max_ms": max(tiempos),
+            })
+    finally:
+        for pid in ids:
+            ProductoRepo.bloquear(pid)
+    return resultados
+
+
+def stress_stock(cajas: int, stock: int, productos: int = 1, max_items: int = 3) -> dict:
+    """
+    N cajas concurrentes venden los mismos productos hasta agotarlos.
+    Comprueba que no haya sobreventa: lo vendido por producto == stock inicial
+    y el stock final queda en 0 (nunca negativo). Mide ventas/segundo.
+    """
+    ids = _crear_productos_bench(productos, stock=stock)
+    vendidos = {pid: 0 for pid in ids}
+    lock = threading.Lock()
+    cont = {"ventas": 0, "sin_stock": 0, "errores": 0}
+
+    def caja(seed: int):
+        rnd = random.Random(seed)
+        agotados = set()
+        while len(agotados) < len(ids):
+            disponibles = [p for p in ids if p not in agotados]
+            elegidos = rnd.sample(disponibles, k=min(len(disponibles), rnd.randint(1, max_items)))
+            items = [{"producto_id": pid, "cantidad": 1, "precio": 1.0} for pid in elegidos]
+            try:
+                VentaRepo.crear_venta(None, items, metodo_pago="Efectivo")
+            except ValueError:
+                with lock:
+                    cont["sin_stock"] += 1
+                if len(elegidos) == 1:
+                    agotados.add(elegidos[0])
+                continue
+            except Exception:
+                # deadlock / timeout: se reintenta, la venta no quedó registrada
+                with lock:
+                    cont["errores"] += 1
+                continue
+            with lock:
+                cont["ventas"] += 1
+                for pid in elegidos:
+                    vendidos[pid] += 1
+
+    hilos = [threading.Thread(target=caja, args=(i,)) for i in range(cajas)]
+    t0 = time.perf_counter()
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+    seg = time.perf_counter() - t0
+
+    finales = {pid: float(ProductoRepo.buscar_por_id(pid)["Stock"]) for pid in ids}
+    sobreventa = any(vendidos[pid] > stock or finales[pid] < 0 for pid in ids)
+    consistente = all(stock - vendidos[pid] == finales[pid] for pid in ids)
+    for pid in ids:
+        ProductoRepo.bloquear(pid)
+    return {
+        "cajas": cajas,
+        "productos": productos,
+        "ventas": cont["ventas"],
+        "rechazadas_sin_stock": cont["sin_stock"],
+        "errores_reintentados": cont["errores"],
+        "segundos": round(seg, 3),
+        "ventas_por_seg": round(cont["ventas"] / seg, 1) if seg else 0.0,
+        "sobreventa": sobreventa,
+        "stock_consistente": consistente,
+    }
+
+
+_PALABRAS = (
+    "leche entera descremada azúcar arroz fideos tallarín yerba mate café té galletitas "
+    "dulce membrillo batata queso cremoso rallado manteca aceite girasol oliva vinagre "
+    "harina leudante polenta lentejas garbanzos porotos atún caballa jabón detergente "
+    "lavandina papel higiénico servilletas gaseosa naranja limón pomelo agua mineral "
+    "cerveza vino tinto blanco malbec jugo durazno ananá pañales shampoo acondicionador "
+    "crema dental cepillo desodorante mayonesa mostaza kétchup salsa tomate puré arvejas "
+    "choclo champiñones jamón cocido salame mortadela pan lactal integral tostadas "
+    "chocolate alfajor turrón caramelos chicle maní almendras nueces pasas sal fina gruesa"
+).split()
+_MARCAS = "Ledesma Serenísima Sancor Marolio Arcor Bagley Knorr Natura Cocinero Molinos Lucchetti Quilmes Coca Manaos Ala Skip Elite Colgate".split()
+_TAMANOS = ["1kg", "500g", "250g", "1L", "1.5L", "2.25L", "x6", "x12", "900ml", "350ml"]
+
+
+def _nombres_sinteticos(n: int, seed: int = 7) -> List[str]:
+    rnd = random.Random(seed)
+    return [
+        " ".join(rnd.sample(_PALABRAS, rnd.randint(1, 3))).capitalize()
+        + f" {rnd.choice(_MARCAS)} {rnd.choice(_TAMANOS)}"
+        for _ in range(n)
+    ]
+
+
+def bench_busqueda(productos: int, consultas: int) -> List[dict]:
+    """Índice de búsqueda del catálogo vs. recorrido lineal tipo LIKE '%x%' (en memoria)."""
+    nombres = _nombres_sinteticos(productos)
+    rows = [{"ProductoID": i + 1, "Nombre": n, "Precio": 1.0, "Stock": 1, "Activo": 1, "CodigoBarras": None}
+            for i, n in enumerate(nombres)]
+    idx = CatalogoIndex()
+    t0 = time.perf_counter()
+    idx._reemplazar(rows)
+    carga_ms = (time.perf_counter() - t0) * 1000.0
+
+    rnd = random.Random(11)
+    qs = []
+    for _ in range(consultas):
+        palabras = rnd.choice(nombres).split()
+        w = rnd.choice(palabras)
+        tipo = rnd.random()
+        if tipo < 0.5:
+            qs.append(w[:rnd.randint(2, max(2, len(w)))])          # prefijo tipeado
+        elif tipo < 0.8:
+            qs.append(" ".join(p[:4] for p in rnd.sample(palabras, min(2, len(palabras)))))
+        else:
+            qs.append(w.lower().replace("á", "a").replace("é", "e").replace("ú", "u"))  # sin acentos
+
+    lower = [(n.lower(), r) for n, r in zip(nombres, rows)]
+    resultados = []
+    for nombre, fn in [
+        ("indice", lambda q: idx.buscar(q, 100)),
+        # equivalente a WHERE Nombre LIKE '%q%' ORDER BY Nombre (TOP 100)
+        ("lineal_like", lambda q: sorted((n, r["ProductoID"]) for n, r in lower if q.lower() in n)[:100]),
+    ]:
+        tiempos = []
+        for q in qs:
+            t0 = time.perf_counter()
+            fn(q)
+            tiempos.append((time.perf_counter() - t0) * 1000.0)
+        resultados.append({
+            "metodo": nombre,
+            "p50_ms": _percentil(tiempos, 50),
+            "p95_ms": _percentil(tiempos, 95),
+            "p99_ms": _percentil(tiempos, 99),
+            "max_ms": max(tiempos),
+        })
+    resultados[0]["carga_ms"] = carga_ms
+    resultados[1]["carga_ms"] = 0.0
+    return resultados
+
+
+def bench_tickets(cantidad: int, procesos: List[int]) -> List[dict]:
+    """Tickets/segundo: uno por uno (como en la caja) vs. en tanda, con y sin procesos."""
+    import pdf_ticket   # requiere reportlab; los demás benchmarks no
+    ids = [r["VentaID"] for r in repos.query_all(
+        "SELECT TOP (?) VentaID FROM dbo.Ventas ORDER BY VentaID DESC", (cantidad,))]
+    if not ids:
+        raise SystemExit("No hay ventas para generar tickets")
+
+    modos = [
+        ("uno_por_uno", lambda d: [pdf_ticket.generar_ticket_pdf(v, os.path.join(d, f"t{v}.pdf"), abrir=False, archivar=False)
+                                   for v in ids]),
+        ("tanda", lambda d: pdf_ticket.generar_tickets_pdf(ids, carpeta=d)),
+        ("un_archivo", lambda d: pdf_ticket.generar_tickets_pdf(ids, un_archivo=os.path.join(d, "todos.pdf"))),
+    ]
+    for n in procesos:
+        if n > 1:
+            modos.append((f"tanda_{n}proc", lambda d, n=n: pdf_ticket.generar_tickets_pdf(ids, carpeta=d, procesos=n)))
+
+    resultados = []
+    for nombre, fn in modos:
+        with tempfile.TemporaryDirectory() as d:
+            with instrumentacion.medir() as m:
+                t0 = time.perf_counter()
+                fn(d)
+                seg = time.perf_counter() - t0
+            bytes_pdf = sum(os.path.getsize(os.path.join(d, f)) for f in os.listdir(d))
+        resultados.append({
+            "modo": nombre,
+            "tickets": len(ids),
+            "segundos": seg,
+            "tickets_por_seg": len(ids) / seg if seg else 0.0,
+            "round_trips": m.round_trips,
+            "kb_pdf": bytes_pdf / 1024.0,
+        })
+    return resultados
+
+
+def _wrap_ingenuo(txt: str, max_width_mm: float, font_name: str, font_size: float) -> List[str]:
+    """El corte de líneas anterior: stringWidth del renglón entero en cada palabra."""
+    from reportlab.lib.units import mm
+    from reportlab.pdfbase.pdfmetrics import stringWidth
+    lines, cur = [], ""
+    for w in txt.split():
+        test = f"{cur} {w}".strip()
+        if stringWidth(test, font_name, font_size) <= max_width_mm * mm:
+            cur = test
+        else:
+            if cur:
+                lines.append(cur)
+            cur = w
+    if cur:
+        lines.append(cur)
+    return lines
+
+
+def bench_render(lineas: List[int], repeticiones: int) -> List[dict]:
+    """
+    Render de facturas sintéticas de N renglones (sin DB): tiempo, pico de
+    memoria (tracemalloc) y costo del corte de nombres vs. el método anterior.
+    """
+    import pdf_ticket
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+
+    rnd = random.Random(5)
+    nombres = _nombres_sinteticos(max(lineas) * 2)
+    empresa = {"Nombre": "Empresa de Prueba S.A.", "CUIT": "30-12345678-9", "CondicionIVA": "Responsable Inscripto",
+               "Direccion": "Av. Siempre Viva 742", "Telefono": "011 4444-5555", "Email": "ventas@example.com",
+               "LogoPath": None}
+    resultados = []
+    for n in lineas:
+        det = [(i, f"{nombres[2 * i]} {nombres[2 * i + 1]}", rnd.randint(1, 12), round(rnd.uniform(50, 50_000), 2))
+               for i in range(n)]
+        cab = (1, datetime(2024, 1, 1, 12, 0), sum(q * p for _, _, q, p in det), "Consumidor Final")
+
+        def render():
+            buf = io.BytesIO()
+            c = canvas.Canvas(buf, pagesize=A4)
+            pdf_ticket._render_ticket(c, cab, det, empresa)
+            c.save()
+            return buf.getbuffer().nbytes
+
+        tiempos = []
+        for _ in range(repeticiones):
+            pdf_ticket._wrap_cached.cache_clear()     # sin ventaja de nombres ya cortados
+            t0 = time.perf_counter()
+            kb = render() / 1024.0
+            tiempos.append((time.perf_counter() - t0) * 1000.0)
+
+        pdf_ticket._wrap_cached.cache_clear()
+        tracemalloc.start()
+        render()
+        _, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        textos = [d[1] for d in det]
+        t0 = time.perf_counter()
+        for t in textos:
+            _wrap_ingenuo(t, 95.0, "Helvetica", 9)
+        ingenuo_ms = (time.perf_counter() - t0) * 1000.0
+        pdf_ticket._wrap_cached.cache_clear()
+        t0 = time.perf_counter()
+        for t in textos:
+            pdf_ticket._wrap_text(t, 95.0, "Helvetica", 9)
+        wrap_ms = (time.perf_counter() - t0) * 1000.0
+
+        resultados.append({
+            "lineas": n,
+            "p50_ms": _percentil(tiempos, 50),
+            "max_ms": max(tiempos),
+            "pico_kb": pico / 1024.0,
+            "pdf_kb": kb,
+            "wrap_ant_ms": ingenuo_ms,
+            "wrap_ms": wrap_ms,
+        })
+    return resultados
+
+
+# ---------------- suite de repos sobre datos sintéticos ----------------
+
+_NOMBRES_CLIENTES = "Juan María José Ana Carlos Laura Jorge Lucía Pedro Sofía Diego Valeria Martín Paula".split()
+_APELLIDOS = "González Rodríguez Gómez Fernández López Díaz Martínez Pérez Romero Sosa Álvarez Torres".split()
+_MEDIOS = (("Efectivo", 0.55), ("Tarjeta", 0.30), ("Transferencia", 0.15))
+# peso de cada hora del día: poco a la mañana temprano, picos al mediodía y a la tarde
+_PESO_HORA = [0, 0, 0, 0, 0, 0, 0, 1, 3, 5, 7, 9, 10, 8, 5, 4, 5, 7, 9, 10, 8, 5, 2, 1]
+
+
+class _Zipf:
+    """Elige productos con popularidad Zipf (pocos muy vendidos, cola larga de poco vendidos)."""
+    def __init__(self, ids: List[int], s: float, rnd: random.Random):
+        self.ids = list(ids)
+        rnd.shuffle(self.ids)           # el ranking de popularidad no sigue el orden de alta
+        acum, total = [], 0.0
+        for k in range(1, len(self.ids) + 1):
+            total += 1.0 / k ** s
+            acum.append(total)
+        self._acum = acum
+        self._rnd = rnd
+
+    def uno(self) -> int:
+        return self._rnd.choices(self.ids, cum_weights=self._acum)[0]
+
+    def distintos(self, n: int) -> List[int]:
+        n = min(n, len(self.ids))
+        out: Dict[int, None] = {}
+        while len(out) < n:
+            out.update(dict.fromkeys(self._rnd.choices(self.ids, cum_weights=self._acum, k=n - len(out))))
+        return list(out)
+
+
+def _tamano_carrito(rnd: random.Random, maximo: int = 60) -> int:
+    """Lognormal: la mayoría de los tickets lleva 1-5 renglones, algunos muchos más."""
+    return max(1, min(maximo, int(rnd.lognormvariate(1.0, 0.8))))
+
+
+def _ids_desde(tabla: str, col: str, desde: int) -> List[int]:
+    return [r[col] for r in repos.query_all(
+        f"SELECT {col} FROM dbo.{tabla} WHERE {col} > ? ORDER BY {col}", (desde,))]
+
+
+def _max_id(tabla: str, col: str) -> int:
+    return int(repos.query_one(f"SELECT ISNULL(MAX({col}), 0) AS M FROM dbo.{tabla}")["M"])
+
+
+def sembrar(productos: int, clientes: int, ventas: int, dias: int = 90, seed: int = 42) -> dict:
+    """
+    Carga un catálogo, clientes y un historial de ventas sintéticos con
+    distribuciones parecidas a las de un kiosco/almacén:
+    - precios lognormales (mediana ~$1.500) y 80 % de productos con código de barras
+    - productos por venta con popularidad Zipf, renglones por ticket lognormales
+    - ventas repartidas en `dias` días con el perfil horario de _PESO_HORA
+    - medio de pago según _MEDIOS y 30 % de ventas con cliente
+    Las ventas se insertan en lote (no pasan por crear_venta) y después se
+    reconstruyen los resúmenes. El stock queda alto para que la suite no lo agote.
+    """
+    rnd = random.Random(seed)
+    t0 = time.perf_counter()
+    base_prod = _max_id("Productos", "ProductoID")
+    base_cli = _max_id("Clientes", "ClienteID")
+    base_venta = _max_id("Ventas", "VentaID")
+    etiqueta = f"seed{seed}-{int(time.time())}"
+
+    nombres = _nombres_sinteticos(productos, seed)
+    filas_prod = [
+        (f"{n} #{i}", round(rnd.lognormvariate(math.log(1500), 0.9), 2), 1_000_000,
+         f"{base_prod + i + 1:013d}" if rnd.random() < 0.8 else None)
+        for i, n in enumerate(nombres)
+    ]
+    filas_cli = [
+        (f"{rnd.choice(_NOMBRES_CLIENTES)} {rnd.choice(_APELLIDOS)}", None, f"11{rnd.randint(10**7, 10**8 - 1)}")
+        for _ in range(clientes)
+    ]
+
+    conn = config.get_connection()
+    try:
+        conn.autocommit = False
+        cur = conn.cursor()
+        cur.fast_executemany = True
+        for lote in _chunks(filas_prod, 1000):
+            cur.executemany(
+                "INSERT INTO dbo.Productos(Nombre, Precio, Stock, Activo, CodigoBarras) VALUES (?,?,?,1,?)", lote)
+        for lote in _chunks(filas_cli, 1000):
+            cur.executemany("INSERT INTO dbo.Clientes(Nombre, Email, Telefono) VALUES (?,?,?)", lote)
+        conn.commit()
+    finally:
+        conn.close()
+
+    pids = _ids_desde("Productos", "ProductoID", base_prod)
+    cids = _ids_desde("Clientes", "ClienteID", base_cli)
+    precio = {pid: f[1] for pid, f in zip(pids, filas_prod)}
+    zipf = _Zipf(pids, 1.1, rnd)
+    medios, pesos = zip(*_MEDIOS)
+    hoy = datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+
+    cabeceras, detalles = [], {}
+    for i in range(ventas):
+        dia = hoy - timedelta(days=rnd.randrange(dias))
+        fecha = dia.replace(hour=rnd.choices(range(24), weights=_PESO_HORA)[0]) + timedelta(
+            seconds=rnd.randrange(3600))
+        renglones = [(pid, rnd.choice((1, 1, 1, 2, 3)), precio[pid])
+                     for pid in zipf.distintos(_tamano_carrito(rnd))]
+        total = round(sum(q * p for _, q, p in renglones), 2)
+        medio = rnd.choices(medios, weights=pesos)[0]
+        cliente = rnd.choice(cids) if cids and rnd.random() < 0.3 else None
+        clave = f"{etiqueta}-{i}"
+        cabeceras.append((cliente, fecha, total, medio, total if medio == "Efectivo" else 0.0, 0.0, clave))
+        detalles[clave] = renglones
+
+    conn = config.get_connection()
+    try:
+        conn.autocommit = False
+        cur = conn.cursor()
+        cur.fast_executemany = True
+        for lote in _chunks(cabeceras, 1000):
+            cur.executemany("""
+                INSERT INTO dbo.Ventas(ClienteID, Fecha, Total, MetodoPago, Entregado, Vuelto, ClaveIdem)
+                VALUES (?,?,?,?,?,?,?)
+            """, lote)
+        cur.execute("SELECT VentaID, ClaveIdem FROM dbo.Ventas WHERE VentaID > ?", (base_venta,))
+        filas_det = [(vid, pid, q, p) for vid, clave in cur.fetchall() if clave in detalles
+                     for pid, q, p in detalles[clave]]
+        for lote in _chunks(filas_det, 5000):
+            cur.executemany(
+                "INSERT INTO dbo.VentaDetalle(VentaID, ProductoID, Cantidad, PrecioUnitario) VALUES (?,?,?,?)", lote)
+        conn.commit()
+    finally:
+        conn.close()
+
+    repos.ResumenRepo.reconstruir()
+    return {
+        "productos": len(pids),
+        "clientes": len(cids),
+        "ventas": len(cabeceras),
+        "renglones": len(filas_det),
+        "dias": dias,
+        "seed": seed,
+        "segundos": round(time.perf_counter() - t0, 3),
+        "_pids": pids,
+        "_zipf": zipf,
+        "_codigos": [f[3] for f in filas_prod if f[3]],
+        "_nombres": nombres,
+        "_desde": hoy - timedelta(days=dias),
+    }
+
+
+def _medir(caso: str, fn: Callable[[int], object], repeticiones: int, calentamiento: int,
+           detalle: Optional[dict] = None) -> dict:
+    """
+    Corre fn(i) y resume latencia (ms), round-trips y filas leídas por llamada.
+    En `detalle[caso]` deja, por sentencia, el promedio por llamada (ver instrumentacion).
+    """
+    for i in range(calentamiento):
+        fn(-1 - i)
+    tiempos, viajes, filas = [], [], []
+    sentencias: Dict[tuple, List[float]] = {}
+    for i in range(repeticiones):
+        with instrumentacion.medir() as m:
+            t0 = time.perf_counter()
+            fn(i)
+            tiempos.append((time.perf_counter() - t0) * 1000.0)
+        viajes.append(m.round_trips)
+        filas.append(m.filas)
+        for clave, st in m.sentencias.items():
+            acc = sentencias.setdefault(clave, [0, 0, 0.0, 0.0, 0])
+            acc[0] += st[0]
+            acc[1] += st[1]
+            acc[2] += st[2]
+            acc[3] = max(acc[3], st[3])
+            acc[4] += st[4]
+    if detalle is not None:
+        detalle[caso] = sorted(({
+            "llamador": k[0], "sql": k[1],
+            "sentencias": v[0] / repeticiones, "round_trips": v[1] / repeticiones,
+            "ms": v[2] / repeticiones, "ms_max": v[3], "filas": v[4] / repeticiones,
+        } for k, v in sentencias.items()), key=lambda d: d["ms"], reverse=True)
+    return {
+        "caso": caso,
+        "n": repeticiones,
+        "p50_ms": _percentil(tiempos, 50),
+        "p95_ms": _percentil(tiempos, 95),
+        "p99_ms": _percentil(tiempos, 99),
+        "max_ms": max(tiempos),
+        "round_trips": statistics.median(viajes),
+        "filas": statistics.median(filas),
+    }
+
+
+def bench_repos(semilla: dict, repeticiones: int, tamanos: List[int], calentamiento: int = 2,
+                tickets_pdf: bool = True, detalle: Optional[dict] = None) -> List[dict]:
+    """
+    Mide los caminos calientes de la caja y la administración sobre los datos
+    de sembrar(). Las consultas se eligen con la misma popularidad Zipf que las ventas.
+    """
+    from cierredecaja import CajaRepo
+
+    rnd = random.Random(semilla["seed"] + 1)
+    zipf: _Zipf = semilla["_zipf"]
+    caja = CajaRepo()
+    usuario = repos.query_one("SELECT TOP 1 UsuarioID FROM dbo.Usuarios ORDER BY UsuarioID")
+    usuario_id = usuario["UsuarioID"] if usuario else None
+
+    palabras = [w for n in semilla["_nombres"][:2000] for w in n.split()]
+    textos = [rnd.choice(palabras)[:rnd.randint(3, 6)] for _ in range(repeticiones)]
+    codigos = semilla["_codigos"] or ["0"]
+    dias = [semilla["_desde"] + timedelta(days=rnd.randrange(semilla["dias"])) for _ in range(repeticiones)]
+
+    casos = [
+        ("ProductoRepo.listar", lambda i: ProductoRepo.listar()),
+        ("ProductoRepo.buscar_nombre_contiene", lambda i: ProductoRepo.buscar_nombre_contiene(textos[i % len(textos)])),
+        ("ProductoRepo.buscar_por_codigo", lambda i: ProductoRepo.buscar_por_codigo(rnd.choice(codigos))),
+        ("ProductoRepo.buscar_por_id", lambda i: ProductoRepo.buscar_por_id(zipf.uno())),
+    ]
+    for n in tamanos:
+        casos.append((f"VentaRepo.crear_venta[{n}]", lambda i, n=n: VentaRepo.crear_venta(
+            None, [{"producto_id": pid, "cantidad": 1, "precio": 100.0} for pid in zipf.distintos(n)],
+            metodo_pago="Efectivo", entregado=0.0, vuelto=0.0)))
+    casos += [
+        ("VentaRepo.listar", lambda i: VentaRepo.listar()),
+        ("CajaRepo.resumen_para_cierre", lambda i: caja.resumen_para_cierre(
+            dias[i % len(dias)].replace(hour=8), dias[i % len(dias)].replace(hour=20, minute=30))),
+        ("IngresoStockRepo.ingresar", lambda i: IngresoStockRepo.ingresar(
+            usuario_id, zipf.uno(), 10, 500.0, 900.0)),
+    ]
+
+    resultados = [_medir(caso, fn, repeticiones, calentamiento, detalle) for caso, fn in casos]
+
+    if tickets_pdf:
+        try:
+            import pdf_ticket
+        except ImportError:
+            print("(sin reportlab: se omite generar_ticket_pdf)")
+        else:
+            ventas = [r["VentaID"] for r in repos.query_all(
+                "SELECT TOP (?) VentaID FROM dbo.Ventas ORDER BY VentaID DESC", (repeticiones + calentamiento,))]
+            with tempfile.TemporaryDirectory() as d:
+                resultados.append(_medir("pdf_ticket.generar_ticket_pdf", lambda i: pdf_ticket.generar_ticket_pdf(
+                    ventas[i % len(ventas)], os.path.join(d, "t.pdf"), abrir=False, archivar=False),
+                    repeticiones, calentamiento, detalle))
+    return resultados
+
+
+def correr_suite(args) -> dict:
+    if args.backend == "sqlite":
+        ruta = args.sqlite or os.path.join(tempfile.mkdtemp(prefix="bench_ventas_"), "ventas.db")
+        config.usar_backend("sqlite", ruta)
+    else:
+        config.usar_backend("sqlserver")
+    config.ensure_schema()
+    semilla = sembrar(args.productos, args.clientes, args.ventas, args.dias, args.seed)
+    tamanos = [int(x) for x in args.tamanos.split(",") if x.strip()]
+    detalle: Dict[str, List[dict]] = {}
+    resultados = bench_repos(semilla, args.repeticiones, tamanos, args.calentamiento, not args.sin_pdf, detalle)
+    return {
+        "meta": {
+            "fecha": datetime.now().isoformat(timespec="seconds"),
+            "backend": args.backend,
+            "python": platform.python_version(),
+            "maquina": platform.node(),
+            "repeticiones": args.repeticiones,
+            **{k: v for k, v in semilla.items() if not k.startswith("_")},
+        },
+        "resultados": resultados,
+        "detalle": detalle,
+    }
+
+
+def comparar(base: dict, nuevo: dict, tolerancia: float, min_ms: float,
+             metrica: str = "p95_ms") -> List[dict]:
+    """
+    Compara dos corridas caso por caso. Es regresión si la métrica de tiempo
+    crece más que `tolerancia` (y más de `min_ms`, para no saltar por ruido
+    en casos de microsegundos) o si aumentan los round-trips o las filas.
+    """
+    previos = {r["caso"]: r for r in base["resultados"]}
+    filas = []
+    for r in nuevo["resultados"]:
+        b = previos.get(r["caso"])
+        if b is None:
+            continue
+        antes, ahora = b[metrica], r[metrica]
+        motivos = []
+        if ahora > antes * (1 + tolerancia) and ahora - antes > min_ms:
+            motivos.append("tiempo")
+        if r["round_trips"] > b["round_trips"]:
+            motivos.append("round_trips")
+        if r["filas"] > b["filas"]:
+            motivos.append("filas")
+        filas.append({
+            "caso": r["caso"],
+            f"{metrica}_base": antes,
+            f"{metrica}_nuevo": ahora,
+            "delta_pct": (ahora - antes) / antes * 100.0 if antes else 0.0,
+            "rt_base": b["round_trips"],
+            "rt_nuevo": r["round_trips"],
+            "regresion": ",".join(motivos) or "-",
+        })
+    return filas
+
+
+def _imprimir_tabla(filas: List[dict]):
+    if not filas:
+        return
+    cols = list(filas[0].keys())
+    anchos = {c: max([12, len(c)] + [len(str(f[c])) for f in filas if not isinstance(f[c], float)]) for c in cols}
+    print("  ".join(f"{c:>{anchos[c]}}" for c in cols))
+    for f in filas:
+        print("  ".join(f"{f[c]:>{anchos[c]}.2f}" if isinstance(f[c], float) else f"{f[c]:>{anchos[c]}}"
+                        for c in cols))
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Benchmarks del sistema de ventas")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("venta", help="VentaRepo.crear_venta: latencia y round-trips vs. tamaño de carrito")
+    p.add_argument("--tamanos", default="1,5,20,60")
+    p.add_argument("--repeticiones", type=int, default=20)
+
+    p = sub.add_parser("stress", help="Cajas concurrentes vendiendo el mismo stock (sobreventa y throughput)")
+    p.add_argument("--cajas", type=int, default=8)
+    p.add_argument("--stock", type=int, default=500)
+    p.add_argument("--productos", type=int, default=1)
+
+    p = sub.add_parser("busqueda", help="Índice de búsqueda de productos sobre un catálogo sintético")
+    p.add_argument("--productos", type=int, default=100_000)
+    p.add_argument("--consultas", type=int, default=2000)
+
+    p = sub.add_parser("tickets", help="Generación de tickets PDF: uno por uno vs. en tanda (tickets/seg)")
+    p.add_argument("--cantidad", type=int, default=200, help="últimas N ventas de la base")
+    p.add_argument("--procesos", default="4", help="tamaños de pool a probar, ej. 2,4")
+
+    p = sub.add_parser("render", help="Render de tickets PDF de N renglones: tiempo y memoria (sin DB)")
+    p.add_argument("--lineas", default="10,100,1000")
+    p.add_argument("--repeticiones", type=int, default=5)
+
+    p = sub.add_parser("repos", help="Suite de repos sobre datos sintéticos: p50/p95/p99, round-trips y filas")
+    p.add_argument("--backend", choices=("sqlite", "sqlserver"), default="sqlite")
+    p.add_argument("--sqlite", help="archivo SQLite (por defecto uno temporal y vacío)")
+    p.add_argument("--productos", type=int, default=5000)
+    p.add_argument("--clientes", type=int, default=500)
+    p.add_argument("--ventas", type=int, default=20_000)
+    p.add_argument("--dias", type=int, default=90)
+    p.add_argument("--seed", type=int, default=42)
+    p.add_argument("--tamanos", default="1,5,20", help="renglones por carrito para crear_venta")
+    p.add_argument("--repeticiones", type=int, default=50)
+    p.add_argument("--calentamiento", type=int, default=2)
+    p.add_argument("--sin-pdf", action="store_true", help="no medir generar_ticket_pdf")
+    p.add_argument("--json", help="guardar resultados en este archivo (para comparar después)")
+    p.add_argument("--detalle", action="store_true", help="mostrar el costo de cada sentencia por caso")
+
+    p = sub.add_parser("comparar", help="Compara dos JSON de 'repos' y falla si hay regresiones")
+    p.add_argument("base")
+    p.add_argument("nuevo")
+    p.add_argument("--metrica", default="p95_ms", choices=("p50_ms", "p95_ms", "p99_ms", "max_ms"))
+    p.add_argument("--tolerancia", type=float, default=0.20, help="aumento relativo aceptado (0.20 = 20 %%)")
+    p.add_argument("--min-ms", type=float, default=0.5, help="diferencia absoluta mínima para contar como regresión")
+
+    args = ap.parse_args(argv)
+    if args.cmd == "venta":
+        tamanos = [int(x) for x in args.tamanos.split(",") if x.strip()]
+        _imprimir_tabla(bench_crear_venta(tamanos, args.repeticiones))
+    elif args.cmd == "stress":
+        res = stress_stock(args.cajas, args.stock, args.productos)
+        for k, v in res.items():
+            print(f"{k:>22}: {v}")
+        if res["sobreventa"] or not res["stock_consistente"]:
+            raise SystemExit(1)
+    elif args.cmd == "busqueda":
+        _imprimir_tabla(bench_busqueda(args.productos, args.consultas))
+    elif args.cmd == "tickets":
+        procesos = [int(x) for x in args.procesos.split(",") if x.strip()]
+        _imprimir_tabla(bench_tickets(args.cantidad, procesos))
+    elif args.cmd == "render":
+        lineas = [int(x) for x in args.lineas.split(",") if x.strip()]
+        _imprimir_tabla(bench_render(lineas, args.repeticiones))
+    elif args.cmd == "repos":
+        res = correr_suite(args)
+        meta = res["meta"]
+        print(f"{meta['backend']}: {meta['productos']} productos, {meta['clientes']} clientes, "
+              f"{meta['ventas']} ventas ({meta['renglones']} renglones) sembradas en {meta['segundos']} s")
+        _imprimir_tabla(res["resultados"])
+        if args.detalle:
+            for caso, sentencias in res["detalle"].items():
+                print(f"\n{caso}")
+                for st in sentencias:
+                    print(f"  {st['ms']:>8.3f} ms  {st['round_trips']:>5.1f} rt  {st['filas']:>8.1f} filas  "
+                          f"{st['llamador']}: {st['sql'][:110]}")
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump(res, f, ensure_ascii=False, indent=2)
+    elif args.cmd == "comparar":
+        with open(args.base, encoding="utf-8") as f:
+            base = json.load(f)
+        with open(args.nuevo, encoding="utf-8") as f:
+            nuevo = json.load(f)
+        filas = comparar(base, nuevo, args.tolerancia, args.min_ms, args.metrica)
+        _imprimir_tabla(filas)
+        if any(f["regresion"] != "-" for f in filas):
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,379 @@
+"""
+Catálogo de productos en memoria para la caja.
+
+Se carga una vez al iniciar sesión y se mantiene al día con sincronizar(),
+que trae sólo lo modificado desde la última vez (RowVer), incluidos los
+cambios hechos desde otras cajas: la ventana de la caja lo corre en segundo
+plano cada config.CATALOGO_SYNC_SEG segundos, o enseguida si un aviso de repos
+(alta, edición, bloqueo, ingreso de stock) dejó el catálogo pendiente. Los
+avisos no van a la DB: corren en el hilo del que escribió (muchas veces el de
+Tk), así que sólo anotan; las ventas sí se aplican al stock en memoria. La resolución de código de
+barras / ID / nombre exacto es un acceso a dict, sin ir a la DB.
+
+La búsqueda por nombre usa un índice invertido de palabras (con trigramas
+sobre el vocabulario para encontrar texto en medio de una palabra): ignora
+mayúsculas y acentos ("azucar" encuentra "Azúcar"), acepta las palabras en
+cualquier orden y prioriza los nombres que empiezan con lo tipeado.
+"""
+import heapq
+import re
+import threading
+import time
+import unicodedata
+from bisect import bisect_left, insort
+from typing import Dict, List, Optional, Set
+
+from repos import ProductoRepo, on_productos_cambiados
+
+_NO_ALNUM = re.compile(r"[^0-9a-z]+")
+# camino rápido para los acentos del español; el resto pasa por unicodedata
+_SIN_ACENTOS = str.maketrans("áéíóúüñàèìòùâêîôûäëïö", "aeiouunaeiouaeiouaeio")
+
+def normalizar(texto: str) -> str:
+    """Minúsculas, sin acentos ni signos: 'Azúcar  Ledesma 1kg.' -> 'azucar ledesma 1kg'."""
+    t = (texto or "").lower().translate(_SIN_ACENTOS)
+    if not t.isascii():
+        t = unicodedata.normalize("NFKD", t)
+        t = "".join(ch for ch in t if not unicodedata.combining(ch))
+    return _NO_ALNUM.sub(" ", t).strip()
+
+def _trigramas(token: str) -> Set[str]:
+    return {token[i:i + 3] for i in range(len(token) - 2)}
+
+
+class CatalogoIndex:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._sync_lock = threading.Lock()
+        self._token: Optional[int] = None   # RowVer hasta el que estamos al día
+        self._por_id: Dict[int, dict] = {}
+        self._por_codigo: Dict[str, int] = {}
+        self._por_nombre: Dict[str, int] = {}
+        self._nombres: List[tuple] = []     # [(nombre_lower, ProductoID)] ordenado
+        # índice de búsqueda
+        self._norm: Dict[int, str] = {}             # ProductoID -> nombre normalizado
+        self._norm_orden: List[tuple] = []          # [(normalizado, ProductoID)] ordenado
+        self._por_token: Dict[str, Set[int]] = {}   # palabra -> ProductoIDs
+        self._vocab: List[str] = []                 # palabras distintas, ordenado (prefijos)
+        self._vocab_tri: Dict[str, Set[str]] = {}   # trigrama -> palabras que lo contienen
+        self._pendientes: Set[int] = set()          # avisados y todavía no releídos
+        self._sucio = False
+        self.cargado_en: Optional[float] = None
+
+    @property
+    def cargado(self) -> bool:
+        return self.cargado_en is not None
+
+    # ---- carga / actualización ----
+    @property
+    def delta_sync(self) -> bool:
+        """True si la base soporta sincronización por deltas (hay token)."""
+        return self._token is not None
+
+    @property
+    def pendiente(self) -> bool:
+        """True si hubo avisos de cambios que todavía no se sincronizaron."""
+        return self._sucio
+
+    def marcar(self, ids: List[int]):
+        """Anota productos cambiados para el próximo sincronizar() (sin ir a la DB)."""
+        with self._lock:
+            self._pendientes.update(int(i) for i in ids)
+            self._sucio = True
+
+    def _tomar_pendientes(self) -> Set[int]:
+        # antes de leer: un aviso que llega durante la lectura queda para la próxima
+        with self._lock:
+            ids, self._pendientes = self._pendientes, set()
+            self._sucio = False
+            return ids
+
+    def cargar(self):
+        with self._sync_lock:
+            self._tomar_pendientes()
+            rows, token = ProductoRepo.cambios_desde(None)
+            self._reemplazar(rows)
+            self._token = token
+
+    def sincronizar(self) -> int:
+        """Aplica los cambios desde el último token. Devuelve cuántos productos cambiaron."""
+        if not self.cargado:
+            self.cargar()
+            return len(self._por_id)
+        if not self.delta_sync:
+            # sin RowVer: los avisados se releen por ID; si no hay, recarga completa
+            with self._sync_lock:
+                ids = self._tomar_pendientes()
+                if ids:
+                    self.refrescar(sorted(ids))
+                    return len(ids)
+            self.cargar()
+            return len(self._por_id)
+        with self._sync_lock:
+            self._tomar_pendientes()     # el delta por RowVer ya los incluye
+            rows, token = ProductoRepo.cambios_desde(self._token)
+            self.actualizar(rows)
+            if token is not None:
+                self._token = max(self._token or 0, token)
+            return len(rows)
+
+    def _reemplazar(self, rows: List[dict]):
+        with self._lock:
+            self._por_id.clear(); self._por_codigo.clear(); self._por_nombre.clear()
+            self._norm.clear(); self._por_token.clear(); self._vocab_tri.clear()
+            self._nombres = []
+            self._norm_orden = []
+            for r in rows:
+                self._indexar(r)
+            self._nombres.sort()
+            self._norm_orden.sort()
+            self._vocab = sorted(self._por_token)
+            for tok in self._vocab:
+                for tri in _trigramas(tok):
+                    self._vocab_tri.setdefault(tri, set()).add(tok)
+            self.cargado_en = time.time()
+
+    def _indexar(self, r: dict, ordenado: bool = False):
+        pid = int(r["ProductoID"])
+        r = dict(r)
+        self._por_id[pid] = r
+        cb = (r.get("CodigoBarras") or "").strip()
+        if cb:
+            self._por_codigo[cb] = pid
+        nombre = (r.get("Nombre") or "").strip().lower()
+        self._por_nombre.setdefault(nombre, pid)
+        if ordenado:
+            insort(self._nombres, (nombre, pid))
+        else:
+            self._nombres.append((nombre, pid))
+
+        norm = normalizar(r.get("Nombre") or "")
+        self._norm[pid] = norm
+        if ordenado:
+            insort(self._norm_orden, (norm, pid))
+        else:
+            self._norm_orden.append((norm, pid))
+        for tok in set(norm.split()):
+            ids = self._por_token.get(tok)
+            if ids is None:
+                ids = self._por_token[tok] = set()
+                if ordenado:   # en la carga completa el vocabulario se arma al final
+                    insort(self._vocab, tok)
+                    for tri in _trigramas(tok):
+                        self._vocab_tri.setdefault(tri, set()).add(tok)
+            ids.add(pid)
+
+    def _desindexar(self, pid: int):
+        viejo = self._por_id.pop(pid, None)
+        if not viejo:
+            return
+        cb = (viejo.get("CodigoBarras") or "").strip()
+        if cb and self._por_codigo.get(cb) == pid:
+            del self._por_codigo[cb]
+        nombre = (viejo.get("Nombre") or "").strip().lower()
+        if self._por_nombre.get(nombre) == pid:
+            del self._por_nombre[nombre]
+        i = bisect_left(self._nombres, (nombre, pid))
+        if i < len(self._nombres) and self._nombres[i] == (nombre, pid):
+            del self._nombres[i]
+
+        norm = self._norm.pop(pid, "")
+        j = bisect_left(self._norm_orden, (norm, pid))
+        if j < len(self._norm_orden) and self._norm_orden[j] == (norm, pid):
+            del self._norm_orden[j]
+        for tok in set(norm.split()):
+            ids = self._por_token.get(tok)
+            if ids is not None:
+                ids.discard(pid)
+                if not ids:
+                    del self._por_token[tok]
+                    j = bisect_left(self._vocab, tok)
+                    if j < len(self._vocab) and self._vocab[j] == tok:
+                        del self._vocab[j]
+                    for tri in _trigramas(tok):
+                        toks = self._vocab_tri.get(tri)
+                        if toks is not None:
+                            toks.discard(tok)
+                            if not toks:
+                                del self._vocab_tri[tri]
+
+    def actualizar(self, rows: List[dict]):
+        """Reemplaza (o agrega) los productos dados sin recargar todo."""
+        with self._lock:
+            for r in rows:
+                self._desindexar(int(r["ProductoID"]))
+                self._indexar(r, ordenado=True)
+
+    def refrescar(self, ids: List[int]):
+        """Relee de la DB sólo los productos indicados."""
+        if ids:
+            self.actualizar(ProductoRepo.listar_por_ids(ids))
+
+    def aplicar_venta(self, stock_delta: Dict[int, float]):
+        with self._lock:
+            for pid, cant in stock_delta.items():
+                r = self._por_id.get(int(pid))
+                if r is None or r.get("Stock") is None:
+                    continue
+                nuevo = float(r["Stock"]) - float(cant)
+                r["Stock"] = int(nuevo) if nuevo.is_integer() else nuevo
+
+    # ---- consultas ----
+    def por_id(self, pid: int) -> Optional[dict]:
+        r = self._por_id.get(int(pid))
+        return dict(r) if r else None
+
+    def por_codigo(self, q: str) -> Optional[dict]:
+        """Igual que ProductoRepo.buscar_por_codigo: código de barras, ID o nombre exacto."""
+        q = (q or "").strip()
+        if not q:
+            return None
+        with self._lock:
+            pid = self._por_codigo.get(q)
+            if pid is None and q.isdigit() and int(q) in self._por_id:
+                pid = int(q)
+            if pid is None:
+                pid = self._por_nombre.get(q.lower())
+            r = self._por_id.get(pid) if pid is not None else None
+            return dict(r) if r else None
+
+    def _palabras(self, qtok: str):
+        """Palabras del vocabulario que empiezan con qtok y (si tiene ≥3 letras) las que lo contienen."""
+        prefijo = []
+        i = bisect_left(self._vocab, qtok)
+        while i < len(self._vocab) and self._vocab[i].startswith(qtok):
+            prefijo.append(self._vocab[i])
+            i += 1
+        medio = []
+        if len(qtok) >= 3:
+            sets = []
+            for tri in _trigramas(qtok):
+                toks = self._vocab_tri.get(tri)
+                if not toks:
+                    sets = []
+                    break
+                sets.append(toks)
+            if sets:
+                sets.sort(key=len)
+                cands = sets[0].intersection(*sets[1:])
+                # los trigramas pueden dar falsos positivos ("abc"+"bcd" != "abcd")
+                medio = [t for t in cands if qtok in t and not t.startswith(qtok)]
+        return prefijo, medio
+
+    def _union(self, palabras: List[str]) -> Set[int]:
+        if not palabras:
+            return set()
+        return set().union(*(self._por_token[t] for t in palabras))
+
+    def buscar(self, texto: str, limite: int = 100) -> List[dict]:
+        """
+        Búsqueda por nombre sin distinguir mayúsculas ni acentos. Todas las palabras
+        tipeadas tienen que aparecer (en cualquier orden), como comienzo de palabra o,
+        con 3 letras o más, en medio de una. Orden: primero los nombres que empiezan
+        con el texto, después los que tienen palabras que empiezan así, el resto;
+        dentro de cada grupo, por nombre.
+        """
+        q = normalizar(texto)
+        qtoks = sorted(set(q.split()), key=len, reverse=True)
+        if not qtoks:
+            return []
+        with self._lock:
+            todos_ids: Optional[Set[int]] = None
+            por_prefijo: Optional[Set[int]] = None
+            for tok in qtoks:
+                prefijo, medio = self._palabras(tok)
+                ids_pref = self._union(prefijo)
+                ids = ids_pref | self._union(medio) if medio else ids_pref
+                todos_ids = ids if todos_ids is None else (todos_ids & ids)
+                por_prefijo = ids_pref if por_prefijo is None else (por_prefijo & ids_pref)
+                if not todos_ids:
+                    return []
+
+            # nombres que empiezan con el texto: rango contiguo en el orden alfabético
+            orden = self._norm_orden
+            empieza = []
+            i = bisect_left(orden, (q,))
+            while i < len(orden) and orden[i][0].startswith(q) and len(empieza) < limite:
+                if orden[i][1] in todos_ids:
+                    empieza.append(orden[i][1])
+                i += 1
+            res: List[int] = list(empieza)
+            vistos = set(empieza)
+            for grupo in (por_prefijo, todos_ids):
+                falta = limite - len(res)
+                if falta <= 0:
+                    break
+                res.extend(self._primeros(grupo, vistos, falta))
+                vistos.update(res)
+            return [dict(self._por_id[pid]) for pid in res]
+
+    def _primeros(self, grupo: Set[int], excluir: Set[int], n: int) -> List[int]:
+        """Los n primeros de `grupo` (sin `excluir`) en orden alfabético."""
+        if len(grupo) * 20 > len(self._norm_orden):
+            # grupo grande: recorrer el orden alfabético corta enseguida
+            res = []
+            for _, pid in self._norm_orden:
+                if pid in grupo and pid not in excluir:
+                    res.append(pid)
+                    if len(res) >= n:
+                        break
+            return res
+        norm = self._norm
+        return heapq.nsmallest(n, (pid for pid in grupo if pid not in excluir),
+                               key=lambda pid: (norm[pid], pid))
+
+    def todos(self) -> List[dict]:
+        with self._lock:
+            return [dict(self._por_id[pid]) for _, pid in self._nombres]
+
+
+_indice = CatalogoIndex()
+
+def _on_cambio(ids: List[int], stock_delta: Optional[Dict[int, float]]):
+    # corre en el hilo que escribió: nada de I/O ni excepciones hacia el que llamó
+    if not _indice.cargado:
+        return
+    if stock_delta:
+        _indice.aplicar_venta(stock_delta)
+    else:
+        _indice.marcar(ids)
+
+on_productos_cambiados(_on_cambio)
+
+
+def cargar():
+    """Carga (o recarga completa) del catálogo. Llamar al iniciar sesión."""
+    _indice.cargar()
+
+def sincronizar() -> int:
+    """Trae sólo los productos modificados desde la última carga/sincronización."""
+    return _indice.sincronizar()
+
+def cargado() -> bool:
+    return _indice.cargado
+
+def pendiente() -> bool:
+    """True si hay cambios avisados que esperan un sincronizar()."""
+    return _indice.pendiente
+
+def por_codigo(q: str) -> Optional[dict]:
+    return _indice.por_codigo(q)
+
+def por_id(pid: int) -> Optional[dict]:
+    return _indice.por_id(pid)
+
+def buscar(texto: str, limite: int = 100) -> List[dict]:
+    return _indice.buscar(texto, limite)
+
+def todos() -> List[dict]:
+    return _indice.todos()
+
+def actualizar(rows: List[dict]):
+    _indice.actualizar(rows)
+
+def listar_productos() -> List[dict]:
+    """Todos los productos: del catálogo (trayendo sólo los cambios) si está cargado, si no de la DB."""
+    if _indice.cargado:
+        _indice.sincronizar()
+        return _indice.todos()
+    return ProductoRepo.listar()
@@ -9,8 +9,9 @@ except Exception:
     tb = None
 
 
-from config import get_connection
-from repos import _table_exists, _column_exists   # reusamos tus utilidades
+from config import get_connection, invalidate_schema_cache
+import tareas
+from repos import _table_exists, _column_exists, ResumenRepo   # reusamos tus utilidades
 try:
     from repos import VentaRepo
 except Exception:
@@ -68,6 +69,7 @@ class CajaRepo:
                     CREATE INDEX IX_CierresCaja_Periodo ON dbo.CierresCaja(Desde, Hasta);
                 """)
                 conn.commit()
+                invalidate_schema_cache()
         finally:
             conn.close()
 
@@ -142,57 +144,20 @@ class CajaRepo:
         """
         Devuelve totales por método en el período:
         {'Efectivo': x, 'Tarjeta': y, 'Transferencia': z}
-        - Si existe dbo.Pagos: agrupa por Pagos.Medio (suma Monto)
-        - Si no: si Ventas.MetodoPago existe: agrupa por Ventas.MetodoPago (suma Total)
+        - Las horas completas salen de dbo.ResumenVentasHora (ResumenRepo); sólo los
+          bordes del período se suman desde las ventas.
+        - Por venta cuentan sus dbo.Pagos si los tiene; si no, Ventas.MetodoPago por el total.
         """
         res = {"Efectivo": 0.0, "Tarjeta": 0.0, "Transferencia": 0.0}
-        conn = get_connection()
-        try:
-            cur = conn.cursor()
-
-            tiene_pagos = _table_exists(cur, "dbo", "Pagos")
-            if tiene_pagos:
-                cur.execute("""
-                    SELECT p.Medio, SUM(p.Monto) AS Monto
-                      FROM dbo.Pagos p
-                      JOIN dbo.Ventas v ON v.VentaID = p.VentaID
-                     WHERE v.Fecha >= ? AND v.Fecha <= ?
-                     GROUP BY p.Medio
-                """, (f0, f1))
-                rows = cur.fetchall()
-                for medio, monto in rows:
-                    medio_s = (medio or "").lower()
-                    if "efec" in medio_s:
-                        res["Efectivo"] += float(monto or 0)
-                    elif "tarj" in medio_s or "crédi" in medio_s or "credi" in medio_s or "debito" in medio_s or "débito" in medio_s:
-                        res["Tarjeta"] += float(monto or 0)
-                    elif "trans" in medio_s:
-                        res["Transferencia"] += float(monto or 0)
-                return res
-
-
-            if _column_exists(cur, "dbo", "Ventas", "MetodoPago"):
-                cur.execute("""
-                    SELECT v.MetodoPago, SUM(v.Total) AS Monto
-                      FROM dbo.Ventas v
-                     WHERE v.Fecha >= ? AND v.Fecha <= ?
-                     GROUP BY v.MetodoPago
-                """, (f0, f1))
-                rows = cur.fetchall()
-                for medio, monto in rows:
-                    medio_s = (medio or "").lower()
-                    if "efec" in medio_s:
-                        res["Efectivo"] += float(monto or 0)
-                    elif "tarj" in medio_s or "crédi" in medio_s or "credi" in medio_s or "debito" in medio_s or "débito" in medio_s:
-                        res["Tarjeta"] += float(monto or 0)
-                    elif "trans" in medio_s:
-                        res["Transferencia"] += float(monto or 0)
-                return res
-
-            # Fallback si no hay nada para agrupar
-            return res
-        finally:
-            conn.close()
+        for medio, monto in ResumenRepo.totales_por_medio(f0, f1).items():
+            medio_s = (medio or "").lower()
+            if "efec" in medio_s:
+                res["Efectivo"] += float(monto or 0)
+            elif "tarj" in medio_s or "crédi" in medio_s or "credi" in medio_s or "debito" in medio_s or "débito" in medio_s:
+                res["Tarjeta"] += float(monto or 0)
+            elif "trans" in medio_s:
+                res["Transferencia"] += float(monto or 0)
+        return res
 
 
 
@@ -220,6 +185,8 @@ class CierreDeCajaFrame(ttk.Frame):
         self.ent_hasta = ttk.Entry(top, width=20); self.ent_hasta.grid(row=0, column=3, sticky="w", padx=(0,12), pady=6)
 
         btns_top = ttk.Frame(top); btns_top.grid(row=0, column=4, sticky="e", padx=8, pady=6)
+        ttk.Button(btns_top, text="Hoy", command=self._preset_hoy).pack(side="left")
+        ttk.Button(btns_top, text="Calcular", command=self._auto_calc).pack(side="left", padx=(6, 0))
         self._preset_hoy()
 
 
@@ -325,26 +292,27 @@ class CierreDeCajaFrame(ttk.Frame):
             f0, f1 = self._parse_periodo()
         except Exception:
             return
-
+        tareas.de(self).submit(
+            self._calcular_totales, f0, f1,
+            on_done=lambda t: self._set_totales(*t),
+            on_error=lambda e: messagebox.showwarning("Cierre de caja", f"No se pudo calcular automáticamente.\n{e}"),
+            grupo=self, clave=(str(self), "auto_calc"), descripcion="Calculando totales del período…",
+        )
+
+    def _calcular_totales(self, f0, f1):
+        """Corre fuera del hilo de Tk: sólo consulta, no toca widgets."""
         # 1) Si tu VentaRepo ya tiene algo, usalo:
         for name in ("resumen_para_cierre", "resumen_por_periodo", "totales_por_periodo"):
             if VentaRepo and hasattr(VentaRepo, name):
                 try:
                     res = getattr(VentaRepo, name)(f0, f1)
-                    ef = float(res.get("Efectivo", 0))
-                    tj = float(res.get("Tarjeta", 0))
-                    tr = float(res.get("Transferencia", 0))
-                    self._set_totales(ef, tj, tr)
-                    return
+                    return (float(res.get("Efectivo", 0)), float(res.get("Tarjeta", 0)),
+                            float(res.get("Transferencia", 0)))
                 except Exception:
                     pass
 
-
-        try:
-            res = self.repo.resumen_para_cierre(f0, f1)
-            self._set_totales(res["Efectivo"], res["Tarjeta"], res["Transferencia"])
-        except Exception as e:
-            messagebox.showwarning("Cierre de caja", f"No se pudo calcular automáticamente.\n{e}")
+        res = self.repo.resumen_para_cierre(f0, f1)
+        return res["Efectivo"], res["Tarjeta"], res["Transferencia"]
 
     def _set_totales(self, ef, tj, tr):
         self.ent_efectivo.delete(0, tk.END); self.ent_efectivo.insert(0, f"{ef:.2f}")
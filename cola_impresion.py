@@ -0,0 +1,233 @@
+"""
+Cola de impresión de tickets, persistente y en segundo plano.
+
+La caja no espera a que se genere el PDF o responda la impresora: al
+confirmar la venta se encola el VentaID y un hilo lo emite con el backend
+configurado (tickets.emitir_ticket). La cola vive en un SQLite local, así
+que sobrevive a un cierre de la app; si emitir falla se reintenta con
+espera creciente y, pasado el máximo de intentos, queda en ERROR para
+reintentar a mano.
+
+    cola = cola_impresion.cola()       # compartida por todo el proceso (arranca el hilo)
+    cola.encolar(venta_id)
+    cola.resumen()                     # {"PENDIENTE": 1, "ERROR": 0, ...}
+"""
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import config
+
+MAX_INTENTOS = 5
+ESPERA_BASE = 2.0        # segundos antes del 1er reintento; se duplica en cada uno
+ESPERA_MAX = 300.0
+RETENER_DIAS = 7         # trabajos OK más viejos que esto se borran al arrancar
+
+ESTADOS = ("PENDIENTE", "IMPRIMIENDO", "OK", "ERROR")
+
+
+class ColaImpresion:
+    def __init__(self, path: str, max_intentos: int = MAX_INTENTOS,
+                 espera_base: float = ESPERA_BASE, espera_max: float = ESPERA_MAX):
+        self.path = path
+        self.max_intentos = max_intentos
+        self.espera_base = espera_base
+        self.espera_max = espera_max
+        self._hay_trabajo = threading.Event()
+        self._detener = threading.Event()
+        self._hilo: Optional[threading.Thread] = None
+        self._crear()
+
+    # ---------------- SQLite ----------------
+    def _conn(self) -> sqlite3.Connection:
+        # una conexión por operación: se usa desde el hilo de Tk y desde el worker
+        conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _crear(self):
+        conn = self._conn()
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS Trabajos (
+                    TrabajoID   INTEGER PRIMARY KEY AUTOINCREMENT,
+                    VentaID     INTEGER NOT NULL,
+                    Backend     TEXT NULL,
+                    Abrir       INTEGER NOT NULL DEFAULT 1,
+                    Estado      TEXT NOT NULL DEFAULT 'PENDIENTE',
+                    Intentos    INTEGER NOT NULL DEFAULT 0,
+                    Proximo     REAL NOT NULL,
+                    Destino     TEXT NULL,
+                    Error       TEXT NULL,
+                    Creado      REAL NOT NULL,
+                    Actualizado REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS IX_Trabajos_Estado ON Trabajos(Estado, Proximo)")
+            ahora = time.time()
+            # lo que quedó a medias en un cierre abrupto se vuelve a intentar
+            conn.execute("UPDATE Trabajos SET Estado='PENDIENTE', Actualizado=? WHERE Estado='IMPRIMIENDO'",
+                         (ahora,))
+            conn.execute("DELETE FROM Trabajos WHERE Estado='OK' AND Actualizado < ?",
+                         (ahora - RETENER_DIAS * 86400,))
+        finally:
+            conn.close()
+
+    # ---------------- API ----------------
+    def encolar(self, venta_id: int, backend: Optional[str] = None, abrir: bool = True) -> int:
+        ahora = time.time()
+        conn = self._conn()
+        try:
+            cur = conn.execute("""
+                INSERT INTO Trabajos(VentaID, Backend, Abrir, Proximo, Creado, Actualizado)
+                VALUES (?,?,?,?,?,?)
+            """, (int(venta_id), backend, 1 if abrir else 0, ahora, ahora, ahora))
+            tid = cur.lastrowid
+        finally:
+            conn.close()
+        self._hay_trabajo.set()
+        return tid
+
+    def reintentar(self, trabajo_id: Optional[int] = None) -> int:
+        """Vuelve a PENDIENTE un trabajo en ERROR (o todos si no se indica)."""
+        sql = "UPDATE Trabajos SET Estado='PENDIENTE', Intentos=0, Proximo=?, Actualizado=? WHERE Estado='ERROR'"
+        ahora = time.time()
+        params: tuple = (ahora, ahora)
+        if trabajo_id is not None:
+            sql += " AND TrabajoID=?"
+            params += (int(trabajo_id),)
+        conn = self._conn()
+        try:
+            n = conn.execute(sql, params).rowcount
+        finally:
+            conn.close()
+        if n:
+            self._hay_trabajo.set()
+        return n
+
+    def resumen(self) -> Dict[str, int]:
+        conn = self._conn()
+        try:
+            rows = conn.execute("SELECT Estado, COUNT(*) FROM Trabajos GROUP BY Estado").fetchall()
+        finally:
+            conn.close()
+        out = {e: 0 for e in ESTADOS}
+        out.update({r[0]: r[1] for r in rows})
+        return out
+
+    def trabajos(self, venta_id: Optional[int] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        sql = "SELECT * FROM Trabajos"
+        params: tuple = ()
+        if venta_id is not None:
+            sql += " WHERE VentaID=?"
+            params = (int(venta_id),)
+        sql += " ORDER BY TrabajoID DESC LIMIT ?"
+        conn = self._conn()
+        try:
+            return [dict(r) for r in conn.execute(sql, params + (int(limit),)).fetchall()]
+        finally:
+            conn.close()
+
+    # ---------------- worker ----------------
+    def iniciar(self):
+        if self._hilo is None or not self._hilo.is_alive():
+            self._detener.clear()
+            self._hilo = threading.Thread(target=self._loop, name="cola-impresion", daemon=True)
+            self._hilo.start()
+
+    def detener(self, timeout: float = 5.0):
+        self._detener.set()
+        self._hay_trabajo.set()
+        if self._hilo is not None:
+            self._hilo.join(timeout)
+
+    def _tomar(self) -> Optional[sqlite3.Row]:
+        """Marca IMPRIMIENDO el próximo trabajo vencido (en orden de llegada)."""
+        ahora = time.time()
+        conn = self._conn()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("""
+                SELECT * FROM Trabajos WHERE Estado='PENDIENTE' AND Proximo <= ?
+                ORDER BY TrabajoID LIMIT 1
+            """, (ahora,)).fetchone()
+            if row is not None:
+                conn.execute("UPDATE Trabajos SET Estado='IMPRIMIENDO', Actualizado=? WHERE TrabajoID=?",
+                             (ahora, row["TrabajoID"]))
+            conn.execute("COMMIT")
+            return row
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def _proxima_espera(self) -> Optional[float]:
+        conn = self._conn()
+        try:
+            row = conn.execute("SELECT MIN(Proximo) FROM Trabajos WHERE Estado='PENDIENTE'").fetchone()
+        finally:
+            conn.close()
+        return None if row[0] is None else max(0.0, row[0] - time.time())
+
+    def _terminar(self, tid: int, destino: Optional[str] = None, error: Optional[Exception] = None,
+                  intentos: int = 0):
+        ahora = time.time()
+        conn = self._conn()
+        try:
+            if error is None:
+                conn.execute("""
+                    UPDATE Trabajos SET Estado='OK', Intentos=?, Destino=?, Error=NULL, Actualizado=?
+                    WHERE TrabajoID=?
+                """, (intentos, destino, ahora, tid))
+            else:
+                estado = "ERROR" if intentos >= self.max_intentos else "PENDIENTE"
+                espera = min(self.espera_max, self.espera_base * (2 ** (intentos - 1)))
+                conn.execute("""
+                    UPDATE Trabajos SET Estado=?, Intentos=?, Proximo=?, Error=?, Actualizado=?
+                    WHERE TrabajoID=?
+                """, (estado, intentos, ahora + espera, str(error)[:500], ahora, tid))
+        finally:
+            conn.close()
+
+    def _emitir(self, row) -> str:
+        from tickets import emitir_ticket
+        return emitir_ticket(row["VentaID"], row["Backend"], abrir=bool(row["Abrir"]))
+
+    def _loop(self):
+        while not self._detener.is_set():
+            try:
+                row = self._tomar()
+            except Exception as e:
+                print("WARN cola de impresión:", e)
+                self._detener.wait(1.0)
+                continue
+            if row is None:
+                espera = self._proxima_espera()
+                self._hay_trabajo.wait(timeout=60.0 if espera is None else min(60.0, espera))
+                self._hay_trabajo.clear()
+                continue
+            intentos = row["Intentos"] + 1
+            try:
+                destino = self._emitir(row)
+            except Exception as e:
+                print(f"WARN ticket venta {row['VentaID']} (intento {intentos}):", e)
+                self._terminar(row["TrabajoID"], error=e, intentos=intentos)
+            else:
+                self._terminar(row["TrabajoID"], destino=destino, intentos=intentos)
+
+
+_cola: Optional[ColaImpresion] = None
+_cola_lock = threading.Lock()
+
+
+def cola() -> ColaImpresion:
+    """Cola compartida del proceso (se crea y arranca la primera vez)."""
+    global _cola
+    with _cola_lock:
+        if _cola is None:
+            _cola = ColaImpresion(config.COLA_IMPRESION_PATH)
+            _cola.iniciar()
+        return _cola
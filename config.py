@@ -1,4 +1,21 @@
-import pyodbc
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import instrumentacion
+try:
+    import pyodbc
+except ImportError:       # sólo hace falta para SQL Server (ver BACKEND)
+    pyodbc = None
+
+# Motor de base: "sqlserver" (producción) o "sqlite" (local, en proceso; ver backends.py)
+BACKEND = os.environ.get('VENTAS_BACKEND', 'sqlserver')
+SQLITE_PATH = os.environ.get(
+    'VENTAS_SQLITE', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ventas.db'))
 
 SERVER = r'localhost\SQLEXPRESS'  
 DATABASE = 'VentasDB'
@@ -6,6 +23,13 @@ TRUSTED = True
 USER = 'sa'                         
 PASSWORD = 'yourStrong(!)Password'  
 
+# Pool de conexiones (por proceso)
+POOL_MIN = 1              # conexiones ociosas que se conservan aunque venza el idle
+POOL_MAX = 8              # tope de conexiones abiertas a la vez
+POOL_IDLE_TIMEOUT = 300   # segundos sin uso antes de cerrar una conexión ociosa
+POOL_PING_AFTER = 30      # si estuvo ociosa más que esto, se valida con SELECT 1 al tomarla
+POOL_WAIT_TIMEOUT = 15    # segundos de espera máxima por una conexión libre
+
 _DRIVERS = [
     '{ODBC Driver 18 for SQL Server}',
     '{ODBC Driver 17 for SQL Server}',
@@ -13,29 +37,458 @@ _DRIVERS = [
     '{SQL Server}'
 ]
 
+# cada cuántos segundos la caja trae del catálogo lo modificado desde otras cajas/PCs
+CATALOGO_SYNC_SEG = 15
+
+# crear_venta corta sus consultas pasado este tiempo (s); la caja guarda la venta
+# en el diario local (diario_ventas.py) en vez de quedar esperando a la base
+VENTA_TIMEOUT = 8
+DIARIO_VENTAS_PATH = os.environ.get(
+    'VENTAS_DIARIO', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'diario_ventas.db'))
+
+# Tickets (por caja; cada máquina puede pisarlo con variables de entorno)
+#   TICKET_BACKEND: "pdf" (A4, visor del sistema) o "escpos" (impresora térmica)
+#   TICKET_DESTINO: para escpos; ruta de archivo o dispositivo (/dev/usb/lp0, \\PC\POS80)
+#                   o tcp://host:9100. Vacío = ticket_{venta_id}.bin en la carpeta actual.
+TICKET_BACKEND = os.environ.get('VENTAS_TICKET_BACKEND', 'pdf')
+TICKET_ANCHO_MM = int(os.environ.get('VENTAS_TICKET_ANCHO_MM', '80'))   # 58 u 80
+TICKET_DESTINO = os.environ.get('VENTAS_TICKET_DESTINO', '')
+# Cola local de tickets por imprimir (SQLite; sobrevive a cierres de la app)
+COLA_IMPRESION_PATH = os.environ.get(
+    'VENTAS_COLA_IMPRESION', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cola_impresion.db'))
+# Archivo de tickets PDF (por hash de contenido; ver ticket_archivo.py). Puede ser una carpeta compartida.
+TICKET_ARCHIVO_DIR = os.environ.get(
+    'VENTAS_TICKET_ARCHIVO', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tickets_archivo'))
+
+# Instrumentación de consultas (instrumentacion.py): con VENTAS_INSTRUMENTAR=1 arranca
+# activa; si no, se prende en caliente con instrumentacion.activar()
+INSTRUMENTAR = os.environ.get('VENTAS_INSTRUMENTAR', '') == '1'
+SQL_LENTA_MS = float(os.environ.get('VENTAS_SQL_LENTA_MS', '200'))   # execute + fetch
+SQL_LENTA_LOG = os.environ.get(
+    'VENTAS_SQL_LENTA_LOG', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'consultas_lentas.log'))
+
+# Driver que funcionó, persistido entre ejecuciones (no guarda credenciales)
+DRIVER_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.odbc_driver.json')
+
+_driver_ok = None   # último driver que conectó bien; se prueba primero
+_driver_cache_loaded = False
+
+class DBNoDisponible(RuntimeError):
+    """No se pudo llegar a SQL Server (conexión, red o pool agotado). Se puede reintentar."""
+
+
+# SQLSTATE de ODBC que indican base inalcanzable o sin respuesta a tiempo
+_SQLSTATE_NO_DISPONIBLE = {"08001", "08004", "08007", "08S01", "HYT00", "HYT01"}
+
+def es_db_no_disponible(exc: BaseException) -> bool:
+    """
+    True si el error es de conectividad (vale la pena reintentar más tarde) y no
+    de negocio o de datos (stock, constraint, SQL inválido).
+    """
+    if isinstance(exc, DBNoDisponible):
+        return True
+    if isinstance(exc, sqlite3.OperationalError):
+        msg = str(exc).lower()
+        return "locked" in msg or "unable to open" in msg or "disk i/o" in msg
+    if pyodbc is not None and isinstance(exc, pyodbc.Error):
+        estado = str(exc.args[0]) if exc.args else ""
+        if estado in _SQLSTATE_NO_DISPONIBLE:
+            return True
+        if estado == "40001":          # deadlock: no es caída, se reintenta en el momento
+            return False
+        return isinstance(exc, (pyodbc.OperationalError, pyodbc.InterfaceError))
+    return isinstance(exc, (TimeoutError, ConnectionError))
+
+def _conn_str(drv: str, database: str) -> str:
+    if TRUSTED:
+        return (
+            f'DRIVER={drv};SERVER={SERVER};DATABASE={database};'
+            'Trusted_Connection=yes;Encrypt=no;'
+        )
+    return (
+        f'DRIVER={drv};SERVER={SERVER};DATABASE={database};'
+        f'UID={USER};PWD={PASSWORD};Encrypt=no;'
+    )
+
+def _load_driver_cache():
+    """Lee el driver guardado para este SERVER (una sola vez por proceso)."""
+    global _driver_ok, _driver_cache_loaded
+    _driver_cache_loaded = True
+    try:
+        with open(DRIVER_CACHE_PATH, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('server') == SERVER and data.get('driver'):
+            _driver_ok = data['driver']
+    except Exception:
+        pass
+
+def _save_driver_cache(drv: str):
+    try:
+        tmp = DRIVER_CACHE_PATH + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'server': SERVER, 'driver': drv}, f)
+        os.replace(tmp, DRIVER_CACHE_PATH)
+    except Exception:
+        pass   # sin cache en disco seguimos funcionando igual
+
+def _candidate_drivers() -> list:
+    """
+    _DRIVERS filtrado por los instalados (pyodbc.drivers()), así no se pierden
+    5 s por cada driver que ni siquiera existe en la máquina.
+    """
+    try:
+        installed = {'{%s}' % d for d in pyodbc.drivers()}
+    except Exception:
+        installed = set()
+    cands = [d for d in _DRIVERS if d in installed]
+    return cands or list(_DRIVERS)
+
 def _connect(database: str) -> pyodbc.Connection:
+    global _driver_ok
+    if not _driver_cache_loaded:
+        _load_driver_cache()
+
     last_error = None
-    for drv in _DRIVERS:
+    cached = _driver_ok
+    if cached:
+        # camino rápido: el driver que ya sabemos que anda
         try:
-            if TRUSTED:
-                conn_str = (
-                    f'DRIVER={drv};SERVER={SERVER};DATABASE={database};'
-                    'Trusted_Connection=yes;Encrypt=no;'
-                )
-            else:
-                conn_str = (
-                    f'DRIVER={drv};SERVER={SERVER};DATABASE={database};'
-                    f'UID={USER};PWD={PASSWORD};Encrypt=no;'
-                )
-            return pyodbc.connect(conn_str, timeout=5)
+            return pyodbc.connect(_conn_str(cached, database), timeout=5)
         except Exception as e:
             last_error = e
+
+    # re-probe: sólo si no hay cache o el cacheado falló
+    for drv in _candidate_drivers():
+        if drv == cached:
             continue
-    raise RuntimeError(f"No se pudo conectar a SQL Server. Último error: {last_error}")
+        try:
+            conn = pyodbc.connect(_conn_str(drv, database), timeout=5)
+        except Exception as e:
+            last_error = e
+            continue
+        if drv != _driver_ok:
+            _driver_ok = drv
+            _save_driver_cache(drv)
+        return conn
+    raise DBNoDisponible(f"No se pudo conectar a SQL Server. Último error: {last_error}")
+
+def _motor():
+    import backends
+    return backends.motor()
+
+def forget_driver_cache():
+    """Descarta el driver cacheado (memoria y disco) para forzar un nuevo sondeo."""
+    global _driver_ok
+    _driver_ok = None
+    try:
+        os.remove(DRIVER_CACHE_PATH)
+    except OSError:
+        pass
+
+
+def _devuelta() -> Exception:
+    error = pyodbc.ProgrammingError if pyodbc is not None else sqlite3.ProgrammingError
+    return error("La conexión ya fue devuelta al pool.")
+
+
+class _PooledConnection:
+    """
+    Envoltorio de una conexión del pool: se usa igual que pyodbc.Connection,
+    pero close() la devuelve al pool en lugar de cerrarla.
+    """
+    __slots__ = ("_pool", "_raw", "_closed")
+
+    def __init__(self, pool: "ConnectionPool", raw: pyodbc.Connection):
+        object.__setattr__(self, "_pool", pool)
+        object.__setattr__(self, "_raw", raw)
+        object.__setattr__(self, "_closed", False)
+
+    def __getattr__(self, name):
+        if self._closed:
+            raise _devuelta()
+        return getattr(self._raw, name)
+
+    def __setattr__(self, name, value):
+        if self._closed:
+            raise _devuelta()
+        setattr(self._raw, name, value)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # mismo comportamiento que pyodbc.Connection: commit/rollback, sin cerrar
+        if exc_type is None:
+            self._raw.commit()
+        else:
+            self._raw.rollback()
+        return False
+
+    def close(self):
+        if self._closed:
+            return
+        object.__setattr__(self, "_closed", True)
+        self._pool._release(self._raw)
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+class ConnectionPool:
+    """
+    Pool de conexiones thread-safe a una base.
+    - Reutiliza conexiones ociosas (LIFO) en vez de conectar en cada consulta.
+    - Cierra las que superan POOL_IDLE_TIMEOUT, conservando POOL_MIN.
+    - Valida con SELECT 1 las que estuvieron ociosas más de POOL_PING_AFTER.
+    - Al devolver, hace rollback de lo pendiente y restablece autocommit y el timeout de consultas.
+    """
+    def __init__(self, database: str, min_size: int = POOL_MIN, max_size: int = POOL_MAX,
+                 idle_timeout: float = POOL_IDLE_TIMEOUT, ping_after: float = POOL_PING_AFTER,
+                 wait_timeout: float = POOL_WAIT_TIMEOUT):
+        self.database = database
+        self.min_size = max(0, int(min_size))
+        self.max_size = max(1, int(max_size))
+        self.idle_timeout = idle_timeout
+        self.ping_after = ping_after
+        self.wait_timeout = wait_timeout
+        self._cond = threading.Condition(threading.Lock())
+        self._idle = []          # [(conn, devuelta_en)]
+        self._open = 0           # abiertas (ociosas + en uso)
+        self._stats = {"creadas": 0, "reusadas": 0, "descartadas": 0,
+                       "pings_fallidos": 0, "esperas": 0, "timeouts": 0}
+
+    def _new_raw(self) -> pyodbc.Connection:
+        conn = _motor().conectar(self.database)
+        with self._cond:
+            self._stats["creadas"] += 1
+        return conn
+
+    @staticmethod
+    def _discard(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _reap_locked(self, now: float) -> list:
+        """Saca del pool las ociosas vencidas (las más viejas están al principio)."""
+        victims = []
+        while self._idle and self._open > self.min_size:
+            conn, since = self._idle[0]
+            if now - since < self.idle_timeout:
+                break
+            self._idle.pop(0)
+            self._open -= 1
+            victims.append(conn)
+        return victims
+
+    def _ping(self, conn) -> bool:
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT 1")
+            cur.fetchone()
+            cur.close()
+            return True
+        except Exception:
+            return False
+
+    def acquire(self) -> _PooledConnection:
+        deadline = time.monotonic() + self.wait_timeout
+        while True:
+            conn = since = None
+            create = False
+            with self._cond:
+                victims = self._reap_locked(time.monotonic())
+                while not self._idle and self._open >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats["timeouts"] += 1
+                        raise DBNoDisponible(
+                            f"No hay conexiones libres en el pool (máximo {self.max_size}).")
+                    self._stats["esperas"] += 1
+                    self._cond.wait(remaining)
+                if self._idle:
+                    conn, since = self._idle.pop()
+                else:
+                    self._open += 1
+                    create = True
+            for v in victims:
+                self._discard(v)
+
+            if create:
+                try:
+                    return _PooledConnection(self, self._new_raw())
+                except Exception:
+                    with self._cond:
+                        self._open -= 1
+                        self._cond.notify()
+                    raise
+
+            if time.monotonic() - since < self.ping_after or self._ping(conn):
+                with self._cond:
+                    self._stats["reusadas"] += 1
+                return _PooledConnection(self, conn)
+
+            # conexión muerta: se descarta y se intenta con otra
+            self._discard(conn)
+            with self._cond:
+                self._open -= 1
+                self._stats["pings_fallidos"] += 1
+                self._stats["descartadas"] += 1
+                self._cond.notify()
+
+    def _release(self, conn):
+        ok = True
+        try:
+            if not conn.autocommit:
+                conn.rollback()
+            else:
+                conn.autocommit = False
+            if conn.timeout:
+                conn.timeout = 0
+        except Exception:
+            ok = False
+        if not ok:
+            self._discard(conn)
+        with self._cond:
+            if ok:
+                self._idle.append((conn, time.monotonic()))
+            else:
+                self._open -= 1
+                self._stats["descartadas"] += 1
+            self._cond.notify()
+
+    def close_all(self):
+        """Cierra las conexiones ociosas (las que están en uso se cierran al devolverse)."""
+        with self._cond:
+            victims = [c for c, _ in self._idle]
+            self._idle.clear()
+            self._open -= len(victims)
+            self._stats["descartadas"] += len(victims)
+        for v in victims:
+            self._discard(v)
+
+    def stats(self) -> dict:
+        with self._cond:
+            data = dict(self._stats)
+            data.update(
+                database=self.database,
+                abiertas=self._open,
+                ociosas=len(self._idle),
+                en_uso=self._open - len(self._idle),
+                max=self.max_size,
+                min=self.min_size,
+            )
+            return data
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def _get_pool() -> ConnectionPool:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(DATABASE)
+    return _pool
+
+def get_connection(pooled: bool = True) -> pyodbc.Connection:
+    """
+    Conexión a la DB de negocio (VentasDB).
+    Por defecto sale del pool: conn.close() la devuelve para reutilizarla.
+    Con pooled=False abre una conexión directa (no compartida).
+    """
+    if not pooled:
+        return instrumentacion.envolver(_motor().conectar(DATABASE))
+    return instrumentacion.envolver(_get_pool().acquire())
+
+def pool_stats() -> dict:
+    """Métricas del pool para monitoreo (creadas, reusadas, en uso, esperas, etc.)."""
+    return _get_pool().stats()
+
+def close_pool():
+    """Cierra las conexiones ociosas del pool (p. ej. al salir de la app)."""
+    if _pool is not None:
+        _pool.close_all()
+
+def usar_backend(nombre: str, sqlite_path: str | None = None):
+    """
+    Cambia de motor en caliente (benchmarks, pruebas): descarta el pool y el
+    cache de esquema. Las conexiones en uso se cierran al devolverse.
+    """
+    global BACKEND, SQLITE_PATH, _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close_all()
+            _pool = None
+        BACKEND = nombre
+        if sqlite_path:
+            SQLITE_PATH = sqlite_path
+    schema_cache.invalidate()
 
-def get_connection() -> pyodbc.Connection:
-    """Conexión directa a la DB de negocio (VentasDB)."""
-    return _connect(DATABASE)
+
+class SchemaCache:
+    """
+    Cache de introspección del esquema (tablas y columnas existentes).
+    Se carga con una sola consulta al catálogo del motor (sys.tables/sys.columns
+    en SQL Server, sqlite_master en SQLite) y evita que los
+    repos consulten metadatos en cada operación. Llamar invalidate() después
+    de crear/alterar tablas fuera de ensure_schema().
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tables = None      # {(schema, tabla): {columnas}} en minúsculas
+
+    def load(self, cur=None):
+        sql = _motor().sql_catalogo
+        if cur is None:
+            conn = get_connection()
+            try:
+                c = conn.cursor()
+                c.execute(sql)
+                rows = c.fetchall()
+            finally:
+                conn.close()
+        else:
+            cur.execute(sql)
+            rows = cur.fetchall()
+
+        tables = {}
+        for sch, tab, col in rows:
+            cols = tables.setdefault((sch.lower(), tab.lower()), set())
+            if col:
+                cols.add(col.lower())
+        with self._lock:
+            self._tables = tables
+
+    def _get(self, cur=None) -> dict:
+        tables = self._tables
+        if tables is None:
+            self.load(cur)
+            tables = self._tables
+        return tables
+
+    def has_table(self, schema: str, name: str, cur=None) -> bool:
+        return (schema.lower(), name.lower()) in self._get(cur)
+
+    def has_column(self, schema: str, table: str, col: str, cur=None) -> bool:
+        cols = self._get(cur).get((schema.lower(), table.lower()))
+        return cols is not None and col.lower() in cols
+
+    def invalidate(self):
+        with self._lock:
+            self._tables = None
+
+
+schema_cache = SchemaCache()
+
+def invalidate_schema_cache():
+    """Fuerza a releer el esquema en la próxima consulta de metadatos."""
+    schema_cache.invalidate()
 
 
 def _ensure_database():
@@ -251,6 +704,119 @@ AND NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name='IX_Ventas_Fecha_Metodo' AN
 BEGIN
     CREATE INDEX IX_Ventas_Fecha_Metodo ON dbo.Ventas(Fecha, MetodoPago);
 END
+""")
+
+        conn.commit()
+
+def _ensure_indices_listado(conn: pyodbc.Connection):
+    """Listado de ventas paginado (VentaRepo.pagina): filtro por cliente y orden por monto."""
+    with conn.cursor() as cur:
+        cur.execute("""
+IF OBJECT_ID('dbo.Ventas','U') IS NOT NULL
+AND NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name='IX_Ventas_Cliente_Fecha' AND object_id=OBJECT_ID('dbo.Ventas'))
+BEGIN
+    CREATE INDEX IX_Ventas_Cliente_Fecha ON dbo.Ventas(ClienteID, Fecha DESC);
+END
+""")
+        cur.execute("""
+IF OBJECT_ID('dbo.Ventas','U') IS NOT NULL
+AND NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name='IX_Ventas_Total' AND object_id=OBJECT_ID('dbo.Ventas'))
+BEGIN
+    CREATE INDEX IX_Ventas_Total ON dbo.Ventas(Total DESC);
+END
+""")
+        conn.commit()
+
+def _ensure_rowversion(conn: pyodbc.Connection):
+    """RowVer: versión de fila para sincronizar el catálogo por deltas (ProductoRepo.cambios_desde)."""
+    with conn.cursor() as cur:
+        cur.execute("""
+IF OBJECT_ID('dbo.Productos','U') IS NOT NULL AND COL_LENGTH('dbo.Productos','RowVer') IS NULL
+    ALTER TABLE dbo.Productos ADD RowVer ROWVERSION;
+""")
+        cur.execute("""
+IF COL_LENGTH('dbo.Productos','RowVer') IS NOT NULL
+AND NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name='IX_Productos_RowVer' AND object_id=OBJECT_ID('dbo.Productos'))
+BEGIN
+    CREATE INDEX IX_Productos_RowVer ON dbo.Productos(RowVer);
+END
+""")
+        conn.commit()
+
+def _ensure_idempotencia(conn: pyodbc.Connection):
+    """Clave de idempotencia del carrito: reenviar la misma venta devuelve la original."""
+    with conn.cursor() as cur:
+        cur.execute("""
+IF OBJECT_ID('dbo.Ventas','U') IS NOT NULL AND COL_LENGTH('dbo.Ventas','ClaveIdem') IS NULL
+    ALTER TABLE dbo.Ventas ADD ClaveIdem VARCHAR(64) NULL;
+""")
+        # aparte: en el mismo lote la columna nueva todavía no existe para el CREATE INDEX
+        cur.execute("""
+IF COL_LENGTH('dbo.Ventas','ClaveIdem') IS NOT NULL
+AND NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name='UX_Ventas_ClaveIdem' AND object_id=OBJECT_ID('dbo.Ventas'))
+BEGIN
+    CREATE UNIQUE INDEX UX_Ventas_ClaveIdem ON dbo.Ventas(ClaveIdem) WHERE ClaveIdem IS NOT NULL;
+END
+""")
+        conn.commit()
+
+def _ensure_usuario_venta(conn: pyodbc.Connection):
+    """Quién hizo la venta (para los resúmenes por usuario)."""
+    with conn.cursor() as cur:
+        cur.execute("""
+IF OBJECT_ID('dbo.Ventas','U') IS NOT NULL AND COL_LENGTH('dbo.Ventas','UsuarioID') IS NULL
+    ALTER TABLE dbo.Ventas ADD UsuarioID INT NULL;
+""")
+        conn.commit()
+
+def _ensure_summary_tables(conn: pyodbc.Connection) -> bool:
+    """
+    Resúmenes de ventas que mantiene VentaRepo.crear_venta en la misma transacción:
+    por hora/medio de pago/usuario y por día/producto. Devuelve True si los creó
+    (hay que reconstruirlos desde las ventas existentes).
+    """
+    with conn.cursor() as cur:
+        cur.execute("SELECT OBJECT_ID('dbo.ResumenVentasHora','U'), OBJECT_ID('dbo.ResumenProductoDia','U')")
+        hora, prod = cur.fetchone()
+        if hora is None:
+            cur.execute("""
+CREATE TABLE dbo.ResumenVentasHora(
+    Hora       DATETIME2(0)  NOT NULL,
+    Medio      NVARCHAR(30)  NOT NULL,
+    UsuarioID  INT           NOT NULL,   -- 0 = sin usuario
+    Ventas     INT           NOT NULL,
+    Total      DECIMAL(18,2) NOT NULL,
+    CONSTRAINT PK_ResumenVentasHora PRIMARY KEY (Hora, Medio, UsuarioID)
+);
+""")
+        if prod is None:
+            cur.execute("""
+CREATE TABLE dbo.ResumenProductoDia(
+    Dia        DATE          NOT NULL,
+    ProductoID INT           NOT NULL,
+    Cantidad   DECIMAL(18,3) NOT NULL,
+    Importe    DECIMAL(18,2) NOT NULL,
+    CONSTRAINT PK_ResumenProductoDia PRIMARY KEY (Dia, ProductoID)
+);
+""")
+        conn.commit()
+        return hora is None or prod is None
+
+def _ensure_ticket_archive(conn: pyodbc.Connection):
+    """Índice del archivo de tickets: qué PDF (por hash de contenido) tiene cada venta."""
+    with conn.cursor() as cur:
+        cur.execute("""
+IF OBJECT_ID('dbo.TicketArchivo','U') IS NULL
+BEGIN
+    CREATE TABLE dbo.TicketArchivo(
+        TicketArchivoID INT IDENTITY(1,1) PRIMARY KEY,
+        VentaID         INT          NOT NULL,
+        Sha256          CHAR(64)     NOT NULL,
+        Bytes           INT          NOT NULL,
+        CreadoEn        DATETIME2(0) NOT NULL CONSTRAINT DF_TicketArchivo_CreadoEn DEFAULT SYSUTCDATETIME()
+    );
+    CREATE INDEX IX_TicketArchivo_Venta ON dbo.TicketArchivo(VentaID, TicketArchivoID DESC) INCLUDE (Sha256);
+END
 """)
         conn.commit()
 
@@ -285,14 +851,22 @@ def _ensure_default_admin(conn: pyodbc.Connection):
 
 
 def ensure_schema():
-
-    _ensure_database()
+    motor = _motor()
+    motor.crear_base()
 
     conn = get_connection()
     try:
         conn.autocommit = True        
-        _ensure_core_tables(conn)
-        _ensure_optional_tables(conn)
-        _ensure_default_admin(conn)
+        resumen_nuevo = motor.crear_esquema(conn)
+        with conn.cursor() as cur:
+            schema_cache.load(cur)
     finally:
-        conn.close()
\ No newline at end of file
+        conn.close()
+
+    if resumen_nuevo:
+        from repos import ResumenRepo
+        ResumenRepo.reconstruir()
+
+
+if INSTRUMENTAR:
+    instrumentacion.activar()
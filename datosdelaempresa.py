@@ -2,6 +2,7 @@ import os
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 from repos import EmpresaRepo
+import tareas
 
 class DatosEmpresaFrame(ttk.Frame):
     def __init__(self, parent, on_saved=None):
@@ -45,12 +46,17 @@ class DatosEmpresaFrame(ttk.Frame):
             self.vars["LogoPath"].set(path)
 
     def _load(self):
-        try:
-            info = EmpresaRepo.obtener()
-            for k in self.vars:
-                self.vars[k].set(info.get(k) or "")
-        except Exception as e:
-            messagebox.showerror("Empresa", str(e))
+        tareas.de(self).submit(
+            EmpresaRepo.obtener,
+            forzar=True,        # pantalla de edición: siempre lo que hay en la base
+            on_done=self._set_info,
+            on_error=lambda e: messagebox.showerror("Empresa", str(e)),
+            grupo=self, clave=(str(self), "load"), descripcion="Cargando datos de la empresa…",
+        )
+
+    def _set_info(self, info):
+        for k in self.vars:
+            self.vars[k].set(info.get(k) or "")
 
     def _save(self):
         nombre = self.vars["Nombre"].get().strip()
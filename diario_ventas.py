@@ -0,0 +1,298 @@
+"""
+Diario local de ventas: la caja sigue vendiendo aunque SQL Server no responda.
+
+Si la base no está disponible (o ya hay ventas esperando en el diario, para
+no alterar el orden) NuevaVentaFrame guarda la venta en un SQLite local con
+synchronous=FULL: cuando registrar() vuelve, la venta está en disco. Un hilo
+replicador la manda a VentaRepo.crear_venta, en orden de llegada y con su
+fecha original, cuando la conexión vuelve.
+
+Cada entrada se envía con su Clave como clave de idempotencia (la del
+carrito si vino de la caja): si un envío anterior llegó a grabarse,
+crear_venta devuelve la venta original en vez de duplicarla. Por eso un
+corte durante el commit o un cierre de la app a mitad del envío se
+resuelven solos reintentando, siempre que la base aplique la clave
+(Ventas.ClaveIdem). Si no la aplica nada se reintenta a ciegas: la
+entrada pasa a REVISAR.
+
+Estados de cada entrada:
+- PENDIENTE: esperando envío
+- ENVIANDO:  en curso. Si la app se cierra acá, al volver queda PENDIENTE si la
+             base aplica la clave, o REVISAR si no
+- OK:        registrada; VentaID tiene el número definitivo
+- ERROR:     la base la rechazó (ej. stock insuficiente): hay que resolverla a mano
+- REVISAR:   no se puede saber ni reintentar sin riesgo de duplicar (base sin
+             Ventas.ClaveIdem, o entradas de versiones anteriores enviadas sin
+             clave); se resuelven a mano
+"""
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+import config
+from repos import ClaveNoSoportada, VentaRepo, VentaIncierta
+
+REINTENTO_MIN = 2.0      # s entre reintentos con la base caída (se duplica hasta el máximo)
+REINTENTO_MAX = 60.0
+REVISAR_CADA = 30.0      # s entre pasadas aunque nadie avise (por si la base volvió sola)
+
+ESTADOS = ("PENDIENTE", "ENVIANDO", "OK", "ERROR", "REVISAR")
+
+
+class DiarioVentas:
+    def __init__(self, path: str):
+        self.path = path
+        self._hay_trabajo = threading.Event()
+        self._detener = threading.Event()
+        self._hilo: Optional[threading.Thread] = None
+        self._on_replicada: List[Callable[[int, int], None]] = []
+        self._crear()
+
+    # ---------------- SQLite ----------------
+    def _conn(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA synchronous=FULL")     # fsync en cada commit
+        return conn
+
+    def _crear(self):
+        conn = self._conn()
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS Diario (
+                    DiarioID    INTEGER PRIMARY KEY AUTOINCREMENT,
+                    Clave       TEXT NOT NULL UNIQUE,
+                    Datos       TEXT NOT NULL,
+                    Total       REAL NOT NULL,
+                    Fecha       TEXT NOT NULL,
+                    Estado      TEXT NOT NULL DEFAULT 'PENDIENTE',
+                    Intentos    INTEGER NOT NULL DEFAULT 0,
+                    VentaID     INTEGER NULL,
+                    Error       TEXT NULL,
+                    Actualizado REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS IX_Diario_Estado ON Diario(Estado, DiarioID)")
+        finally:
+            conn.close()
+
+    # ---------------- API (caja) ----------------
+    def registrar(self, venta: Dict[str, Any], total: float) -> int:
+        """
+        Guarda una venta con los mismos argumentos de VentaRepo.crear_venta
+        (cliente_id, items, metodo_pago, clave, ...). Devuelve el número de
+        diario; registrar dos veces la misma clave devuelve la misma entrada.
+        """
+        fecha = venta.get("fecha") or datetime.utcnow()
+        clave = venta.get("clave") or uuid.uuid4().hex
+        datos = {k: v for k, v in venta.items() if k not in ("fecha", "clave")}
+        conn = self._conn()
+        try:
+            cur = conn.execute("""
+                INSERT OR IGNORE INTO Diario(Clave, Datos, Total, Fecha, Actualizado) VALUES (?,?,?,?,?)
+            """, (clave, json.dumps(datos), float(total), fecha.isoformat(), time.time()))
+            if cur.rowcount:
+                did = cur.lastrowid
+            else:
+                did = conn.execute("SELECT DiarioID FROM Diario WHERE Clave=?", (clave,)).fetchone()[0]
+        finally:
+            conn.close()
+        self._hay_trabajo.set()
+        return did
+
+    def hay_pendientes(self) -> bool:
+        """True si hay ventas sin enviar: las nuevas tienen que ir detrás de ellas."""
+        conn = self._conn()
+        try:
+            row = conn.execute(
+                "SELECT 1 FROM Diario WHERE Estado IN ('PENDIENTE','ENVIANDO') LIMIT 1").fetchone()
+        finally:
+            conn.close()
+        return row is not None
+
+    def resumen(self) -> Dict[str, int]:
+        conn = self._conn()
+        try:
+            rows = conn.execute("SELECT Estado, COUNT(*) FROM Diario GROUP BY Estado").fetchall()
+        finally:
+            conn.close()
+        out = {e: 0 for e in ESTADOS}
+        out.update({r[0]: r[1] for r in rows})
+        return out
+
+    def entradas(self, estado: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        sql, params = "SELECT * FROM Diario", ()
+        if estado:
+            sql, params = sql + " WHERE Estado=?", (estado,)
+        conn = self._conn()
+        try:
+            rows = conn.execute(sql + " ORDER BY DiarioID DESC LIMIT ?", params + (int(limit),)).fetchall()
+        finally:
+            conn.close()
+        return [dict(r) for r in rows]
+
+    def reintentar(self, diario_id: int) -> bool:
+        """Vuelve a PENDIENTE una entrada en ERROR o REVISAR (para REVISAR: confirmar antes que no esté en la base)."""
+        return self._cambiar(diario_id, "PENDIENTE", ("ERROR", "REVISAR"))
+
+    def descartar(self, diario_id: int, venta_id: Optional[int] = None) -> bool:
+        """Cierra una entrada en ERROR/REVISAR sin enviarla (ej. ya estaba registrada como venta_id)."""
+        return self._cambiar(diario_id, "OK", ("ERROR", "REVISAR"), venta_id)
+
+    def _cambiar(self, diario_id: int, estado: str, desde: tuple, venta_id: Optional[int] = None) -> bool:
+        conn = self._conn()
+        try:
+            n = conn.execute(f"""
+                UPDATE Diario SET Estado=?, VentaID=COALESCE(?, VentaID), Actualizado=?
+                WHERE DiarioID=? AND Estado IN ({",".join("?" * len(desde))})
+            """, (estado, venta_id, time.time(), int(diario_id)) + desde).rowcount
+        finally:
+            conn.close()
+        if n and estado == "PENDIENTE":
+            self._hay_trabajo.set()
+        return bool(n)
+
+    def on_replicada(self, callback: Callable[[int, int], None]):
+        """callback(diario_id, venta_id) desde el hilo replicador cuando una venta llega a la base."""
+        if callback not in self._on_replicada:
+            self._on_replicada.append(callback)
+
+    # ---------------- replicador ----------------
+    def iniciar(self):
+        if self._hilo is None or not self._hilo.is_alive():
+            self._detener.clear()
+            self._hilo = threading.Thread(target=self._loop, name="diario-ventas", daemon=True)
+            self._hilo.start()
+
+    def detener(self, timeout: float = 5.0):
+        self._detener.set()
+        self._hay_trabajo.set()
+        if self._hilo is not None:
+            self._hilo.join(timeout)
+
+    def avisar(self):
+        """Despierta al replicador (ej. la caja acaba de grabar directo: la base volvió)."""
+        self._hay_trabajo.set()
+
+    def _tomar(self) -> Optional[sqlite3.Row]:
+        conn = self._conn()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT * FROM Diario WHERE Estado='PENDIENTE' ORDER BY DiarioID LIMIT 1").fetchone()
+            if row is not None:
+                conn.execute("UPDATE Diario SET Estado='ENVIANDO', Intentos=Intentos+1, Actualizado=? "
+                             "WHERE DiarioID=?", (time.time(), row["DiarioID"]))
+            conn.execute("COMMIT")
+            return row
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def _marcar(self, diario_id: int, estado: str, venta_id: Optional[int] = None,
+                error: Optional[str] = None):
+        conn = self._conn()
+        try:
+            conn.execute("UPDATE Diario SET Estado=?, VentaID=?, Error=?, Actualizado=? WHERE DiarioID=?",
+                         (estado, venta_id, error, time.time(), diario_id))
+        finally:
+            conn.close()
+
+    def _recuperar_envios(self):
+        """
+        Envíos que quedaron a medias (la app se cerró en ENVIANDO). Si la base
+        aplica la clave se repiten; si no, no se sabe si llegaron: a REVISAR.
+        Necesita la base, así que lo corre el replicador antes de empezar.
+        """
+        conn = self._conn()
+        try:
+            hay = conn.execute("SELECT 1 FROM Diario WHERE Estado='ENVIANDO' LIMIT 1").fetchone()
+        finally:
+            conn.close()
+        if hay is None:
+            return
+        if VentaRepo.clave_disponible():
+            estado, error = "PENDIENTE", "La app se cerró durante el envío"
+        else:
+            estado, error = "REVISAR", "La app se cerró durante el envío y la base no tiene Ventas.ClaveIdem"
+        conn = self._conn()
+        try:
+            conn.execute("UPDATE Diario SET Estado=?, Error=?, Actualizado=? WHERE Estado='ENVIANDO'",
+                         (estado, error, time.time()))
+        finally:
+            conn.close()
+
+    def _enviar(self, row) -> int:
+        datos = json.loads(row["Datos"])
+        venta_id, _, _ = VentaRepo.crear_venta(
+            fecha=datetime.fromisoformat(row["Fecha"]), clave=row["Clave"], **datos)
+        return venta_id
+
+    def _loop(self):
+        espera = REINTENTO_MIN
+        while not self._detener.is_set():
+            try:
+                self._recuperar_envios()
+                break
+            except Exception as e:
+                print("WARN diario de ventas (recuperando envíos):", e)
+                self._detener.wait(espera)
+                espera = min(REINTENTO_MAX, espera * 2)
+        espera = REINTENTO_MIN
+        while not self._detener.is_set():
+            try:
+                row = self._tomar()
+            except Exception as e:
+                print("WARN diario de ventas:", e)
+                self._detener.wait(REINTENTO_MIN)
+                continue
+            if row is None:
+                self._hay_trabajo.wait(REVISAR_CADA)
+                self._hay_trabajo.clear()
+                continue
+            did = row["DiarioID"]
+            try:
+                venta_id = self._enviar(row)
+            except Exception as e:
+                if isinstance(e, ClaveNoSoportada):
+                    # sin la clave en la base un reintento podría duplicarla
+                    self._marcar(did, "REVISAR", error=str(e)[:500])
+                elif isinstance(e, VentaIncierta) or config.es_db_no_disponible(e):
+                    # vuelve a la fila en su lugar y se espera a la base. VentaIncierta sólo
+                    # sale con la clave aplicada (si no, es ClaveNoSoportada antes de grabar):
+                    # si el commit había llegado, el reenvío devuelve la venta original
+                    self._marcar(did, "PENDIENTE", error=str(e)[:500])
+                    self._hay_trabajo.wait(espera)
+                    self._hay_trabajo.clear()
+                    espera = min(REINTENTO_MAX, espera * 2)
+                else:
+                    self._marcar(did, "ERROR", error=str(e)[:500])
+                continue
+            espera = REINTENTO_MIN
+            self._marcar(did, "OK", venta_id=venta_id)
+            for cb in list(self._on_replicada):
+                try:
+                    cb(did, venta_id)
+                except Exception as e:
+                    print("WARN diario de ventas (callback):", e)
+
+
+_diario: Optional[DiarioVentas] = None
+_diario_lock = threading.Lock()
+
+
+def diario() -> DiarioVentas:
+    """Diario compartido del proceso (se crea y arranca el replicador la primera vez)."""
+    global _diario
+    with _diario_lock:
+        if _diario is None:
+            _diario = DiarioVentas(config.DIARIO_VENTAS_PATH)
+            _diario.iniciar()
+        return _diario
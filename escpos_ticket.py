@@ -0,0 +1,248 @@
+"""
+Tickets para impresoras térmicas (ESC/POS, papel de 58 u 80 mm).
+
+En vez de dibujar un PDF A4 y abrir un visor, se arma el ticket como texto
+de ancho fijo con los comandos de la impresora (negrita, doble alto, QR
+nativo, corte) y se mandan los bytes directo al destino:
+
+- una ruta de archivo o dispositivo:  /dev/usb/lp0, \\\\PC\\POS80, tickets/t_{venta_id}.bin
+- una impresora de red:               tcp://192.168.0.50:9100
+
+Para probar sin impresora hay un receptor TCP que guarda lo que recibe:
+
+    python escpos_ticket.py escuchar --puerto 9100 --carpeta tickets_escpos
+    VENTAS_TICKET_BACKEND=escpos VENTAS_TICKET_DESTINO=tcp://127.0.0.1:9100 python ventas_app.py
+"""
+import argparse
+import os
+import socket
+import time
+from datetime import datetime
+from typing import List, Optional
+
+import config
+from tickets import datos_empresa, datos_venta, fmt_ar as _fmt_num
+
+ESC, GS = b"\x1b", b"\x1d"
+
+# Columnas con la fuente A (12x24) según el ancho del papel
+COLUMNAS = {58: 32, 80: 48}
+
+# PC850 (Europa occidental) trae á, é, ñ, ü, etc.; ESC t 2 la selecciona
+_CODEPAGE_N = 2
+_CODEPAGE = "cp850"
+
+TCP_TIMEOUT = 5.0
+
+
+class EscPos:
+    """Arma un stream ESC/POS en memoria. Los métodos devuelven self para encadenar."""
+    def __init__(self, columnas: int = 48):
+        self.columnas = columnas
+        self._ancho = columnas            # columnas útiles con el tamaño de letra actual
+        self._buf = bytearray()
+        self._buf += ESC + b"@"                               # reset
+        self._buf += ESC + b"t" + bytes([_CODEPAGE_N])
+
+    def raw(self, data: bytes) -> "EscPos":
+        self._buf += data
+        return self
+
+    def alinear(self, modo: str = "izq") -> "EscPos":
+        self._buf += ESC + b"a" + bytes([{"izq": 0, "centro": 1, "der": 2}[modo]])
+        return self
+
+    def negrita(self, on: bool = True) -> "EscPos":
+        self._buf += ESC + b"E" + bytes([1 if on else 0])
+        return self
+
+    def grande(self, on: bool = True) -> "EscPos":
+        # doble ancho y doble alto: entran la mitad de columnas
+        self._buf += GS + b"!" + bytes([0x11 if on else 0x00])
+        self._ancho = self.columnas // 2 if on else self.columnas
+        return self
+
+    def linea(self, texto: str = "") -> "EscPos":
+        self._buf += texto.encode(_CODEPAGE, errors="replace") + b"\n"
+        return self
+
+    def separador(self, car: str = "-") -> "EscPos":
+        return self.linea(car * self._ancho)
+
+    def dos_columnas(self, izq: str, der: str) -> "EscPos":
+        espacio = self._ancho - len(der)
+        if len(izq) >= espacio:
+            self.linea(izq[:self._ancho])
+            return self.linea(der.rjust(self._ancho))
+        return self.linea(izq.ljust(espacio) + der)
+
+    def texto_ajustado(self, texto: str) -> "EscPos":
+        for ln in _partir(texto, self._ancho):
+            self.linea(ln)
+        return self
+
+    def avanzar(self, n: int = 1) -> "EscPos":
+        self._buf += ESC + b"d" + bytes([max(0, min(255, n))])
+        return self
+
+    def qr(self, data: str, modulo: int = 6) -> "EscPos":
+        """QR nativo de la impresora (GS ( k, modelo 2, corrección M)."""
+        d = data.encode("ascii", errors="replace")
+        largo = len(d) + 3
+        self._buf += GS + b"(k" + bytes([4, 0, 49, 65, 50, 0])                 # modelo 2
+        self._buf += GS + b"(k" + bytes([3, 0, 49, 67, max(1, min(16, modulo))])
+        self._buf += GS + b"(k" + bytes([3, 0, 49, 69, 49])                    # corrección M
+        self._buf += GS + b"(k" + bytes([largo & 0xFF, largo >> 8, 49, 80, 48]) + d
+        self._buf += GS + b"(k" + bytes([3, 0, 49, 81, 48])                    # imprimir
+        return self
+
+    def cortar(self) -> "EscPos":
+        self._buf += GS + b"VB" + b"\x00"      # avanza hasta la cuchilla y corte parcial
+        return self
+
+    def datos(self) -> bytes:
+        return bytes(self._buf)
+
+
+def _partir(texto: str, ancho: int) -> List[str]:
+    """Corta por palabras a `ancho` caracteres (las palabras más largas se parten)."""
+    lineas, cur = [], ""
+    for w in (texto or "").split():
+        while len(w) > ancho:
+            if cur:
+                lineas.append(cur)
+                cur = ""
+            lineas.append(w[:ancho])
+            w = w[ancho:]
+        if not cur:
+            cur = w
+        elif len(cur) + 1 + len(w) <= ancho:
+            cur = f"{cur} {w}"
+        else:
+            lineas.append(cur)
+            cur = w
+    if cur or not lineas:
+        lineas.append(cur)
+    return lineas
+
+
+def render_ticket(cab, det, empresa: dict, ancho_mm: int = 80, qr: bool = True) -> bytes:
+    """Stream ESC/POS de un ticket con los mismos datos que el PDF."""
+    cols = COLUMNAS.get(int(ancho_mm), COLUMNAS[80])
+    p = EscPos(cols)
+    venta_id, fecha, total, cliente = cab
+
+    p.alinear("centro").negrita().grande()
+    p.texto_ajustado(empresa.get("Nombre") or "SISTEMA DE VENTAS")
+    p.grande(False).negrita(False)
+    info = []
+    if empresa.get("CUIT"): info.append(f"CUIT: {empresa['CUIT']}")
+    if empresa.get("CondicionIVA"): info.append(f"IVA: {empresa['CondicionIVA']}")
+    for parte in (" - ".join(info), empresa.get("Direccion"),
+                  f"Tel: {empresa['Telefono']}" if empresa.get("Telefono") else None,
+                  empresa.get("Email")):
+        if parte:
+            p.texto_ajustado(parte)
+
+    if isinstance(fecha, datetime):
+        fecha_txt = fecha.strftime("%d/%m/%Y %H:%M")
+    else:
+        fecha_txt = str(fecha or "")
+    p.alinear("izq").separador()
+    p.dos_columnas(f"Ticket N° {venta_id}", fecha_txt)
+    p.texto_ajustado(f"Cliente: {cliente or '-'}")
+    p.separador()
+
+    total_calc = 0.0
+    for _, nombre, cantidad, punit in det:
+        cantidad = float(cantidad)
+        punit = float(punit)
+        importe = cantidad * punit
+        total_calc += importe
+        p.texto_ajustado(nombre or "")
+        p.dos_columnas(f"  {_fmt_num(cantidad, 3)} x {_fmt_num(punit)}", _fmt_num(importe))
+
+    p.separador()
+    total = float(total or 0.0)
+    p.negrita().grande().dos_columnas("TOTAL", f"$ {_fmt_num(total)}").grande(False).negrita(False)
+    if abs(total_calc - total) > 0.01:
+        p.dos_columnas("", f"(Recalculado: $ {_fmt_num(total_calc)})")
+
+    p.avanzar(1).alinear("centro")
+    p.texto_ajustado("Cambio y devoluciones dentro de 48h con ticket. Muchas gracias.")
+    if qr:
+        p.avanzar(1).qr(f"venta:{venta_id}", modulo=5 if cols <= 32 else 6)
+    p.avanzar(3).cortar()
+    return p.datos()
+
+
+def enviar(datos: bytes, destino: str) -> str:
+    """Manda los bytes a tcp://host[:puerto] o los escribe en la ruta/dispositivo."""
+    if destino.startswith("tcp://"):
+        host, _, puerto = destino[len("tcp://"):].rstrip("/").partition(":")
+        with socket.create_connection((host, int(puerto or 9100)), timeout=TCP_TIMEOUT) as s:
+            s.sendall(datos)
+        return destino
+    carpeta = os.path.dirname(destino)
+    if carpeta and not os.path.isdir(carpeta):
+        try:
+            os.makedirs(carpeta, exist_ok=True)
+        except OSError:
+            pass        # dispositivo o recurso compartido: que falle el open con su error
+    with open(destino, "wb") as f:
+        f.write(datos)
+    return destino
+
+
+def imprimir_ticket(venta_id: int, destino: Optional[str] = None,
+                    ancho_mm: Optional[int] = None) -> str:
+    """Lee la venta, arma el ticket y lo manda al destino. Devuelve el destino usado."""
+    cab, det = datos_venta(venta_id)
+    datos = render_ticket(cab, det, datos_empresa(), ancho_mm or config.TICKET_ANCHO_MM)
+    destino = destino or config.TICKET_DESTINO or f"ticket_{venta_id}.bin"
+    if "{venta_id}" in destino:
+        destino = destino.replace("{venta_id}", str(venta_id))
+    return enviar(datos, destino)
+
+
+def escuchar(puerto: int = 9100, carpeta: str = "tickets_escpos", host: str = "127.0.0.1"):
+    """Receptor de prueba que hace de impresora de red: guarda cada ticket en un .bin."""
+    os.makedirs(carpeta, exist_ok=True)
+    with socket.create_server((host, puerto)) as srv:
+        print(f"Escuchando ESC/POS en {host}:{puerto} -> {os.path.abspath(carpeta)}")
+        n = 0
+        while True:
+            conn, addr = srv.accept()
+            with conn:
+                partes = []
+                while True:
+                    b = conn.recv(65536)
+                    if not b:
+                        break
+                    partes.append(b)
+            n += 1
+            ruta = os.path.join(carpeta, f"ticket_{int(time.time() * 1000)}_{n}.bin")
+            with open(ruta, "wb") as f:
+                f.write(b"".join(partes))
+            print(f"{addr[0]}: {sum(len(x) for x in partes)} bytes -> {ruta}")
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Tickets ESC/POS")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("escuchar", help="Impresora de red de prueba (guarda lo recibido)")
+    p.add_argument("--puerto", type=int, default=9100)
+    p.add_argument("--carpeta", default="tickets_escpos")
+    p = sub.add_parser("imprimir", help="Imprime el ticket de una venta")
+    p.add_argument("venta_id", type=int)
+    p.add_argument("--destino", default=None)
+    p.add_argument("--ancho", type=int, choices=sorted(COLUMNAS), default=None)
+    args = ap.parse_args(argv)
+    if args.cmd == "escuchar":
+        escuchar(args.puerto, args.carpeta)
+    else:
+        print(imprimir_ticket(args.venta_id, args.destino, args.ancho))
+
+
+if __name__ == "__main__":
+    main()
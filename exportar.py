@@ -0,0 +1,261 @@
+"""
+Exportación de ventas en streaming (CSV o XLSX) directo desde la DB.
+
+Una sola consulta sobre dbo.Ventas (+ Clientes y, si se pide, VentaDetalle)
+que se lee con fetchmany de a LOTE filas y se escribe a medida que llega:
+la memoria no depende del período exportado.
+
+El .xlsx se escribe a mano (zipfile + XML de una hoja con inlineStr), sin
+openpyxl: la hoja se va volcando dentro del zip mientras se leen las filas.
+"""
+import csv
+import os
+import re
+import zipfile
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Callable, Iterator, List, Optional, Sequence, Tuple
+
+from config import get_connection
+from repos import VentaRepo
+
+LOTE = 2000
+
+_COLS_VENTA = [
+    ("ID", "v.VentaID"),
+    ("Fecha", "v.Fecha"),
+    ("ClienteID", "v.ClienteID"),
+    ("Cliente", "c.Nombre"),
+    ("Método de pago", "v.MetodoPago"),
+    ("Total", "v.Total"),
+    ("Entregado", "v.Entregado"),
+    ("Vuelto", "v.Vuelto"),
+    ("Descuento %", "v.DescuentoPct"),
+    ("Recargo %", "v.RecargoPct"),
+]
+_COLS_DETALLE = [
+    ("ProductoID", "d.ProductoID"),
+    ("Producto", "p.Nombre"),
+    ("Cantidad", "d.Cantidad"),
+    ("Precio unitario", "d.PrecioUnitario"),
+    ("Subtotal", "d.Cantidad * d.PrecioUnitario"),
+]
+
+
+def iterar_ventas(detalle: bool = False, lote: int = LOTE, **filtros) -> Iterator[Tuple[List[str], List[tuple]]]:
+    """
+    Genera (encabezados, filas) de a `lote` filas. Con detalle=True sale una fila
+    por ítem vendido. Filtros: los mismos de VentaRepo.pagina (desde, hasta, cliente_id,
+    cliente, metodo_pago, monto_min, monto_max).
+    """
+    cols = _COLS_VENTA + (_COLS_DETALLE if detalle else [])
+    where, params = VentaRepo._filtros_sql(filtros)
+    sql = (
+        "SELECT " + ", ".join(expr for _, expr in cols) +
+        " FROM dbo.Ventas v LEFT JOIN dbo.Clientes c ON c.ClienteID = v.ClienteID"
+        + (" LEFT JOIN dbo.VentaDetalle d ON d.VentaID = v.VentaID"
+           " LEFT JOIN dbo.Productos p ON p.ProductoID = d.ProductoID" if detalle else "")
+        + (" WHERE " + " AND ".join(where) if where else "")
+        + " ORDER BY v.Fecha, v.VentaID" + (", d.DetalleID" if detalle else "")
+    )
+    encabezados = [h for h, _ in cols]
+    conn = get_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute(sql, tuple(params))
+        while True:
+            rows = cur.fetchmany(lote)
+            if not rows:
+                break
+            yield encabezados, [tuple(r) for r in rows]
+    finally:
+        conn.close()
+
+
+# ---------------- CSV ----------------
+class _CsvWriter:
+    def __init__(self, path: str):
+        self._f = open(path, "w", newline="", encoding="utf-8")
+        self._w = csv.writer(self._f)
+
+    def encabezado(self, cols: Sequence[str]):
+        self._w.writerow(cols)
+
+    def filas(self, rows: List[tuple]):
+        self._w.writerows(rows)
+
+    def cerrar(self):
+        self._f.close()
+
+
+# ---------------- XLSX ----------------
+_XML_INVALIDO = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+_EPOCH_EXCEL = datetime(1899, 12, 30)
+_MAX_FILAS_XLSX = 1_048_576
+
+_CONTENT_TYPES = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+<Default Extension="xml" ContentType="application/xml"/>
+<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>
+<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>
+<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>
+</Types>"""
+_RELS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>
+</Relationships>"""
+_WORKBOOK = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">
+<sheets><sheet name="{hoja}" sheetId="1" r:id="rId1"/></sheets>
+</workbook>"""
+_WORKBOOK_RELS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>
+<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>
+</Relationships>"""
+# estilos: 0 general, 1 fecha-hora, 2 importe, 3 encabezado en negrita
+_STYLES = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">
+<numFmts count="1"><numFmt numFmtId="164" formatCode="yyyy-mm-dd hh:mm:ss"/></numFmts>
+<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font><font><b/><sz val="11"/><name val="Calibri"/></font></fonts>
+<fills count="2"><fill><patternFill patternType="none"/></fill><fill><patternFill patternType="gray125"/></fill></fills>
+<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>
+<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>
+<cellXfs count="4">
+<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>
+<xf numFmtId="164" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>
+<xf numFmtId="4" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>
+<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/>
+</cellXfs>
+</styleSheet>"""
+
+
+def _col_letra(i: int) -> str:
+    s = ""
+    i += 1
+    while i:
+        i, r = divmod(i - 1, 26)
+        s = chr(65 + r) + s
+    return s
+
+
+def _esc(texto: str) -> str:
+    texto = _XML_INVALIDO.sub("", texto)
+    return texto.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;").replace('"', "&quot;")
+
+
+class _XlsxWriter:
+    """Una hoja, escrita en streaming dentro del zip (no se arma el XML en memoria)."""
+    def __init__(self, path: str, hoja: str = "Ventas"):
+        self._zip = zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED)
+        self._zip.writestr("[Content_Types].xml", _CONTENT_TYPES)
+        self._zip.writestr("_rels/.rels", _RELS)
+        self._zip.writestr("xl/workbook.xml", _WORKBOOK.format(hoja=_esc(hoja)))
+        self._zip.writestr("xl/_rels/workbook.xml.rels", _WORKBOOK_RELS)
+        self._zip.writestr("xl/styles.xml", _STYLES)
+        self._sheet = self._zip.open("xl/worksheets/sheet1.xml", "w", force_zip64=True)
+        self._sheet.write(
+            b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+            b'<sheetData>'
+        )
+        self._fila = 0
+        self._letras: List[str] = []
+        self._importes = set()
+
+    def encabezado(self, cols: Sequence[str]):
+        self._letras = [_col_letra(i) for i in range(len(cols))]
+        self._importes = {i for i, c in enumerate(cols)
+                          if c in ("Total", "Entregado", "Vuelto", "Precio unitario", "Subtotal")}
+        self._escribir([self._celda_texto(i, c, estilo=3) for i, c in enumerate(cols)])
+
+    def filas(self, rows: List[tuple]):
+        if self._fila + 1 + len(rows) > _MAX_FILAS_XLSX:
+            raise ValueError("El período supera el máximo de filas de Excel (1.048.576); exportá en CSV.")
+        partes = []
+        for r in rows:
+            self._fila += 1
+            n = self._fila + 1        # la fila 1 es el encabezado
+            celdas = []
+            for i, v in enumerate(r):
+                ref = f"{self._letras[i]}{n}"
+                if v is None:
+                    continue
+                if isinstance(v, bool):
+                    celdas.append(f'<c r="{ref}" t="b"><v>{int(v)}</v></c>')
+                elif isinstance(v, (int, float, Decimal)):
+                    s = ' s="2"' if i in self._importes else ""
+                    celdas.append(f'<c r="{ref}"{s}><v>{v}</v></c>')
+                elif isinstance(v, datetime):
+                    serial = (v.replace(tzinfo=None) - _EPOCH_EXCEL).total_seconds() / 86400.0
+                    celdas.append(f'<c r="{ref}" s="1"><v>{serial:.8f}</v></c>')
+                elif isinstance(v, date):
+                    serial = (datetime(v.year, v.month, v.day) - _EPOCH_EXCEL).days
+                    celdas.append(f'<c r="{ref}" s="1"><v>{serial}</v></c>')
+                else:
+                    celdas.append(f'<c r="{ref}" t="inlineStr"><is><t>{_esc(str(v))}</t></is></c>')
+            partes.append(f'<row r="{n}">' + "".join(celdas) + "</row>")
+        self._sheet.write("".join(partes).encode("utf-8"))
+
+    def _celda_texto(self, i, texto, estilo=0):
+        s = f' s="{estilo}"' if estilo else ""
+        return f'<c r="{self._letras[i]}1" t="inlineStr"{s}><is><t>{_esc(str(texto))}</t></is></c>'
+
+    def _escribir(self, celdas):
+        self._sheet.write(('<row r="1">' + "".join(celdas) + "</row>").encode("utf-8"))
+
+    def cerrar(self):
+        self._sheet.write(b"</sheetData></worksheet>")
+        self._sheet.close()
+        self._zip.close()
+
+
+def _writer_para(path: str, formato: Optional[str]):
+    formato = (formato or os.path.splitext(path)[1].lstrip(".") or "csv").lower()
+    if formato == "xlsx":
+        return _XlsxWriter(path)
+    if formato == "csv":
+        return _CsvWriter(path)
+    raise ValueError(f"Formato de exportación no soportado: {formato}")
+
+
+def exportar_ventas(
+    path: str,
+    formato: Optional[str] = None,
+    detalle: bool = False,
+    progreso: Optional[Callable[[int], None]] = None,
+    cancelado: Optional[Callable[[], bool]] = None,
+    **filtros: Any,
+) -> int:
+    """
+    Escribe las ventas del filtro en `path` (formato por extensión: .csv / .xlsx).
+    Devuelve la cantidad de filas escritas. Si `cancelado()` da True se corta y se
+    borra el archivo a medio escribir.
+    """
+    w = _writer_para(path, formato)
+    n = 0
+    ok = False
+    try:
+        con_encabezado = False
+        for encabezados, rows in iterar_ventas(detalle=detalle, **filtros):
+            if not con_encabezado:
+                w.encabezado(encabezados)
+                con_encabezado = True
+            w.filas(rows)
+            n += len(rows)
+            if progreso:
+                progreso(n)
+            if cancelado and cancelado():
+                return n
+        if not con_encabezado:
+            w.encabezado([h for h, _ in _COLS_VENTA + (_COLS_DETALLE if detalle else [])])
+        ok = True
+        return n
+    finally:
+        w.cerrar()
+        if not ok:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
@@ -0,0 +1,370 @@
+"""
+Instrumentación de consultas: tiempo, filas y round-trips por sentencia.
+
+Con la instrumentación activa, config.get_connection() devuelve la conexión
+envuelta: cada execute/executemany/fetch/commit del cursor se mide y se
+acumula por (llamador, huella), donde
+- huella:   el SQL normalizado (espacios colapsados, literales y listas de
+            parámetros reemplazados) para que la misma consulta con otros
+            valores o largos de IN (...) cuente como una sola
+- llamador: el primer método fuera de config/backends y de los helpers
+            query_all/query_one/exec_nonquery, ej. "repos.VentaRepo.crear_venta"
+
+Las sentencias que tardan más que `lenta_ms` (execute + fetch) se anotan en
+el log de consultas lentas (config.SQL_LENTA_LOG) y en lentas().
+
+    instrumentacion.activar(lenta_ms=100)     # o VENTAS_INSTRUMENTAR=1
+    ...
+    print(instrumentacion.reporte(20))
+    instrumentacion.desactivar()
+
+Para medir un tramo puntual sin activar nada global (benchmarks):
+
+    with instrumentacion.medir() as m:
+        VentaRepo.crear_venta(...)
+    m.round_trips, m.filas, m.ms, m.sentencias
+
+medir() sólo ve las conexiones que se piden dentro del bloque y en el mismo hilo.
+"""
+import re
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+_MODULOS_INTERNOS = {"config", "backends", "instrumentacion"}
+_HELPERS = {"query_all", "query_one", "exec_nonquery", "_dict_rows", "_dict_one"}
+
+_activa = False
+_lenta_ms = 200.0
+_log_path: Optional[str] = None
+_lock = threading.Lock()
+_local = threading.local()
+
+# (llamador, huella) -> [sentencias, round_trips, ms_total, ms_max, filas]
+_stats: Dict[Tuple[str, str], List[float]] = {}
+_lentas: Deque[Dict[str, Any]] = deque(maxlen=200)
+
+
+# ---------------- huella y llamador ----------------
+_RE_STR = re.compile(r"N?'(?:[^']|'')*'")
+_RE_NUM = re.compile(r"(?<![\w@#.])-?\d+(?:\.\d+)?\b")
+_RE_LISTA = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_RE_FILAS = re.compile(r"\(\.\.\.\)(?:\s*,\s*\(\.\.\.\))+")
+_RE_ESPACIOS = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=2048)
+def huella(sql: str) -> str:
+    """SQL normalizado: sin literales y con IN (?,?,...) / VALUES (...),(...) colapsados."""
+    s = _RE_ESPACIOS.sub(" ", sql).strip()
+    s = _RE_STR.sub("?", s)
+    s = _RE_NUM.sub("?", s)
+    s = _RE_LISTA.sub("(...)", s)
+    return _RE_FILAS.sub("(...)", s)
+
+
+def _llamador() -> str:
+    f = sys._getframe(1)
+    while f is not None:
+        mod = f.f_globals.get("__name__", "")
+        if mod not in _MODULOS_INTERNOS and f.f_code.co_name not in _HELPERS:
+            code = f.f_code
+            return f"{mod}.{getattr(code, 'co_qualname', code.co_name)}"
+        f = f.f_back
+    return "?"
+
+
+# ---------------- registro ----------------
+class Captura:
+    """Totales de un tramo medido con medir(); `sentencias` va por (llamador, huella)."""
+    def __init__(self):
+        self.round_trips = 0
+        self.filas = 0
+        self.ms = 0.0
+        self.sentencias: Dict[Tuple[str, str], List[float]] = {}
+
+    def _sumar(self, clave, sentencias: int, viajes: int, ms: float, filas: int):
+        self.round_trips += viajes
+        self.filas += filas
+        self.ms += ms
+        st = self.sentencias.get(clave)
+        if st is None:
+            st = self.sentencias[clave] = [0, 0, 0.0, 0.0, 0]
+        st[0] += sentencias
+        st[1] += viajes
+        st[2] += ms
+        st[4] += filas
+
+
+def _capturas() -> list:
+    caps = getattr(_local, "capturas", None)
+    if caps is None:
+        caps = _local.capturas = []
+    return caps
+
+
+def _registrar(clave, sentencias: int, viajes: int, ms: float, filas: int):
+    for cap in _capturas():
+        cap._sumar(clave, sentencias, viajes, ms, filas)
+    if not _activa:
+        return
+    with _lock:
+        st = _stats.get(clave)
+        if st is None:
+            st = _stats[clave] = [0, 0, 0.0, 0.0, 0]
+        st[0] += sentencias
+        st[1] += viajes
+        st[2] += ms
+        st[4] += filas
+
+
+def _terminar(clave, ms: float, filas: int):
+    """Fin de una sentencia (execute + fetch): máximo y log de lentas."""
+    if _activa:
+        with _lock:
+            st = _stats.get(clave)
+            if st is not None and ms > st[3]:
+                st[3] = ms
+    for cap in _capturas():
+        st = cap.sentencias.get(clave)
+        if st is not None and ms > st[3]:
+            st[3] = ms
+    if _activa and ms >= _lenta_ms:
+        entrada = {"fecha": datetime.now().isoformat(timespec="milliseconds"), "ms": round(ms, 2),
+                   "filas": filas, "llamador": clave[0], "sql": clave[1]}
+        with _lock:
+            _lentas.append(entrada)
+            if _log_path:
+                try:
+                    with open(_log_path, "a", encoding="utf-8") as f:
+                        f.write(f"{entrada['fecha']}\t{entrada['ms']:.1f} ms\t{filas} filas\t"
+                                f"{clave[0]}\t{clave[1]}\n")
+                except OSError as e:
+                    print("WARN log de consultas lentas:", e)
+
+
+# ---------------- envoltorios ----------------
+class _CursorMedido:
+    """Cursor que mide cada sentencia; el resto de la interfaz pasa directo al original."""
+    def __init__(self, cur):
+        object.__setattr__(self, "_cur", cur)
+        object.__setattr__(self, "_actual", None)     # [clave, ms, filas] de la sentencia en curso
+
+    def _empezar(self, sql: str, viajes: int, ms: float):
+        self._cerrar()
+        clave = (_llamador(), huella(sql))
+        object.__setattr__(self, "_actual", [clave, ms, 0])
+        _registrar(clave, 1, viajes, ms, 0)
+
+    def _cerrar(self):
+        act = self._actual
+        if act is not None:
+            object.__setattr__(self, "_actual", None)
+            _terminar(act[0], act[1], act[2])
+
+    def _leidas(self, filas: int, ms: float):
+        act = self._actual
+        if act is not None:
+            act[1] += ms
+            act[2] += filas
+            _registrar(act[0], 0, 0, ms, filas)
+
+    def execute(self, sql, *params):
+        t0 = time.perf_counter()
+        try:
+            self._cur.execute(sql, *params)
+        finally:
+            self._empezar(sql, 1, (time.perf_counter() - t0) * 1000.0)
+        return self
+
+    def executemany(self, sql, params):
+        params = list(params)
+        t0 = time.perf_counter()
+        try:
+            self._cur.executemany(sql, params)
+        finally:
+            # con fast_executemany los parámetros viajan en un solo lote
+            viajes = 1 if getattr(self._cur, "fast_executemany", False) else len(params)
+            self._empezar(sql, viajes, (time.perf_counter() - t0) * 1000.0)
+
+    def fetchone(self):
+        t0 = time.perf_counter()
+        row = self._cur.fetchone()
+        self._leidas(row is not None, (time.perf_counter() - t0) * 1000.0)
+        return row
+
+    def fetchall(self):
+        t0 = time.perf_counter()
+        rows = self._cur.fetchall()
+        self._leidas(len(rows), (time.perf_counter() - t0) * 1000.0)
+        return rows
+
+    def fetchmany(self, *a):
+        t0 = time.perf_counter()
+        rows = self._cur.fetchmany(*a)
+        self._leidas(len(rows), (time.perf_counter() - t0) * 1000.0)
+        return rows
+
+    def __iter__(self):
+        while True:
+            row = self.fetchone()
+            if row is None:
+                return
+            yield row
+
+    def close(self):
+        self._cerrar()
+        return self._cur.close()
+
+    def __getattr__(self, name):
+        return getattr(self._cur, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._cur, name, value)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._cerrar()
+        return self._cur.__exit__(*exc)
+
+    def __del__(self):
+        try:
+            self._cerrar()
+        except Exception:
+            pass
+
+
+class _ConexionMedida:
+    """Conexión cuyos cursores se miden; commit y rollback cuentan como round-trip."""
+    def __init__(self, conn):
+        object.__setattr__(self, "_conn", conn)
+
+    def cursor(self):
+        return _CursorMedido(self._conn.cursor())
+
+    def execute(self, sql, *params):
+        return self.cursor().execute(sql, *params)
+
+    def _fin(self, nombre: str, fn):
+        t0 = time.perf_counter()
+        try:
+            return fn()
+        finally:
+            ms = (time.perf_counter() - t0) * 1000.0
+            clave = (_llamador(), nombre)
+            _registrar(clave, 1, 1, ms, 0)
+            _terminar(clave, ms, 0)
+
+    def commit(self):
+        return self._fin("COMMIT", self._conn.commit)
+
+    def rollback(self):
+        return self._fin("ROLLBACK", self._conn.rollback)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._conn, name, value)
+
+    def __enter__(self):
+        self._conn.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        return self._conn.__exit__(*exc)
+
+
+def envolver(conn):
+    """La conexión medida si la instrumentación está activa (o hay un medir() en este hilo)."""
+    if _activa or getattr(_local, "capturas", None):
+        return _ConexionMedida(conn)
+    return conn
+
+
+# ---------------- API ----------------
+def activar(lenta_ms: Optional[float] = None, log_path: Optional[str] = None):
+    """
+    Empieza a medir todas las conexiones nuevas; se puede llamar con la app
+    andando. Sin argumentos usa config.SQL_LENTA_MS y config.SQL_LENTA_LOG
+    (log_path="" anota las lentas sólo en memoria).
+    """
+    global _activa, _lenta_ms, _log_path
+    import config
+    _lenta_ms = float(config.SQL_LENTA_MS if lenta_ms is None else lenta_ms)
+    _log_path = (config.SQL_LENTA_LOG if log_path is None else log_path) or None
+    _activa = True
+
+
+def desactivar():
+    """Deja de medir (las conexiones ya envueltas siguen midiendo hasta que se devuelven)."""
+    global _activa
+    _activa = False
+
+
+def activa() -> bool:
+    return _activa
+
+
+def reiniciar():
+    """Borra los contadores acumulados y las consultas lentas."""
+    with _lock:
+        _stats.clear()
+        _lentas.clear()
+
+
+class medir:
+    """Context manager: mide lo que hace este hilo dentro del bloque (ver Captura)."""
+    def __enter__(self) -> Captura:
+        self.captura = Captura()
+        _capturas().append(self.captura)
+        return self.captura
+
+    def __exit__(self, *exc):
+        _capturas().remove(self.captura)
+        return False
+
+
+def estadisticas() -> List[Dict[str, Any]]:
+    """Contadores por (llamador, huella), de más a menos tiempo total."""
+    with _lock:
+        items = [(k, list(v)) for k, v in _stats.items()]
+    filas = [{
+        "llamador": k[0], "sql": k[1], "sentencias": int(v[0]), "round_trips": int(v[1]),
+        "ms_total": v[2], "ms_max": v[3], "ms_prom": v[2] / v[0] if v[0] else 0.0, "filas": int(v[4]),
+    } for k, v in items]
+    filas.sort(key=lambda f: f["ms_total"], reverse=True)
+    return filas
+
+
+def por_llamador() -> Dict[str, Dict[str, float]]:
+    """Totales por método llamador: {llamador: {sentencias, round_trips, ms, filas}}."""
+    out: Dict[str, Dict[str, float]] = {}
+    for f in estadisticas():
+        t = out.setdefault(f["llamador"], {"sentencias": 0, "round_trips": 0, "ms": 0.0, "filas": 0})
+        t["sentencias"] += f["sentencias"]
+        t["round_trips"] += f["round_trips"]
+        t["ms"] += f["ms_total"]
+        t["filas"] += f["filas"]
+    return out
+
+
+def lentas() -> List[Dict[str, Any]]:
+    """Últimas consultas que superaron el umbral (la más reciente al final)."""
+    with _lock:
+        return list(_lentas)
+
+
+def reporte(n: int = 20) -> str:
+    """Tabla de texto con las n sentencias que más tiempo acumularon."""
+    lineas = [f"{'ms total':>10} {'llamadas':>9} {'ms max':>9} {'filas':>9}  llamador / sql"]
+    for f in estadisticas()[:n]:
+        lineas.append(f"{f['ms_total']:>10.1f} {f['sentencias']:>9} {f['ms_max']:>9.1f} {f['filas']:>9}  "
+                      f"{f['llamador']}\n{'':>41}{f['sql'][:160]}")
+    return "\n".join(lineas)
@@ -1,10 +1,15 @@
+import io
 import os
+import threading
 from datetime import datetime
-from typing import Optional
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
 from reportlab.lib.pagesizes import A4
 from reportlab.pdfgen import canvas
 from reportlab.lib.units import mm
 from reportlab.lib import colors
+from reportlab.lib.utils import ImageReader
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.pdfmetrics import stringWidth
 try:
@@ -14,85 +19,119 @@ try:
     _QR_AVAILABLE = True
 except Exception:
     _QR_AVAILABLE = False
-from config import get_connection
-
-def _fetch_empresa():
-    conn = get_connection()
+try:
+    from PIL import Image
+    _PIL_AVAILABLE = True
+except Exception:
+    _PIL_AVAILABLE = False
+import ticket_archivo
+from tickets import datos_empresa as _fetch_empresa, datos_ventas as _fetch_ventas, datos_venta as _fetch_venta, fmt_ar
+
+# Caja del logo en el encabezado (ver _draw_header) y resolución a la que se guarda.
+_LOGO_W_MM, _LOGO_H_MM, _LOGO_DPI = 24.0, 20.0, 300
+_logo_cache: Dict[tuple, object] = {}
+_logo_lock = threading.Lock()
+
+def _leer_logo(path: str):
+    """Decodifica el logo una vez y lo achica a la caja del encabezado (a 300 dpi)."""
+    if not _PIL_AVAILABLE:
+        return ImageReader(path)
+    with Image.open(path) as im:
+        im.load()
+        if im.mode not in ("RGB", "RGBA", "L"):
+            im = im.convert("RGBA" if "transparency" in im.info or im.mode in ("P", "LA", "PA") else "RGB")
+        maximo = (int(_LOGO_W_MM / 25.4 * _LOGO_DPI), int(_LOGO_H_MM / 25.4 * _LOGO_DPI))
+        if im.width > maximo[0] or im.height > maximo[1]:
+            im = im.copy()
+            im.thumbnail(maximo, Image.LANCZOS)
+        return ImageReader(im)
+
+def _cargar_logo(empresa: dict):
+    """
+    ImageReader del logo de la empresa (o None), compartido por todos los tickets.
+    La clave es (ruta, mtime, tamaño): si se cambia el archivo o la ruta se relee.
+    """
+    logo_path = (empresa.get("LogoPath") or "").strip()
+    if not logo_path:
+        return None
     try:
-        cur = conn.cursor()
-        cur.execute("""
-            SELECT TOP 1 Nombre, CUIT, CondicionIVA, Direccion, Telefono, Email, LogoPath
-            FROM dbo.Empresa ORDER BY EmpresaID
-        """)
-        row = cur.fetchone()
-        if not row:
-            return {"Nombre": "Empresa", "CUIT": None, "CondicionIVA": None,
-                    "Direccion": None, "Telefono": None, "Email": None, "LogoPath": None}
-        cols = [c[0] for c in cur.description]
-        return dict(zip(cols, row))
-    finally:
-        conn.close()
-
-def _fetch_venta(venta_id: int):
-    conn = get_connection()
+        st = os.stat(logo_path)
+    except OSError:
+        return None
+    clave = (os.path.abspath(logo_path), st.st_mtime_ns, st.st_size)
+    with _logo_lock:
+        if clave in _logo_cache:
+            return _logo_cache[clave]
     try:
-        cur = conn.cursor()
-
-        cur.execute("""
-            SELECT v.VentaID, v.Fecha, v.Total, c.Nombre AS ClienteNombre
-            FROM dbo.Ventas v
-            LEFT JOIN dbo.Clientes c ON c.ClienteID = v.ClienteID
-            WHERE v.VentaID = ?
-        """, (venta_id,))
-        cab = cur.fetchone()
-        if not cab:
-            raise ValueError(f"Venta {venta_id} no existe")
-
-        cur.execute("""
-            SELECT d.ProductoID, p.Nombre, d.Cantidad, d.PrecioUnitario
-            FROM dbo.VentaDetalle d
-            JOIN dbo.Productos p ON p.ProductoID = d.ProductoID
-            WHERE d.VentaID = ?
-            ORDER BY d.DetalleID
-        """, (venta_id,))
-        det = cur.fetchall()
-        return cab, det
-    finally:
-        conn.close()
+        logo = _leer_logo(logo_path)
+    except Exception:
+        logo = None
+    with _logo_lock:
+        _logo_cache.clear()      # en la práctica hay un solo logo vigente
+        _logo_cache[clave] = logo
+    return logo
+
+_C_OSCURO = colors.HexColor("#111827")
+_C_LINEA = colors.HexColor("#9CA3AF")
+_C_GRIS = colors.HexColor("#6B7280")
+_C_FILA_ALT = colors.HexColor("#F3F4F6")
+_C_AVISO = colors.HexColor("#B45309")
 
 def _fmt_currency(value: float) -> str:
-    s = f"{value:,.2f}"
-    s = s.replace(",", "X").replace(".", ",").replace("X", ".")
-    return s
-
-def _wrap_text(txt: str, max_width_mm: float, font_name: str, font_size: float) -> list[str]:
-    if not txt:
-        return [""]
+    return fmt_ar(value, 2)
+
+# Anchos de glifos por fuente (a tamaño 1000), llenados a demanda: medir un
+# texto es sumar la tabla, sin pasar por stringWidth en cada prueba de corte.
+_anchos: Dict[str, Dict[str, float]] = {}
+
+def _ancho(txt: str, font_name: str, font_size: float) -> float:
+    tabla = _anchos.get(font_name)
+    if tabla is None:
+        tabla = _anchos[font_name] = {}
+    total = 0.0
+    for ch in txt:
+        w = tabla.get(ch)
+        if w is None:
+            w = tabla[ch] = stringWidth(ch, font_name, 1000)
+        total += w
+    return total * font_size / 1000.0
+
+@lru_cache(maxsize=4096)
+def _wrap_cached(txt: str, max_width_mm: float, font_name: str, font_size: float) -> Tuple[str, ...]:
     max_width = max_width_mm * mm
-    words = txt.split()
+    espacio = _ancho(" ", font_name, font_size)
     lines = []
-    cur = ""
-    for w in words:
-        test = f"{cur} {w}".strip()
-        if stringWidth(test, font_name, font_size) <= max_width:
-            cur = test
+    cur, cur_w = "", 0.0
+    for w in txt.split():
+        ww = _ancho(w, font_name, font_size)
+        test_w = cur_w + espacio + ww if cur else ww
+        if test_w <= max_width:
+            cur = f"{cur} {w}" if cur else w
+            cur_w = test_w
         else:
             if cur:
                 lines.append(cur)
-            cur = w
+            cur, cur_w = w, ww
     if cur:
         lines.append(cur)
-    return lines
+    return tuple(lines)
+
+def _wrap_text(txt: str, max_width_mm: float, font_name: str, font_size: float) -> list[str]:
+    """Corta por palabras; cada palabra se mide una vez y los nombres repetidos salen del cache."""
+    if not txt:
+        return [""]
+    return list(_wrap_cached(txt, max_width_mm, font_name, font_size))
 
 def _draw_header(
     c: canvas.Canvas, x0: float, y0: float, w: float, h: float,
     venta_id: int, fecha: datetime | str, cliente: Optional[str],
     empresa: dict,
-    mostrar_qr: bool = True
+    mostrar_qr: bool = True,
+    logo=None,
 ) -> float:
 
-    c.setFillColor(colors.HexColor("#111827"))
-    c.setStrokeColor(colors.HexColor("#111827"))
+    c.setFillColor(_C_OSCURO)
+    c.setStrokeColor(_C_OSCURO)
     c.rect(x0, y0 - h, w, h, fill=1, stroke=0)
 
     P = 6 * mm
@@ -103,10 +142,13 @@ def _draw_header(
     c.setFillColor(colors.white)
     c.setStrokeColor(colors.white)
 
-    logo_path = (empresa.get("LogoPath") or "").strip()
-    if logo_path and os.path.isfile(logo_path):
+    if logo is None:
+        logo_path = (empresa.get("LogoPath") or "").strip()
+        if logo_path and os.path.isfile(logo_path):
+            logo = logo_path
+    if logo is not None:
         try:
-            c.drawImage(logo_path, x0 + P, y0 - P - logo_h,
+            c.drawImage(logo, x0 + P, y0 - P - logo_h,
                         width=logo_w, height=logo_h,
                         preserveAspectRatio=True, mask='auto')
         except Exception:
@@ -179,7 +221,7 @@ def _draw_header(
 def _draw_table_header(c: canvas.Canvas, x: float, y: float, widths_mm: dict) -> float:
     c.setFont("Helvetica-Bold", 9)
     c.setFillColor(colors.black)
-    c.setStrokeColor(colors.HexColor("#9CA3AF"))  
+    c.setStrokeColor(_C_LINEA)
     c.setLineWidth(0.3)
     c.line(x, y - 2*mm, x + sum(widths_mm.values())*mm, y - 2*mm)
 
@@ -199,14 +241,16 @@ def _check_page_break(c: canvas.Canvas, y: float, bottom: float, top_after_break
     return y
 
 
-def _draw_footer(c: canvas.Canvas, page_w: float, margin_x: float, margin_bottom: float):
+def _draw_footer(c: canvas.Canvas, page_w: float, margin_x: float, margin_bottom: float,
+                 primera_pagina: int = 1):
 
     c.setFont("Helvetica", 8)
-    c.setFillColor(colors.HexColor("#6B7280"))
+    c.setFillColor(_C_GRIS)
     c.drawString(margin_x, margin_bottom - 6*mm, "Gracias por su compra.")
 
     try:
-        page_num = c.getPageNumber()
+        # en un PDF con varios tickets la numeración es la del ticket, no la del archivo
+        page_num = c.getPageNumber() - primera_pagina + 1
         c.drawRightString(page_w - margin_x, margin_bottom - 6*mm, f"Página {page_num}")
     except Exception:
         pass
@@ -227,8 +271,6 @@ def _draw_qr_bottom_right(
         qr_y = margin_bottom + 2 * mm  
         qr_data = f"venta:{venta_id}"
         qr = QrCodeWidget(qr_data)
-        from reportlab.graphics.shapes import Drawing
-        from reportlab.graphics import renderPDF
         d = Drawing(qr_size, qr_size)
         d.add(qr)
         renderPDF.draw(d, c, qr_x, qr_y)
@@ -237,15 +279,10 @@ def _draw_qr_bottom_right(
 
 
 
-def generar_ticket_pdf(venta_id: int, ruta: str | None = None, abrir: bool = True) -> str:
-    cab, det = _fetch_venta(venta_id)
-
-    if ruta is None:
-        ruta = os.path.abspath(f"ticket_{venta_id}.pdf")
-
-
-    c = canvas.Canvas(ruta, pagesize=A4)
+def _render_ticket(c: canvas.Canvas, cab, det, empresa: dict, logo=None):
+    """Dibuja un ticket completo en el canvas a partir de la página actual (sin guardar)."""
     W, H = A4
+    primera_pagina = c.getPageNumber()
 
 
     MARGIN_X = 18 * mm
@@ -253,7 +290,6 @@ def generar_ticket_pdf(venta_id: int, ruta: str | None = None, abrir: bool = Tru
     MARGIN_BOTTOM = 20 * mm
 
     header_h = 32 * mm 
-    empresa = _fetch_empresa()
 
 
     y = _draw_header(
@@ -267,6 +303,7 @@ def generar_ticket_pdf(venta_id: int, ruta: str | None = None, abrir: bool = Tru
         cliente=cab[3],
         empresa=empresa,
         mostrar_qr=False, 
+        logo=logo,
     )
 
     widths_mm = {
@@ -289,8 +326,12 @@ def generar_ticket_pdf(venta_id: int, ruta: str | None = None, abrir: bool = Tru
     line_h = 6 * mm
 
     total_calc = 0.0
-    alt_fill = colors.HexColor("#F3F4F6") 
+    alt_fill = _C_FILA_ALT
     row_idx = 0
+    ancho_tabla = sum(widths_mm.values()) * mm
+    x_cant = MARGIN_X + (widths_mm["nombre"] + widths_mm["cant"]) * mm
+    x_punit = x_cant + widths_mm["punit"] * mm
+    x_imp = MARGIN_X + ancho_tabla
 
     for _, nombre, cantidad, punit in det:
         cantidad = float(cantidad)
@@ -311,7 +352,7 @@ def generar_ticket_pdf(venta_id: int, ruta: str | None = None, abrir: bool = Tru
         if row_idx % 2 == 1:
             c.setFillColor(alt_fill)
             c.setStrokeColor(alt_fill)
-            c.rect(MARGIN_X, y - row_height + 1.5*mm, sum(widths_mm.values())*mm, row_height, fill=1, stroke=0)
+            c.rect(MARGIN_X, y - row_height + 1.5*mm, ancho_tabla, row_height, fill=1, stroke=0)
         row_idx += 1
 
         c.setFillColor(colors.black)
@@ -323,41 +364,40 @@ def generar_ticket_pdf(venta_id: int, ruta: str | None = None, abrir: bool = Tru
             y_text -= line_h
 
 
-        c.setFont("Helvetica", body_size)
-        c.drawRightString(MARGIN_X + (widths_mm["nombre"] + widths_mm["cant"])*mm, y, f"{cantidad:,.3f}".replace(",", "X").replace(".", ",").replace("X", "."))
-        c.drawRightString(MARGIN_X + (widths_mm["nombre"] + widths_mm["cant"] + widths_mm["punit"])*mm, y, _fmt_currency(punit))
-        c.drawRightString(MARGIN_X + sum(widths_mm.values())*mm, y, _fmt_currency(importe))
+        # alineado a derecha con los anchos de la tabla (drawRightString mediría otra vez)
+        for x_der, txt in ((x_cant, fmt_ar(cantidad, 3)), (x_punit, fmt_ar(punit)), (x_imp, fmt_ar(importe))):
+            c.drawString(x_der - _ancho(txt, body_font, body_size), y, txt)
 
 
         y -= row_height
 
 
-    c.setStrokeColor(colors.HexColor("#9CA3AF"))
+    c.setStrokeColor(_C_LINEA)
     c.setLineWidth(0.3)
-    c.line(MARGIN_X, y - 2*mm, MARGIN_X + sum(widths_mm.values())*mm, y - 2*mm)
+    c.line(MARGIN_X, y - 2*mm, MARGIN_X + ancho_tabla, y - 2*mm)
     y -= 8 * mm
 
     c.setFont("Helvetica", 9)
-    label_x = MARGIN_X + (widths_mm["nombre"] + widths_mm["cant"] + widths_mm["punit"])*mm
-    value_x = MARGIN_X + sum(widths_mm.values())*mm
+    label_x = x_punit
+    value_x = x_imp
 
     c.drawRightString(label_x, y, "Total:")
     c.setFont("Helvetica-Bold", 11)
-    c.setFillColor(colors.HexColor("#111827"))
+    c.setFillColor(_C_OSCURO)
     c.drawRightString(value_x, y, f"$ {_fmt_currency(float(cab[2] or 0.0))}")
     y -= 8 * mm
 
 
     if abs(total_calc - float(cab[2] or 0.0)) > 0.01:
         c.setFont("Helvetica", 8)
-        c.setFillColor(colors.HexColor("#B45309"))
+        c.setFillColor(_C_AVISO)
         c.drawRightString(value_x, y, f"(Recalculado: $ {_fmt_currency(total_calc)})")
         y -= 6 * mm
 
 
     y -= 2 * mm
     c.setFont("Helvetica", 8)
-    c.setFillColor(colors.HexColor("#6B7280"))
+    c.setFillColor(_C_GRIS)
     c.drawString(MARGIN_X, y, "Cambio y devoluciones dentro de 48h con ticket. Muchas gracias.")
     y -= 10 * mm
 
@@ -368,14 +408,197 @@ def generar_ticket_pdf(venta_id: int, ruta: str | None = None, abrir: bool = Tru
     )
 
 
-    _draw_footer(c, W, MARGIN_X, MARGIN_BOTTOM)
+    _draw_footer(c, W, MARGIN_X, MARGIN_BOTTOM, primera_pagina)
+
+
+def _nuevo_canvas(destino) -> canvas.Canvas:
+    # invariant: sin fecha de creación ni ID al azar; los mismos datos dan los
+    # mismos bytes, que es lo que deduplica el archivo de tickets
+    return canvas.Canvas(destino, pagesize=A4, invariant=1)
 
+def _render_bytes(cab, det, empresa: dict, logo=None) -> bytes:
+    buf = io.BytesIO()
+    c = _nuevo_canvas(buf)
+    _render_ticket(c, cab, det, empresa, logo)
     c.save()
+    return buf.getvalue()
 
-    if abrir:
+def _abrir(ruta: str):
+    try:
+        os.startfile(ruta)
+    except Exception:
+        pass
+
+def generar_ticket_pdf(venta_id: int, ruta: str | None = None, abrir: bool = True,
+                       archivar: bool = True) -> str:
+    """
+    Renderiza el ticket y lo guarda en el archivo de tickets (ticket_archivo).
+    Devuelve la ruta archivada, o `ruta` si se pidió una copia en otro lugar.
+    Si el archivo no está disponible se escribe ticket_{id}.pdf en la carpeta actual.
+    """
+    cab, det = _fetch_venta(venta_id)
+    empresa = _fetch_empresa()
+    datos = _render_bytes(cab, det, empresa, _cargar_logo(empresa))
+
+    destino = None
+    if archivar:
         try:
-            os.startfile(ruta)
-        except Exception:
-            pass
+            destino = ticket_archivo.archivar(venta_id, datos)
+        except Exception as e:
+            print("WARN archivo de tickets:", e)
+    if ruta is not None or destino is None:
+        destino = os.path.abspath(ruta or f"ticket_{venta_id}.pdf")
+        with open(destino, "wb") as f:
+            f.write(datos)
+
+    if abrir:
+        _abrir(destino)
+    return destino
 
+def reimprimir_ticket(venta_id: int, abrir: bool = True) -> str:
+    """Sirve el PDF ya archivado; sólo renderiza si la venta no tiene ticket guardado."""
+    try:
+        ruta = ticket_archivo.buscar(venta_id)
+    except Exception as e:
+        print("WARN archivo de tickets:", e)
+        ruta = None
+    if ruta is None:
+        return generar_ticket_pdf(venta_id, abrir=abrir)
+    if abrir:
+        _abrir(ruta)
     return ruta
+
+
+# ---------------- tandas: reimpresión / archivo de muchos tickets ----------------
+_worker_empresa: dict = {}
+_worker_logo = None
+
+def _init_worker(empresa: dict):
+    global _worker_empresa, _worker_logo
+    _worker_empresa = empresa
+    _worker_logo = _cargar_logo(empresa)
+
+def _render_lote(trabajos: List[tuple]) -> list:
+    """
+    Corre en un proceso del pool: [(ruta, cab, det), ...]. Devuelve las rutas
+    escritas o, para los trabajos con ruta None, los bytes del PDF.
+    """
+    out = []
+    for ruta, cab, det in trabajos:
+        datos = _render_bytes(cab, det, _worker_empresa, _worker_logo)
+        if ruta is None:
+            out.append(datos)
+        else:
+            with open(ruta, "wb") as f:
+                f.write(datos)
+            out.append(ruta)
+    return out
+
+def _correr(trabajos: List[tuple], empresa: dict, procesos: int,
+            cancelado: Optional[Callable[[], bool]]) -> Iterator[list]:
+    """Renderiza los trabajos (en orden) y va entregando los resultados por lote."""
+    total = len(trabajos)
+    if procesos and procesos > 1 and total > procesos:
+        # lotes chicos para poder informar avance y cortar sin esperar al final
+        tam = max(1, min(50, total // (procesos * 4)))
+        with ProcessPoolExecutor(max_workers=procesos, initializer=_init_worker,
+                                 initargs=(empresa,)) as pool:
+            futuros = [pool.submit(_render_lote, trabajos[i:i + tam])
+                       for i in range(0, total, tam)]
+            for f in futuros:
+                if cancelado and cancelado():
+                    for pendiente in futuros:
+                        pendiente.cancel()
+                    return
+                yield f.result()
+        return
+
+    _init_worker(empresa)
+    for i in range(0, total, 20):
+        if cancelado and cancelado():
+            return
+        yield _render_lote(trabajos[i:i + 20])
+
+def generar_tickets_pdf(
+    venta_ids,
+    carpeta: str | None = None,
+    un_archivo: str | None = None,
+    procesos: int = 0,
+    progreso: Optional[Callable[[int, int], None]] = None,
+    cancelado: Optional[Callable[[], bool]] = None,
+) -> List[str]:
+    """
+    Genera los tickets de muchas ventas en una sola pasada:
+    - una consulta por lote de IDs trae cabeceras y detalles de todas
+    - los datos de la empresa y el logo (cacheados) se leen una sola vez
+    - un_archivo: todos los tickets en un único PDF (para reimprimir un día entero)
+    - si no, un ticket_{id}.pdf por venta en `carpeta`; con procesos > 1 se
+      renderizan en paralelo en un pool de procesos
+
+    Devuelve las rutas generadas en el orden de venta_ids (las ventas que no
+    existen se omiten). Si cancelado() da True se corta y se devuelve lo hecho;
+    con un_archivo no se escribe nada.
+    """
+    orden = list(dict.fromkeys(int(v) for v in venta_ids))
+    ventas = _fetch_ventas(orden)
+    orden = [v for v in orden if v in ventas]
+    total = len(orden)
+    if not total:
+        return []
+    empresa = _fetch_empresa()
+
+    if un_archivo:
+        ruta = os.path.abspath(un_archivo)
+        logo = _cargar_logo(empresa)
+        c = _nuevo_canvas(ruta)
+        for n, vid in enumerate(orden, 1):
+            if cancelado and cancelado():
+                return []
+            if n > 1:
+                c.showPage()
+            cab, det = ventas[vid]
+            _render_ticket(c, cab, det, empresa, logo)
+            if progreso:
+                progreso(n, total)
+        c.save()
+        return [ruta]
+
+    carpeta = os.path.abspath(carpeta or ".")
+    os.makedirs(carpeta, exist_ok=True)
+    trabajos = [(os.path.join(carpeta, f"ticket_{vid}.pdf"),) + ventas[vid] for vid in orden]
+    hechas: List[str] = []
+    for rutas in _correr(trabajos, empresa, procesos, cancelado):
+        hechas.extend(rutas)
+        if progreso:
+            progreso(len(hechas), total)
+    return hechas
+
+def archivar_tickets(
+    venta_ids,
+    procesos: int = 0,
+    forzar: bool = False,
+    progreso: Optional[Callable[[int, int], None]] = None,
+    cancelado: Optional[Callable[[], bool]] = None,
+) -> Dict[int, str]:
+    """
+    Llena el archivo de tickets para muchas ventas (ej. todas las de un mes).
+    Las que ya tienen ticket archivado se saltean salvo forzar=True; lo
+    renderizado se guarda e indexa de a lotes, así un corte no pierde lo hecho.
+    Devuelve {VentaID: ruta} de todas las pedidas que quedaron archivadas.
+    """
+    orden = list(dict.fromkeys(int(v) for v in venta_ids))
+    listas = {} if forzar else ticket_archivo.buscar_lote(orden)
+    faltan = [v for v in orden if v not in listas]
+    ventas = _fetch_ventas(faltan)
+    faltan = [v for v in faltan if v in ventas]
+    total = len(faltan)
+    if not total:
+        return listas
+    trabajos = [(None,) + ventas[vid] for vid in faltan]
+    hechos = 0
+    for pdfs in _correr(trabajos, _fetch_empresa(), procesos, cancelado):
+        listas.update(ticket_archivo.archivar_lote(zip(faltan[hechos:hechos + len(pdfs)], pdfs)))
+        hechos += len(pdfs)
+        if progreso:
+            progreso(hechos, total)
+    return listas
@@ -1,6 +1,9 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, simpledialog
 from repos import ProductoRepo, IngresoStockRepo
+import catalogo
+import tareas
+from vlista import VirtualTree
 def fmt_money(x) -> str:
     try:
         return f"${float(x):,.2f}"
@@ -32,9 +35,10 @@ class ProductosFrame(ttk.Frame):
         ttk.Button(bar, text="Actualizar (F5)", command=self.load).pack(side="left", padx=(12,0))
 
 
-        grid = ttk.Frame(self); grid.pack(fill=tk.BOTH, expand=True, padx=10, pady=(0,6))
         cols = ("id","nombre","codigo","precio","stock","estado")
-        self.tree = ttk.Treeview(grid, columns=cols, show="headings", height=16)
+        # sólo se materializan las filas visibles: filtrar/ordenar no depende del tamaño del catálogo
+        self.tree = VirtualTree(self, columns=cols, formatter=self._fmt_row, height=16)
+        self.tree.pack(fill=tk.BOTH, expand=True, padx=10, pady=(0,6))
         self.tree.heading("codigo", text="Código", command=lambda: self._sort_by("codigo"))
         self.tree.column("codigo", width=160, anchor="w")
         self.tree.heading("id", text="ID", command=lambda: self._sort_by("id"))
@@ -49,11 +53,6 @@ class ProductosFrame(ttk.Frame):
         self.tree.column("stock", width=100, anchor="e")
         self.tree.column("estado", width=110, anchor="center")
 
-        self.tree.pack(side="left", fill=tk.BOTH, expand=True)
-        yscroll = ttk.Scrollbar(grid, orient="vertical", command=self.tree.yview)
-        self.tree.configure(yscroll=yscroll.set)
-        yscroll.pack(side="right", fill="y")
-
 
         self.tree.tag_configure("even", background=self._get_alt_row_color())
         self.tree.tag_configure("bloq", foreground="#8a0000")  
@@ -73,8 +72,8 @@ class ProductosFrame(ttk.Frame):
         self.menu.add_command(label="Actualizar", command=self.load)
 
 
-        self.tree.bind("<Double-Button-1>", lambda e: self._edit_producto())
-        self.tree.bind("<Button-3>", self._show_context) 
+        self.tree.tree.bind("<Double-Button-1>", lambda e: self._edit_producto())
+        self.tree.tree.bind("<Button-3>", self._show_context)
         self.e_search.bind("<Return>", lambda e: self._apply_filter())
 
         self.bind_all("<F5>", lambda e: self.load())
@@ -92,28 +91,26 @@ class ProductosFrame(ttk.Frame):
 
     def _show_context(self, event):
         try:
-            row = self.tree.identify_row(event.y)
-            if row:
-                self.tree.selection_set(row)
+            idx = self.tree.identify_index(event.y)
+            if idx is not None:
+                self.tree.select_index(idx)
             self.menu.tk_popup(event.x_root, event.y_root)
         finally:
             self.menu.grab_release()
 
     def _selected_item(self):
-        sel = self.tree.selection()
-        if not sel:
+        d = self.tree.selected_row()
+        if not d:
             messagebox.showinfo("Productos", "Seleccioná un producto de la lista")
             return None
-        vals = self.tree.item(sel[0], "values")
 
         return {
-            "ProductoID": int(vals[0]),
-            "Nombre": vals[1],
-            "CodigoBarras": vals[2],
-            "PrecioTxt": vals[3],
-            "Stock": vals[4],
-            "Estado": vals[5],
-            "iid": sel[0],
+            "ProductoID": int(d["ProductoID"]),
+            "Nombre": d["Nombre"],
+            "CodigoBarras": d.get("CodigoBarras") or "",
+            "PrecioTxt": fmt_money(d["Precio"]),
+            "Stock": d["Stock"],
+            "Estado": "Activo" if d["Activo"] else "Bloqueado",
         }
 
     def _selected_product_full(self):
@@ -125,36 +122,38 @@ class ProductosFrame(ttk.Frame):
         return {"ProductoID": row["ProductoID"], "Nombre": row["Nombre"], "Activo": activo}
     
     def load(self):
+        """Trae sólo lo cambiado desde la última carga (catálogo compartido) en segundo plano."""
+        self.status.config(text="Cargando productos…")
+        tareas.de(self).submit(
+            catalogo.listar_productos,
+            on_done=self._on_loaded,
+            on_error=lambda e: messagebox.showerror("Error", str(e)),
+            grupo=self, clave=(str(self), "load"), descripcion="Cargando productos…",
+        )
 
-        for i in self.tree.get_children():
-            self.tree.delete(i)
-        try:
-            data = ProductoRepo.listar()
-            self._all_rows = data[:] 
-            self._render_rows(self._all_rows)
+    def _on_loaded(self, data):
+        self._all_rows = data
+        if (self.e_search.get() or "").strip():
+            self._apply_filter(keep_position=True)
+        else:
+            self._render_rows(self._all_rows, keep_position=True)
             self.status.config(text=f"{len(self._all_rows)} productos")
-        except Exception as e:
-            messagebox.showerror("Error", str(e))
 
-    def _render_rows(self, rows):
-        for i in self.tree.get_children():
-            self.tree.delete(i)
-        for idx, d in enumerate(rows):
-            estado = "Activo" if d["Activo"] else "Bloqueado"
-            tags = ("even",) if idx % 2 == 0 else ()
-            if not d["Activo"]:
-                tags = tags + ("bloq",)
-            self.tree.insert(
-                "", tk.END,
-                values=(d["ProductoID"], d["Nombre"], d.get("CodigoBarras") or "",
-                        fmt_money(d["Precio"]), d["Stock"], estado),
-                tags=tags
-            )
+    def _fmt_row(self, d, idx):
+        estado = "Activo" if d["Activo"] else "Bloqueado"
+        tags = ("even",) if idx % 2 == 0 else ()
+        if not d["Activo"]:
+            tags = tags + ("bloq",)
+        return ((d["ProductoID"], d["Nombre"], d.get("CodigoBarras") or "",
+                 fmt_money(d["Precio"]), d["Stock"], estado), tags)
+
+    def _render_rows(self, rows, keep_position=False):
+        self.tree.set_rows(rows, keep_position=keep_position, key=lambda d: d["ProductoID"])
 
-    def _apply_filter(self):
+    def _apply_filter(self, keep_position=False):
         q = (self.e_search.get() or "").strip().lower()
         if not q:
-            self._render_rows(self._all_rows)
+            self._render_rows(self._all_rows, keep_position)
             self.status.config(text=f"{len(self._all_rows)} productos")
             return
         filtered = []
@@ -165,7 +164,7 @@ class ProductosFrame(ttk.Frame):
             else:
                 if q in (d["Nombre"] or "").lower() or q in (d.get("CodigoBarras") or "").lower():
                     filtered.append(d)
-        self._render_rows(filtered)
+        self._render_rows(filtered, keep_position)
         self.status.config(text=f"{len(filtered)} productos (filtrado)")
 
     def _clear_filter(self):
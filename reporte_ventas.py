@@ -1,20 +1,75 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
-import csv
-from repos import VentaRepo, ClienteRepo
+from datetime import datetime, timedelta
+from repos import VentaRepo, ClienteRepo, ResumenRepo
+import tareas
+import exportar
+from tickets import emitir_ticket
+from vlista import VirtualTree
+
+PAGINA = 200
+
+_ORDENES = [
+    ("Más recientes", "fecha_desc"),
+    ("Más antiguas", "fecha_asc"),
+    ("Mayor monto", "total_desc"),
+    ("Menor monto", "total_asc"),
+    ("ID descendente", "id_desc"),
+    ("ID ascendente", "id_asc"),
+]
+_METODOS = ["Todos", "Efectivo", "Tarjeta", "Transferencia"]
+
 
 class ReporteVentasFrame(ttk.Frame):
+    """
+    Reporte de ventas paginado en el servidor: los filtros y el orden se
+    resuelven en la consulta y las páginas se piden a medida que se scrollea,
+    así se pueden recorrer años de ventas sin traerlas todas a memoria.
+    """
     def __init__(self, parent):
         super().__init__(parent)
+        self._filtros = {}
+        self._orden = "fecha_desc"
+        self._cursor = None        # cursor de la próxima página (None = no hay más)
+        self._cargando = False
+        self._gen = 0              # cada búsqueda nueva invalida las páginas en vuelo
 
         # Toolbar
-        toolbar = ttk.Frame(self); toolbar.pack(fill=tk.X, padx=8, pady=8)
+        toolbar = ttk.Frame(self); toolbar.pack(fill=tk.X, padx=8, pady=(8, 4))
         ttk.Button(toolbar, text="Actualizar", command=self.load).pack(side=tk.LEFT)
         ttk.Button(toolbar, text="Exportar en Excel", command=self.export_csv).pack(side=tk.LEFT, padx=6)
+        ttk.Button(toolbar, text="Resumen del período", command=self._ver_resumen).pack(side=tk.LEFT)
+        ttk.Button(toolbar, text="Reimprimir ticket", command=self._reimprimir).pack(side=tk.LEFT, padx=6)
+        self.lbl_resumen = ttk.Label(toolbar, text="", anchor="e")
+        self.lbl_resumen.pack(side=tk.RIGHT)
+
+        # Filtros
+        fil = ttk.Frame(self); fil.pack(fill=tk.X, padx=8, pady=(0, 4))
+        ttk.Label(fil, text="Desde (YYYY-MM-DD):").pack(side=tk.LEFT)
+        self.ent_desde = ttk.Entry(fil, width=11); self.ent_desde.pack(side=tk.LEFT, padx=(4, 8))
+        ttk.Label(fil, text="Hasta:").pack(side=tk.LEFT)
+        self.ent_hasta = ttk.Entry(fil, width=11); self.ent_hasta.pack(side=tk.LEFT, padx=(4, 8))
+        ttk.Label(fil, text="Cliente (ID o nombre):").pack(side=tk.LEFT)
+        self.ent_cliente = ttk.Entry(fil, width=16); self.ent_cliente.pack(side=tk.LEFT, padx=(4, 8))
+        ttk.Label(fil, text="Pago:").pack(side=tk.LEFT)
+        self.cb_metodo = ttk.Combobox(fil, values=_METODOS, width=13, state="readonly")
+        self.cb_metodo.current(0); self.cb_metodo.pack(side=tk.LEFT, padx=(4, 8))
+        ttk.Label(fil, text="Monto entre:").pack(side=tk.LEFT)
+        self.ent_min = ttk.Entry(fil, width=8); self.ent_min.pack(side=tk.LEFT, padx=(4, 2))
+        ttk.Label(fil, text="y").pack(side=tk.LEFT)
+        self.ent_max = ttk.Entry(fil, width=8); self.ent_max.pack(side=tk.LEFT, padx=(2, 8))
+        ttk.Label(fil, text="Orden:").pack(side=tk.LEFT)
+        self.cb_orden = ttk.Combobox(fil, values=[t for t, _ in _ORDENES], width=14, state="readonly")
+        self.cb_orden.current(0); self.cb_orden.pack(side=tk.LEFT, padx=(4, 8))
+        ttk.Button(fil, text="Buscar", command=self._buscar).pack(side=tk.LEFT)
+        for ent in (self.ent_desde, self.ent_hasta, self.ent_cliente, self.ent_min, self.ent_max):
+            ent.bind("<Return>", lambda e: self._buscar())
+        self.cb_orden.bind("<<ComboboxSelected>>", lambda e: self._buscar())
+        self.cb_metodo.bind("<<ComboboxSelected>>", lambda e: self._buscar())
 
         # Tabla
         cols = ("id", "fecha", "cliente", "total", "metodo")
-        self.tree = ttk.Treeview(self, columns=cols, show="headings")
+        self.tree = VirtualTree(self, columns=cols, formatter=self._fmt_row)
         for col, txt, w in [
             ("id", "ID", 60),
             ("fecha", "Fecha", 160),
@@ -24,35 +79,197 @@ class ReporteVentasFrame(ttk.Frame):
         ]:
             self.tree.heading(col, text=txt)
             self.tree.column(col, width=w, anchor=tk.CENTER if col!="cliente" else tk.W)
+        for col, base in (("id", "id"), ("fecha", "fecha"), ("total", "total")):
+            self.tree.heading(col, command=lambda b=base: self._ordenar_por(b))
         self.tree.pack(fill=tk.BOTH, expand=True, padx=8, pady=8)
+        self.tree.on_fin(self._siguiente_pagina, margen=PAGINA // 4)
+        self.tree.tree.bind("<Double-1>", lambda e: self._reimprimir())
+
+        self.load()
+
+    # ---------------- filtros ----------------
+    def _leer_filtros(self) -> dict:
+        def _fecha(s):
+            s = (s or "").strip()
+            return datetime.strptime(s, "%Y-%m-%d") if s else None
 
+        def _monto(s):
+            s = (s or "").strip().replace(",", ".")
+            return float(s) if s else None
+
+        f = {}
+        desde, hasta = _fecha(self.ent_desde.get()), _fecha(self.ent_hasta.get())
+        if desde:
+            f["desde"] = desde
+        if hasta:
+            f["hasta"] = hasta + timedelta(days=1)   # el día "hasta" entra completo
+        cli = (self.ent_cliente.get() or "").strip()
+        if cli.isdigit():
+            f["cliente_id"] = int(cli)
+        elif cli:
+            f["cliente"] = cli
+        if self.cb_metodo.get() and self.cb_metodo.get() != "Todos":
+            f["metodo_pago"] = self.cb_metodo.get()
+        mn, mx = _monto(self.ent_min.get()), _monto(self.ent_max.get())
+        if mn is not None:
+            f["monto_min"] = mn
+        if mx is not None:
+            f["monto_max"] = mx
+        return f
+
+    def _buscar(self):
+        try:
+            self._filtros = self._leer_filtros()
+        except ValueError:
+            messagebox.showerror("Filtros", "Fechas (YYYY-MM-DD) o montos inválidos")
+            return
+        self._orden = dict(_ORDENES).get(self.cb_orden.get(), "fecha_desc")
         self.load()
 
+    def _ordenar_por(self, base: str):
+        actual = self._orden
+        self._orden = f"{base}_asc" if actual == f"{base}_desc" else f"{base}_desc"
+        for texto, clave in _ORDENES:
+            if clave == self._orden:
+                self.cb_orden.set(texto)
+        self.load()
+
+    # ---------------- carga paginada ----------------
     def load(self):
-        """Carga las ventas desde el repositorio"""
-        for i in self.tree.get_children():
-            self.tree.delete(i)
+        """Primera página con los filtros actuales; el resto se pide al scrollear (en segundo plano)."""
+        self._gen += 1
+        gen = self._gen
+        self._cursor = None
+        self._cargando = True
+        self.lbl_resumen.config(text="Buscando…")
+        runner = tareas.de(self)
+        runner.submit(
+            VentaRepo.pagina, orden=self._orden, limite=PAGINA, **self._filtros,
+            on_done=lambda res: self._on_pagina(gen, res, primera=True),
+            on_error=self._on_error,
+            grupo=self, clave=(str(self), "pagina"), descripcion="Cargando ventas…",
+        )
+        runner.submit(
+            VentaRepo.resumen_filtro, **self._filtros,
+            on_done=lambda r: self._on_resumen(gen, r),
+            on_error=lambda e: None,
+            grupo=self, clave=(str(self), "resumen"),
+        )
+
+    def _siguiente_pagina(self):
+        if self._cargando or self._cursor is None:
+            return
+        gen = self._gen
+        self._cargando = True
+        tareas.de(self).submit(
+            VentaRepo.pagina, orden=self._orden, despues=self._cursor, limite=PAGINA, **self._filtros,
+            on_done=lambda res: self._on_pagina(gen, res, primera=False),
+            on_error=self._on_error,
+            on_cancel=lambda: gen == self._gen and setattr(self, "_cargando", False),
+            grupo=self, clave=(str(self), "pagina"), descripcion="Cargando más ventas…",
+        )
+
+    def _on_pagina(self, gen, res, primera: bool):
+        if gen != self._gen:
+            return
+        rows, cursor = res
+        self._cursor = cursor
+        self._cargando = False
+        if primera:
+            self.tree.set_rows(rows)
+        else:
+            self.tree.append_rows(rows)
+
+    def _on_resumen(self, gen, r):
+        if gen == self._gen:
+            self.lbl_resumen.config(text=f"{r['Cantidad']:,} ventas  •  Total ${r['Total']:,.2f}")
+
+    def _on_error(self, e):
+        self._cargando = False
+        messagebox.showerror("Error", str(e))
+
+    @staticmethod
+    def _fmt_row(d, idx):
+        cliente = f"{d['ClienteID']} - {d.get('ClienteNombre','')}" if d.get("ClienteID") else "Consumidor Final"
+        return ((d["VentaID"], d["Fecha"], cliente,
+                 f"${float(d['Total']):.2f}", d.get("MetodoPago","-")), ())
+
+    # ---------------- tickets ----------------
+    def _reimprimir(self):
+        """Reimprime el ticket de la venta seleccionada (desde el archivo si ya estaba generado)."""
+        row = self.tree.selected_row()
+        if not row:
+            messagebox.showwarning("Reimprimir", "Seleccioná una venta.")
+            return
+        tareas.de(self).submit(
+            emitir_ticket, row["VentaID"], reimpresion=True,
+            on_error=lambda e: messagebox.showerror("Reimprimir", str(e)),
+            grupo=self, descripcion=f"Reimprimiendo ticket {row['VentaID']}…",
+        )
+
+    # ---------------- resumen (tablas precalculadas) ----------------
+    def _ver_resumen(self):
+        """Totales por día y productos más vendidos del período, desde los resúmenes (O(días))."""
         try:
-            data = VentaRepo.listar() 
-            for d in data:
-                cliente = f"{d['ClienteID']} - {d.get('ClienteNombre','')}" if d.get("ClienteID") else "Consumidor Final"
-                self.tree.insert("", tk.END, values=(
-                    d["VentaID"], d["Fecha"], cliente,
-                    f"${float(d['Total']):.2f}", d.get("MetodoPago","-")
-                ))
-        except Exception as e:
-            messagebox.showerror("Error", str(e))
+            f = self._leer_filtros()
+        except ValueError:
+            messagebox.showerror("Filtros", "Fechas (YYYY-MM-DD) o montos inválidos")
+            return
+        hasta = f.get("hasta") or datetime.combine(datetime.now().date(), datetime.min.time()) + timedelta(days=1)
+        desde = f.get("desde") or hasta - timedelta(days=30)
+
+        def _traer():
+            return ResumenRepo.por_dia(desde, hasta), ResumenRepo.por_producto(desde, hasta)
+
+        tareas.de(self).submit(
+            _traer,
+            on_done=lambda res: self._mostrar_resumen(desde, hasta, *res),
+            on_error=lambda e: messagebox.showerror("Resumen", str(e)),
+            grupo=self, clave=(str(self), "resumen_periodo"), descripcion="Calculando resumen…",
+        )
 
+    def _mostrar_resumen(self, desde, hasta, dias, productos):
+        win = tk.Toplevel(self)
+        win.title(f"Resumen {desde:%Y-%m-%d} a {(hasta - timedelta(days=1)):%Y-%m-%d}")
+        win.geometry("760x480")
+        win.transient(self)
+
+        total = sum(float(d["Total"] or 0) for d in dias)
+        ventas = sum(int(d["Ventas"] or 0) for d in dias)
+        ttk.Label(win, text=f"{ventas:,} ventas  •  Total ${total:,.2f}",
+                  font=("Segoe UI", 11, "bold")).pack(anchor="w", padx=8, pady=(8, 4))
+
+        cuerpo = ttk.Frame(win); cuerpo.pack(fill="both", expand=True, padx=8, pady=4)
+        t_dias = ttk.Treeview(cuerpo, columns=("dia", "ventas", "total"), show="headings")
+        for col, txt, w in [("dia", "Día", 110), ("ventas", "Ventas", 70), ("total", "Total", 110)]:
+            t_dias.heading(col, text=txt); t_dias.column(col, width=w, anchor=tk.CENTER)
+        t_dias.pack(side="left", fill="both", expand=True)
+        for d in dias:
+            t_dias.insert("", tk.END, values=(d["Dia"], d["Ventas"], f"${float(d['Total']):,.2f}"))
+
+        t_prod = ttk.Treeview(cuerpo, columns=("producto", "cantidad", "importe"), show="headings")
+        for col, txt, w in [("producto", "Producto", 220), ("cantidad", "Cant.", 70), ("importe", "Importe", 110)]:
+            t_prod.heading(col, text=txt); t_prod.column(col, width=w, anchor=tk.W if col == "producto" else tk.CENTER)
+        t_prod.pack(side="left", fill="both", expand=True, padx=(8, 0))
+        for p in productos:
+            t_prod.insert("", tk.END, values=(p["Nombre"], f"{float(p['Cantidad']):g}", f"${float(p['Importe']):,.2f}"))
+
+        ttk.Button(win, text="Cerrar", command=win.destroy).pack(pady=(0, 8))
+
+    # ---------------- exportación ----------------
     def export_csv(self):
-        file = filedialog.asksaveasfilename(defaultextension=".csv",
-                                            filetypes=[("CSV", "*.csv")])
+        """Exporta el filtro actual completo (no sólo lo cargado) a .xlsx o .csv, en segundo plano."""
+        file = filedialog.asksaveasfilename(defaultextension=".xlsx",
+                                            filetypes=[("Excel", "*.xlsx"), ("CSV", "*.csv")])
         if not file: return
-        try:
-            with open(file, "w", newline="", encoding="utf-8") as f:
-                writer = csv.writer(f)
-                writer.writerow(["ID", "Fecha", "Cliente", "Total", "Método de pago"])
-                for row in self.tree.get_children():
-                    writer.writerow(self.tree.item(row)["values"])
-            messagebox.showinfo("Éxito", f"Ventas exportadas a {file}")
-        except Exception as e:
-            messagebox.showerror("Error", str(e))
+        detalle = messagebox.askyesno("Exportar", "¿Incluir el detalle de productos de cada venta?")
+
+        tareas.de(self).submit(
+            exportar.exportar_ventas, file, detalle=detalle,
+            progreso=lambda n: tareas.progreso(f"Exportando ventas… {n:,} filas"),
+            cancelado=tareas.cancelada,
+            **self._filtros,
+            on_done=lambda n: messagebox.showinfo("Éxito", f"{n} filas exportadas a {file}"),
+            on_error=lambda e: messagebox.showerror("Error", str(e)),
+            descripcion="Exportando ventas…",
+        )
@@ -1,6 +1,9 @@
-from datetime import datetime
-from typing import List, Dict, Tuple, Optional, Any
-from config import get_connection 
+import threading
+from datetime import datetime, timedelta
+from typing import List, Dict, Tuple, Optional, Any, Callable
+import backends
+import config
+from config import get_connection, schema_cache
 from security import hash_password, verify_password
 
 
@@ -46,24 +49,52 @@ def exec_nonquery(sql: str, params: tuple = ()) -> int:
     finally:
         conn.close()
 
+# Avisos de cambios en productos (p. ej. para el catálogo en memoria).
+# callback(ids, stock_delta): stock_delta = {ProductoID: cantidad descontada} en ventas.
+_listeners_productos: List[Callable[[List[int], Optional[Dict[int, float]]], None]] = []
+
+def on_productos_cambiados(callback: Callable[[List[int], Optional[Dict[int, float]]], None]) -> None:
+    if callback not in _listeners_productos:
+        _listeners_productos.append(callback)
+
+def _notificar_productos(ids: List[int], stock_delta: Optional[Dict[int, float]] = None) -> None:
+    for cb in list(_listeners_productos):
+        try:
+            cb(list(ids), stock_delta)
+        except Exception:
+            pass   # un listener roto no debe tirar la operación ya confirmada
+
+# SQL Server admite hasta 2100 parámetros por sentencia
+_LOTE_PARAMS = 2000
+
+def _chunks(seq: list, size: int):
+    for i in range(0, len(seq), size):
+        yield seq[i:i + size]
+
+def _marks(n: int) -> str:
+    return ",".join("?" * n)
+
+def _piso_hora(dt: datetime) -> datetime:
+    return dt.replace(minute=0, second=0, microsecond=0)
+
+def _techo_hora(dt: datetime) -> datetime:
+    h = _piso_hora(dt)
+    return h if h == dt else h + timedelta(hours=1)
+
 def _table_exists(cur, schema: str, name: str) -> bool:
-    cur.execute("""
-        SELECT 1
-        FROM sys.tables t
-        JOIN sys.schemas s ON s.schema_id = t.schema_id
-        WHERE s.name = ? AND t.name = ?;
-    """, (schema, name))
-    return cur.fetchone() is not None
+    """Consulta el cache de esquema (config.schema_cache); no va a la DB si ya está cargado."""
+    return schema_cache.has_table(schema, name, cur)
 
 def _column_exists(cur, schema: str, table: str, col: str) -> bool:
-    cur.execute("""
-        SELECT 1
-        FROM sys.columns c
-        JOIN sys.tables t ON t.object_id = c.object_id
-        JOIN sys.schemas s ON s.schema_id = t.schema_id
-        WHERE s.name = ? AND t.name = ? AND c.name = ?;
-    """, (schema, table, col))
-    return cur.fetchone() is not None
+    return schema_cache.has_column(schema, table, col, cur)
+
+class VentaIncierta(RuntimeError):
+    """Se cortó la conexión durante el commit: la venta puede o no haber quedado registrada."""
+
+
+class ClaveNoSoportada(RuntimeError):
+    """Se pidió una venta con clave de idempotencia pero la base no tiene Ventas.ClaveIdem."""
+
 
 class ProductoRepo:
     @staticmethod
@@ -95,6 +126,45 @@ class ProductoRepo:
         finally:
             conn.close()
 
+    @staticmethod
+    def cambios_desde(token: Optional[int] = None) -> Tuple[List[Dict], Optional[int]]:
+        """
+        Delta-sync del catálogo: productos modificados después de `token` y el token nuevo.
+        token=None trae todos. Usa dbo.Productos.RowVer; hasta MIN_ACTIVE_ROWVERSION()
+        para no saltear filas de transacciones todavía abiertas.
+        Si la columna no existe devuelve (listar(), None): el que llama recarga completo.
+        """
+        conn = get_connection()
+        try:
+            cur = conn.cursor()
+            if not _column_exists(cur, "dbo", "Productos", "RowVer"):
+                return ProductoRepo.listar(), None
+            has_cb = ProductoRepo._has_barcode(cur)
+            if backends.es_sqlite():
+                # RowVer es un contador que mantienen triggers; SQLite serializa las
+                # escrituras, así que el valor actual ya no tiene transacciones abiertas debajo
+                cur.execute("SELECT Valor FROM RowVerSeq")
+                filtro = "RowVer > ? AND RowVer <= ?"
+            else:
+                cur.execute("SELECT CAST(MIN_ACTIVE_ROWVERSION() AS BIGINT) - 1")
+                filtro = ("RowVer > CAST(CAST(? AS BIGINT) AS BINARY(8))"
+                          " AND RowVer <= CAST(CAST(? AS BIGINT) AS BINARY(8))")
+            hasta = int(cur.fetchone()[0])
+            sql = """
+                SELECT ProductoID, Nombre, Precio, Stock, Activo {extra}
+                  FROM dbo.Productos
+                 WHERE {filtro}
+                 ORDER BY Nombre
+            """.format(extra=", CodigoBarras" if has_cb else "", filtro=filtro)
+            cur.execute(sql, (int(token or 0), hasta))
+            rows = _dict_rows(cur)
+            if not has_cb:
+                for r in rows:
+                    r["CodigoBarras"] = None
+            return rows, hasta
+        finally:
+            conn.close()
+
     @staticmethod
     def crear(nombre: str, precio: float, stock: float, codigo_barras: Optional[str] = None):
         conn = get_connection()
@@ -104,16 +174,23 @@ class ProductoRepo:
             if has_cb:
                 cur.execute("""
                     INSERT INTO dbo.Productos (Nombre, Precio, Stock, Activo, CodigoBarras)
+                    OUTPUT INSERTED.ProductoID
                     VALUES (?,?,?,?,?)
                 """, (nombre, precio, stock, 1, codigo_barras))
             else:
                 cur.execute("""
                     INSERT INTO dbo.Productos (Nombre, Precio, Stock, Activo)
+                    OUTPUT INSERTED.ProductoID
                     VALUES (?,?,?,1)
                 """, (nombre, precio, stock))
+            row = cur.fetchone()
             conn.commit()
         finally:
             conn.close()
+        pid = int(row[0]) if row and row[0] is not None else None
+        if pid is not None:
+            _notificar_productos([pid])
+        return pid
 
     @staticmethod
     def actualizar_stock(producto_id: int, delta: float):
@@ -122,6 +199,7 @@ class ProductoRepo:
             "UPDATE dbo.Productos SET Stock = Stock + ? WHERE ProductoID = ?",
             (float(delta), producto_id),
         )
+        _notificar_productos([producto_id])
 
     @staticmethod
     def buscar_por_codigo_barras(codigo: str) -> Optional[Dict]:
@@ -209,6 +287,31 @@ class ProductoRepo:
         finally:
             conn.close()
 
+    @staticmethod
+    def listar_por_ids(ids: List[int]) -> List[Dict]:
+        """Trae varios productos por ID en una consulta por lote."""
+        ids = [int(x) for x in ids]
+        if not ids:
+            return []
+        conn = get_connection()
+        try:
+            cur = conn.cursor()
+            has_cb = ProductoRepo._has_barcode(cur)
+            rows = []
+            for lote in _chunks(ids, _LOTE_PARAMS):
+                cur.execute("""
+                    SELECT ProductoID, Nombre, Precio, Stock, Activo {extra}
+                      FROM dbo.Productos
+                     WHERE ProductoID IN ({marks})
+                """.format(extra=", CodigoBarras" if has_cb else "", marks=_marks(len(lote))), lote)
+                rows.extend(_dict_rows(cur))
+            if not has_cb:
+                for r in rows:
+                    r["CodigoBarras"] = None
+            return rows
+        finally:
+            conn.close()
+
     @staticmethod
     def actualizar(producto_id: int, nombre: str, precio: float, codigo_barras: Optional[str] = None):
         conn = get_connection()
@@ -229,11 +332,13 @@ class ProductoRepo:
             conn.commit()
         finally:
             conn.close()
+        _notificar_productos([producto_id])
 
     @staticmethod
     def set_estado(producto_id: int, activo: bool):
         exec_nonquery("UPDATE dbo.Productos SET Activo = ? WHERE ProductoID = ?",
                       (1 if activo else 0, producto_id))
+        _notificar_productos([producto_id])
 
     @staticmethod
     def bloquear(producto_id: int):
@@ -278,6 +383,22 @@ class ClienteRepo:
 
 
 class VentaRepo:
+    @staticmethod
+    def clave_disponible() -> bool:
+        """True si la base aplica la clave de idempotencia (existe Ventas.ClaveIdem)."""
+        conn = get_connection()
+        try:
+            return _column_exists(conn.cursor(), "dbo", "Ventas", "ClaveIdem")
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _por_clave(cur, clave: str, bloquear: bool = False) -> Optional[Tuple[int, float]]:
+        hint = " WITH (UPDLOCK, HOLDLOCK)" if bloquear else ""
+        cur.execute(f"SELECT VentaID, Total FROM dbo.Ventas{hint} WHERE ClaveIdem = ?", (clave,))
+        row = cur.fetchone()
+        return (int(row[0]), float(row[1])) if row else None
+
     @staticmethod
     def crear_venta(
         cliente_id: Optional[int],
@@ -288,30 +409,75 @@ class VentaRepo:
         metodo_pago: Optional[str] = None,
         entregado: Optional[float] = None,
         vuelto: Optional[float] = None,
-        pagos: Optional[List[Dict[str, Any]]] = None 
+        pagos: Optional[List[Dict[str, Any]]] = None,
+        usuario_id: Optional[int] = None,
+        fecha: Optional[datetime] = None,
+        clave: Optional[str] = None,
     ) -> Tuple[int, float, List[Dict[str, Any]]]:
         """
         Crea una venta con detalle y descuenta stock.
         - Verifica stock.
         - Aplica descuento/recargo (%).
         - Registra pagos y movimientos de stock si existen esas tablas.
+        - Acumula la venta en los resúmenes por hora y por día (ResumenRepo),
+          después del commit y en una transacción aparte.
+        - fecha (UTC): sólo para ventas que se registran después (diario offline):
+          la de la venta real. Sin fecha vale el default del servidor, así
+          cierres y resúmenes no dependen del reloj de cada caja.
+        - clave: de idempotencia, una por carrito. Si ya hay una venta con esa
+          clave no se graba nada y se devuelve la original, así que reintentar
+          después de un corte (o desde el diario) no duplica venta ni stock.
+          Si la base no tiene Ventas.ClaveIdem se lanza ClaveNoSoportada sin
+          grabar nada: la clave nunca se ignora en silencio.
         Retorna: (venta_id, total_final, items_guardados)
+
+        Las consultas se cortan a los config.VENTA_TIMEOUT segundos. Si lo que
+        falla es el commit se lanza VentaIncierta: no se sabe si quedó grabada
+        (con clave, reintentar con la misma clave lo resuelve).
+
+        Trabaja por lotes: la cantidad de round-trips no depende del tamaño del
+        carrito (un UPDATE condicional de stock, un INSERT de cabecera y un
+        executemany por tabla de detalle).
         """
         conn = get_connection()
         try:
             conn.autocommit = False
+            conn.timeout = config.VENTA_TIMEOUT
             cur = conn.cursor()
 
-
+            con_clave = bool(clave)
+            if con_clave and not _column_exists(cur, "dbo", "Ventas", "ClaveIdem"):
+                raise ClaveNoSoportada(
+                    "La base no tiene la columna Ventas.ClaveIdem (correr ensure_schema): "
+                    "no se puede registrar la venta sin riesgo de duplicarla.")
+            if con_clave:
+                # UPDLOCK+HOLDLOCK bloquea el rango de la clave hasta el commit: un reintento
+                # simultáneo con la misma clave espera acá y después encuentra la venta
+                previa = VentaRepo._por_clave(cur, clave, bloquear=True)
+                if previa is not None:
+                    conn.rollback()
+                    return previa[0], previa[1], items
+
+            # cantidades totales por producto (un producto puede venir en varias líneas)
+            por_producto: Dict[int, float] = {}
             for it in items:
-                cur.execute("SELECT Stock, Nombre FROM dbo.Productos WHERE ProductoID=?", (it['producto_id'],))
-                row = cur.fetchone()
-                if not row:
-                    raise ValueError("Producto no existe")
-                stock_actual, nombre = row
-                cant = float(it['cantidad'])
-                if stock_actual is not None and float(stock_actual) < cant:
-                    raise ValueError(f"Stock insuficiente para '{nombre}'. Disponible: {stock_actual}")
+                pid = int(it['producto_id'])
+                por_producto[pid] = por_producto.get(pid, 0.0) + float(it['cantidad'])
+
+            # descuento condicional: sólo descuenta si alcanza el stock. Es atómico por
+            # fila, así dos cajas que venden la última unidad no pueden pasar ambas
+            # (sin bloquear la tabla). Orden por ProductoID para evitar deadlocks.
+            # (UPDATE tabla ... FROM fuente: la misma sentencia vale en SQL Server y SQLite)
+            deltas = sorted(por_producto.items())
+            for lote in _chunks(deltas, _LOTE_PARAMS // 2):
+                cur.execute(f"""
+                    UPDATE dbo.Productos WITH (ROWLOCK) SET Stock = Stock - v.Cant
+                      FROM (VALUES {", ".join(["(?,?)"] * len(lote))}) AS v(ProductoID, Cant)
+                     WHERE v.ProductoID = Productos.ProductoID
+                       AND (Productos.Stock IS NULL OR Productos.Stock >= v.Cant)
+                """, [x for par in lote for x in par])
+                if cur.rowcount != len(lote):
+                    VentaRepo._error_stock(cur, items, por_producto, [pid for pid, _ in lote])
 
             subtotal = sum(float(it['cantidad']) * float(it['precio']) for it in items)
             total = subtotal
@@ -321,18 +487,12 @@ class VentaRepo:
                 total = total * (1 + (recargo_pct / 100.0))
             total = round(total, 2)
 
-
-            cur.execute("""
-                INSERT INTO dbo.Ventas (ClienteID, Fecha, Total)
-                OUTPUT INSERTED.VentaID
-                VALUES (?, ?, ?)
-            """, (cliente_id, datetime.utcnow(), total))
-            row = cur.fetchone()
-            if not row or row[0] is None:
-                raise RuntimeError("No se pudo obtener el VentaID después del INSERT.")
-            venta_id = int(row[0])
-
+            # cabecera completa en un solo INSERT (sólo columnas que existen)
+            cols = ["ClienteID", "Total"]
+            vals: List[Any] = [cliente_id, total]
             for col, val in [
+                ("Fecha", fecha),
+                ("UsuarioID", usuario_id),
                 ("MetodoPago", metodo_pago),
                 ("Entregado", entregado),
                 ("Vuelto", vuelto),
@@ -342,45 +502,105 @@ class VentaRepo:
                 if val is None:
                     continue
                 if _column_exists(cur, "dbo", "Ventas", col):
-                    cur.execute(f"UPDATE dbo.Ventas SET {col}=? WHERE VentaID=?", (val, venta_id))
-
-
-            stockmov_exists = _table_exists(cur, "dbo", "StockMov")
-            for it in items:
-                cant = float(it['cantidad'])
-                price = float(it['precio'])
+                    cols.append(col)
+                    vals.append(val)
+            if con_clave:
+                cols.append("ClaveIdem")
+                vals.append(clave)
+            try:
+                cur.execute(f"""
+                    INSERT INTO dbo.Ventas ({", ".join(cols)})
+                    OUTPUT INSERTED.VentaID, INSERTED.Fecha
+                    VALUES ({_marks(len(cols))})
+                """, vals)
+            except Exception as e:
+                # SQL Server nombra el índice; SQLite, la columna
+                if not (con_clave and ("UX_Ventas_ClaveIdem" in str(e) or "Ventas.ClaveIdem" in str(e))):
+                    raise
+                # otra caja/hilo la grabó entre la consulta y el INSERT: vale la original
+                conn.rollback()
+                previa = VentaRepo._por_clave(cur, clave)
+                if previa is None:
+                    raise
+                return previa[0], previa[1], items
+            row = cur.fetchone()
+            if not row or row[0] is None:
+                raise RuntimeError("No se pudo obtener el VentaID después del INSERT.")
+            venta_id = int(row[0])
+            fecha = row[1]      # la que quedó grabada (default del servidor si no vino)
 
-                cur.execute("""
+            if items:
+                cur.fast_executemany = True
+                cur.executemany("""
                     INSERT INTO dbo.VentaDetalle (VentaID, ProductoID, Cantidad, PrecioUnitario)
                     VALUES (?,?,?,?)
-                """, (venta_id, it['producto_id'], cant, price))
-
-
-                cur.execute("UPDATE dbo.Productos SET Stock = Stock - ? WHERE ProductoID=?",
-                            (cant, it['producto_id']))
+                """, [(venta_id, int(it['producto_id']), float(it['cantidad']), float(it['precio']))
+                      for it in items])
 
-                if stockmov_exists:
-                    cur.execute("""
+                if _table_exists(cur, "dbo", "StockMov"):
+                    cur.executemany("""
                         INSERT INTO dbo.StockMov (ProductoID, Cantidad, Tipo, RefID)
                         VALUES (?, ?, 'VENTA', ?)
-                    """, (it['producto_id'], -abs(cant), venta_id))
-
-            if pagos:
-                pagos_exists = _table_exists(cur, "dbo", "Pagos")
-                if pagos_exists:
-                    for p in pagos:
-                        cur.execute("""
-                            INSERT INTO dbo.Pagos (VentaID, Monto, Medio, Referencia)
-                            VALUES (?, ?, ?, ?)
-                        """, (venta_id, float(p['monto']), p['medio'], p.get('ref')))
+                    """, [(int(it['producto_id']), -abs(float(it['cantidad'])), venta_id) for it in items])
+
+            con_pagos = bool(pagos) and _table_exists(cur, "dbo", "Pagos")
+            if con_pagos:
+                cur.fast_executemany = True
+                cur.executemany("""
+                    INSERT INTO dbo.Pagos (VentaID, Monto, Medio, Referencia)
+                    VALUES (?, ?, ?, ?)
+                """, [(venta_id, float(p['monto']), p['medio'], p.get('ref')) for p in pagos])
+
+            # mismo criterio que ResumenRepo._fuente_medios: los pagos si hay, si no el método de la cabecera
+            medios: Dict[str, float] = {}
+            if con_pagos:
+                for p in pagos:
+                    medio = p['medio'] or ""
+                    medios[medio] = medios.get(medio, 0.0) + float(p['monto'])
+            else:
+                medios[metodo_pago or ""] = total
 
-            conn.commit()
-            return venta_id, total, items
+            try:
+                conn.commit()
+            except Exception as e:
+                if config.es_db_no_disponible(e):
+                    raise VentaIncierta(
+                        f"Se perdió la conexión al confirmar la venta; verificar si quedó registrada ({e})"
+                    ) from e
+                raise
+        except VentaIncierta:
+            raise
         except Exception:
-            conn.rollback()
+            try:
+                conn.rollback()
+            except Exception:
+                pass        # con la conexión caída el rollback también falla; vale el error original
             raise
         finally:
             conn.close()
+        ResumenRepo.sumar_venta(fecha, medios, usuario_id, items)
+        _notificar_productos(list(por_producto), stock_delta=por_producto)
+        return venta_id, total, items
+
+    @staticmethod
+    def _error_stock(cur, items, por_producto: Dict[int, float], pids: List[int]):
+        """El UPDATE condicional no tocó todas las filas: averigua cuál falló y lo informa."""
+        cur.execute(
+            f"SELECT ProductoID, Stock, Nombre FROM dbo.Productos WHERE ProductoID IN ({_marks(len(pids))})",
+            pids,
+        )
+        stock = {int(pid): (st, nombre) for pid, st, nombre in cur.fetchall()}
+        pids = set(pids)
+        for it in items:
+            pid = int(it['producto_id'])
+            if pid not in pids:
+                continue
+            if pid not in stock:
+                raise ValueError("Producto no existe")
+            stock_actual, nombre = stock[pid]
+            if stock_actual is not None and float(stock_actual) < por_producto[pid]:
+                raise ValueError(f"Stock insuficiente para '{nombre}'. Disponible: {stock_actual}")
+        raise RuntimeError("No se pudo descontar el stock de la venta.")
 
     @staticmethod
     def obtener_cabecera(venta_id: int) -> Optional[Dict[str, Any]]:
@@ -404,23 +624,391 @@ class VentaRepo:
             ORDER BY d.DetalleID
         """, (venta_id,))
     
-    # 👉 AÑADIR ESTE MÉTODO AQUÍ, dentro de VentaRepo
     @staticmethod
     def listar(limit: int = 200) -> List[Dict[str, Any]]:
         """
         Devuelve las últimas `limit` ventas con datos de cliente y pago.
         """
-        sql = f"""
-            SELECT TOP {int(limit)}
+        rows, _ = VentaRepo.pagina(orden="id_desc", limite=limit)
+        return rows
+
+    _SELECT_LISTADO = """
+            SELECT TOP {top}
                    v.VentaID, v.Fecha, v.Total,
                    v.MetodoPago, v.Entregado, v.Vuelto,
                    v.DescuentoPct, v.RecargoPct,
                    c.ClienteID, c.Nombre AS ClienteNombre
               FROM dbo.Ventas v
               LEFT JOIN dbo.Clientes c ON c.ClienteID = v.ClienteID
-             ORDER BY v.VentaID DESC
+    """
+
+    # orden -> (columna de orden, descendente); el desempate siempre es VentaID
+    _ORDENES = {
+        "fecha_desc": ("v.Fecha", True),
+        "fecha_asc": ("v.Fecha", False),
+        "id_desc": ("v.VentaID", True),
+        "id_asc": ("v.VentaID", False),
+        "total_desc": ("v.Total", True),
+        "total_asc": ("v.Total", False),
+    }
+
+    @staticmethod
+    def _filtros_sql(filtros: Dict[str, Any]) -> Tuple[List[str], List[Any]]:
         """
-        return query_all(sql)
+        Filtros del listado de ventas:
+          desde / hasta (datetime, [desde, hasta)), cliente_id, cliente (texto del nombre),
+          metodo_pago, monto_min, monto_max.
+        """
+        where, params = [], []
+        if filtros.get("desde") is not None:
+            where.append("v.Fecha >= ?"); params.append(filtros["desde"])
+        if filtros.get("hasta") is not None:
+            where.append("v.Fecha < ?"); params.append(filtros["hasta"])
+        if filtros.get("cliente_id") is not None:
+            where.append("v.ClienteID = ?"); params.append(int(filtros["cliente_id"]))
+        if filtros.get("cliente"):
+            where.append("c.Nombre LIKE ?"); params.append(f"%{filtros['cliente']}%")
+        if filtros.get("metodo_pago"):
+            where.append("v.MetodoPago = ?"); params.append(filtros["metodo_pago"])
+        if filtros.get("monto_min") is not None:
+            where.append("v.Total >= ?"); params.append(float(filtros["monto_min"]))
+        if filtros.get("monto_max") is not None:
+            where.append("v.Total <= ?"); params.append(float(filtros["monto_max"]))
+        return where, params
+
+    @staticmethod
+    def pagina(
+        orden: str = "fecha_desc",
+        despues: Optional[Tuple[Any, int]] = None,
+        limite: int = 200,
+        **filtros,
+    ) -> Tuple[List[Dict[str, Any]], Optional[Tuple[Any, int]]]:
+        """
+        Una página del listado de ventas con paginación por clave (keyset):
+        `despues` es el cursor devuelto por la página anterior (valor de orden, VentaID),
+        así cada página es un seek sobre el índice y no un OFFSET que relee lo anterior.
+        Devuelve (filas, cursor_siguiente); el cursor es None en la última página.
+        """
+        if orden not in VentaRepo._ORDENES:
+            raise ValueError(f"Orden inválido: {orden}")
+        col, desc = VentaRepo._ORDENES[orden]
+        where, params = VentaRepo._filtros_sql(filtros)
+        if despues is not None:
+            valor, vid = despues
+            op = "<" if desc else ">"
+            if col == "v.VentaID":
+                where.append(f"v.VentaID {op} ?"); params.append(int(vid))
+            else:
+                where.append(f"({col} {op} ? OR ({col} = ? AND v.VentaID {op} ?))")
+                params.extend([valor, valor, int(vid)])
+        direc = "DESC" if desc else "ASC"
+        orden_sql = f"{col} {direc}" if col == "v.VentaID" else f"{col} {direc}, v.VentaID {direc}"
+        limite = max(1, int(limite))
+        sql = (VentaRepo._SELECT_LISTADO.format(top=limite + 1)
+               + (" WHERE " + " AND ".join(where) if where else "")
+               + f" ORDER BY {orden_sql}")
+        rows = query_all(sql, tuple(params))
+        if len(rows) <= limite:
+            return rows, None
+        rows = rows[:limite]
+        ultima = rows[-1]
+        clave = {"v.Fecha": "Fecha", "v.Total": "Total", "v.VentaID": "VentaID"}[col]
+        return rows, (ultima[clave], ultima["VentaID"])
+
+    @staticmethod
+    def resumen_filtro(**filtros) -> Dict[str, Any]:
+        """Cantidad de ventas y suma de totales para los mismos filtros de pagina()."""
+        usados = {k for k, v in filtros.items() if v not in (None, "")}
+        if usados <= {"desde", "hasta"} and all(
+                filtros.get(k) is None or filtros[k] == _piso_hora(filtros[k]) for k in usados):
+            # sólo período en horas completas: sale del resumen horario, sin recorrer ventas
+            res = ResumenRepo.totales(filtros.get("desde"), filtros.get("hasta"))
+            if res is not None:
+                return res
+        where, params = VentaRepo._filtros_sql(filtros)
+        row = query_one(f"""
+            SELECT COUNT(*) AS Cantidad, COALESCE(SUM(v.Total), 0) AS Total
+              FROM dbo.Ventas v
+              LEFT JOIN dbo.Clientes c ON c.ClienteID = v.ClienteID
+            {"WHERE " + " AND ".join(where) if where else ""}
+        """, tuple(params))
+        return {"Cantidad": int(row["Cantidad"]), "Total": float(row["Total"])}
+
+
+class ResumenRepo:
+    """
+    Resúmenes de ventas precalculados, para que cierres y reportes de meses/años
+    lean O(horas/días) filas en vez de recorrer todas las ventas:
+      - dbo.ResumenVentasHora: por hora, medio de pago y usuario (cantidad y total).
+        Una venta pagada con varios medios suma su total a cada uno, pero se
+        cuenta una sola vez: en el primero de sus medios (orden alfabético)
+      - dbo.ResumenProductoDia: por día y producto (cantidad e importe de lista)
+    crear_venta los actualiza después de confirmar la venta, en una transacción
+    corta aparte (el MERGE bloquea la fila de la hora, que comparten todas las
+    cajas); reconstruir() los rehace desde las ventas (backfill o corrección,
+    y respaldo si esa segunda transacción falla).
+    Las horas/días están en la misma base horaria que Ventas.Fecha.
+    """
+
+    @staticmethod
+    def _disponible(cur) -> bool:
+        return (_table_exists(cur, "dbo", "ResumenVentasHora")
+                and _table_exists(cur, "dbo", "ResumenProductoDia"))
+
+    @staticmethod
+    def sumar_venta(fecha: datetime, medios: Dict[str, float], usuario_id: Optional[int],
+                    items: List[Dict[str, Any]]) -> None:
+        """
+        Suma a los resúmenes una venta ya confirmada. Es aparte de la transacción
+        de la venta para que el bloqueo de la fila caliente dure sólo estos MERGE.
+        Si falla la venta igual quedó grabada: se avisa y no se propaga (el
+        resumen se corrige con reconstruir()).
+        """
+        conn = None
+        try:
+            conn = get_connection()
+            conn.autocommit = False
+            conn.timeout = config.VENTA_TIMEOUT
+            ResumenRepo._acumular(conn.cursor(), fecha, medios, usuario_id, items)
+            conn.commit()
+        except Exception as e:
+            if conn is not None:
+                try:
+                    conn.rollback()
+                except Exception:
+                    pass
+            print("WARN resúmenes de ventas (correr ResumenRepo.reconstruir):", e)
+        finally:
+            if conn is not None:
+                conn.close()
+
+    @staticmethod
+    def _acumular(cur, fecha: datetime, medios: Dict[str, float], usuario_id: Optional[int],
+                  items: List[Dict[str, Any]]) -> None:
+        """Suma una venta a los resúmenes, con la transacción del llamador (ver sumar_venta)."""
+        if not ResumenRepo._disponible(cur):
+            return
+        hora = fecha.replace(minute=0, second=0, microsecond=0)
+        uid = int(usuario_id or 0)
+        por_medio: Dict[str, float] = {}
+        for medio, monto in medios.items():
+            por_medio[medio[:30]] = por_medio.get(medio[:30], 0.0) + monto
+        # la venta cuenta una vez, en su primer medio; los demás sólo suman importe
+        filas = [(hora, medio, uid, 1 if i == 0 else 0, round(monto, 2))
+                 for i, (medio, monto) in enumerate(sorted(por_medio.items()))]
+        if backends.es_sqlite():
+            ResumenRepo._acumular_sqlite(cur, filas, fecha, items)
+            return
+        cur.execute(f"""
+            MERGE dbo.ResumenVentasHora WITH (HOLDLOCK) AS t
+            USING (VALUES {", ".join(["(?,?,?,?,?)"] * len(filas))}) AS s(Hora, Medio, UsuarioID, Ventas, Total)
+               ON t.Hora = s.Hora AND t.Medio = s.Medio AND t.UsuarioID = s.UsuarioID
+            WHEN MATCHED THEN UPDATE SET t.Ventas = t.Ventas + s.Ventas, t.Total = t.Total + s.Total
+            WHEN NOT MATCHED THEN INSERT (Hora, Medio, UsuarioID, Ventas, Total)
+                 VALUES (s.Hora, s.Medio, s.UsuarioID, s.Ventas, s.Total);
+        """, [x for f in filas for x in f])
+
+        dia = fecha.date()
+        for lote in _chunks(ResumenRepo._por_producto(items), _LOTE_PARAMS // 4):
+            cur.execute(f"""
+                MERGE dbo.ResumenProductoDia WITH (HOLDLOCK) AS t
+                USING (VALUES {", ".join(["(?,?,?,?)"] * len(lote))}) AS s(Dia, ProductoID, Cantidad, Importe)
+                   ON t.Dia = s.Dia AND t.ProductoID = s.ProductoID
+                WHEN MATCHED THEN UPDATE SET t.Cantidad = t.Cantidad + s.Cantidad, t.Importe = t.Importe + s.Importe
+                WHEN NOT MATCHED THEN INSERT (Dia, ProductoID, Cantidad, Importe)
+                     VALUES (s.Dia, s.ProductoID, s.Cantidad, s.Importe);
+            """, [x for pid, (cant, imp) in lote for x in (dia, pid, cant, round(imp, 2))])
+
+    @staticmethod
+    def _por_producto(items: List[Dict[str, Any]]) -> List[Tuple[int, List[float]]]:
+        """[(ProductoID, [cantidad, importe])] ordenado por producto."""
+        por_prod: Dict[int, List[float]] = {}
+        for it in items:
+            acc = por_prod.setdefault(int(it['producto_id']), [0.0, 0.0])
+            acc[0] += float(it['cantidad'])
+            acc[1] += float(it['cantidad']) * float(it['precio'])
+        return sorted(por_prod.items())
+
+    @staticmethod
+    def _acumular_sqlite(cur, filas: list, fecha: datetime, items: List[Dict[str, Any]]) -> None:
+        """Lo mismo que el MERGE de _acumular con el upsert de SQLite (INSERT ... ON CONFLICT)."""
+        cur.execute(f"""
+            INSERT INTO ResumenVentasHora (Hora, Medio, UsuarioID, Ventas, Total)
+            VALUES {", ".join(["(?,?,?,?,?)"] * len(filas))}
+            ON CONFLICT (Hora, Medio, UsuarioID)
+            DO UPDATE SET Ventas = Ventas + excluded.Ventas, Total = Total + excluded.Total
+        """, [x for f in filas for x in f])
+        dia = fecha.date()
+        for lote in _chunks(ResumenRepo._por_producto(items), _LOTE_PARAMS // 4):
+            cur.execute(f"""
+                INSERT INTO ResumenProductoDia (Dia, ProductoID, Cantidad, Importe)
+                VALUES {", ".join(["(?,?,?,?)"] * len(lote))}
+                ON CONFLICT (Dia, ProductoID)
+                DO UPDATE SET Cantidad = Cantidad + excluded.Cantidad, Importe = Importe + excluded.Importe
+            """, [x for pid, (cant, imp) in lote for x in (dia, pid, cant, round(imp, 2))])
+
+    @staticmethod
+    def _fuente_medios(cur) -> str:
+        """Ventas por medio: los pagos de la venta si los tiene, si no su MetodoPago por el total."""
+        usuario = "v.UsuarioID" if _column_exists(cur, "dbo", "Ventas", "UsuarioID") else "NULL"
+        metodo = "v.MetodoPago" if _column_exists(cur, "dbo", "Ventas", "MetodoPago") else "NULL"
+        sin_pagos = f"SELECT v.VentaID, v.Fecha, {metodo} AS Medio, {usuario} AS UsuarioID, v.Total AS Monto FROM dbo.Ventas v"
+        if not _table_exists(cur, "dbo", "Pagos"):
+            return sin_pagos
+        return f"""
+            SELECT v.VentaID, v.Fecha, p.Medio, {usuario} AS UsuarioID, p.Monto
+              FROM dbo.Pagos p JOIN dbo.Ventas v ON v.VentaID = p.VentaID
+            UNION ALL
+            {sin_pagos} WHERE NOT EXISTS (SELECT 1 FROM dbo.Pagos p WHERE p.VentaID = v.VentaID)
+        """
+
+    @staticmethod
+    def reconstruir(desde: Optional[datetime] = None, hasta: Optional[datetime] = None) -> None:
+        """
+        Rehace los resúmenes desde las ventas en [desde, hasta) (por defecto todo),
+        redondeando a horas/días completos. Una sola transacción; conviene
+        correrlo con las cajas sin vender (las ventas que entran mientras tanto
+        pueden quedar contadas dos veces).
+        """
+        conn = get_connection()
+        try:
+            conn.autocommit = False
+            cur = conn.cursor()
+            if not ResumenRepo._disponible(cur):
+                return
+            h0 = _piso_hora(desde) if desde else datetime(1900, 1, 1)
+            h1 = _techo_hora(hasta) if hasta else datetime(9999, 12, 31)
+            # los días se rehacen completos: los que toca el rango [h0, h1)
+            d0 = h0.date()
+            d1 = h1.date() if h1.time() == datetime.min.time() else h1.date() + timedelta(days=1)
+
+            cur.execute("DELETE FROM dbo.ResumenVentasHora WHERE Hora >= ? AND Hora < ?", (h0, h1))
+            cur.execute(f"""
+                INSERT INTO dbo.ResumenVentasHora (Hora, Medio, UsuarioID, Ventas, Total)
+                SELECT CAST(DATEADD(hour, DATEDIFF(hour, 0, x.Fecha), 0) AS DATETIME2(0)),
+                       x.Medio, ISNULL(x.UsuarioID, 0),
+                       COUNT(DISTINCT CASE WHEN x.Medio = x.Primero THEN x.VentaID END), SUM(x.Monto)
+                  FROM (SELECT f.VentaID, f.Fecha, f.UsuarioID, f.Monto,
+                               LEFT(ISNULL(f.Medio, ''), 30) AS Medio,
+                               MIN(LEFT(ISNULL(f.Medio, ''), 30)) OVER (PARTITION BY f.VentaID) AS Primero
+                          FROM ({ResumenRepo._fuente_medios(cur)}) f) x
+                 WHERE x.Fecha >= ? AND x.Fecha < ?
+                 GROUP BY DATEADD(hour, DATEDIFF(hour, 0, x.Fecha), 0),
+                          x.Medio, ISNULL(x.UsuarioID, 0)
+            """, (h0, h1))
+
+            cur.execute("DELETE FROM dbo.ResumenProductoDia WHERE Dia >= ? AND Dia < ?", (d0, d1))
+            cur.execute("""
+                INSERT INTO dbo.ResumenProductoDia (Dia, ProductoID, Cantidad, Importe)
+                SELECT CAST(v.Fecha AS DATE), d.ProductoID,
+                       SUM(d.Cantidad), SUM(d.Cantidad * d.PrecioUnitario)
+                  FROM dbo.VentaDetalle d
+                  JOIN dbo.Ventas v ON v.VentaID = d.VentaID
+                 WHERE v.Fecha >= ? AND v.Fecha < ?
+                 GROUP BY CAST(v.Fecha AS DATE), d.ProductoID
+            """, (datetime.combine(d0, datetime.min.time()), datetime.combine(d1, datetime.min.time())))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _crudo_por_medio(cur, f0: datetime, f1: datetime, incluir_f1: bool) -> Dict[str, float]:
+        op = "<=" if incluir_f1 else "<"
+        cur.execute(f"""
+            SELECT x.Medio, SUM(x.Monto)
+              FROM ({ResumenRepo._fuente_medios(cur)}) x
+             WHERE x.Fecha >= ? AND x.Fecha {op} ?
+             GROUP BY x.Medio
+        """, (f0, f1))
+        return {(m or ""): float(t or 0) for m, t in cur.fetchall()}
+
+    @staticmethod
+    def totales_por_medio(f0: datetime, f1: datetime) -> Dict[str, float]:
+        """
+        Total vendido por medio de pago en [f0, f1]. Las horas completas salen del
+        resumen; sólo los bordes (antes de la primera hora entera y después de la
+        última) se suman desde las ventas.
+        """
+        conn = get_connection()
+        try:
+            cur = conn.cursor()
+            if not ResumenRepo._disponible(cur):
+                return ResumenRepo._crudo_por_medio(cur, f0, f1, incluir_f1=True)
+            h0, h1 = _techo_hora(f0), _piso_hora(f1)
+            if h0 >= h1:
+                return ResumenRepo._crudo_por_medio(cur, f0, f1, incluir_f1=True)
+
+            res: Dict[str, float] = {}
+            def _sumar(d):
+                for m, t in d.items():
+                    res[m] = res.get(m, 0.0) + t
+
+            cur.execute("""
+                SELECT Medio, SUM(Total) FROM dbo.ResumenVentasHora
+                 WHERE Hora >= ? AND Hora < ?
+                 GROUP BY Medio
+            """, (h0, h1))
+            _sumar({(m or ""): float(t or 0) for m, t in cur.fetchall()})
+            if f0 < h0:
+                _sumar(ResumenRepo._crudo_por_medio(cur, f0, h0, incluir_f1=False))
+            _sumar(ResumenRepo._crudo_por_medio(cur, h1, f1, incluir_f1=True))
+            return res
+        finally:
+            conn.close()
+
+    @staticmethod
+    def por_dia(desde: datetime, hasta: datetime) -> List[Dict[str, Any]]:
+        """Ventas y total por día en [desde, hasta) desde el resumen horario."""
+        return query_all("""
+            SELECT CAST(Hora AS DATE) AS Dia, SUM(Ventas) AS Ventas, SUM(Total) AS Total
+              FROM dbo.ResumenVentasHora
+             WHERE Hora >= ? AND Hora < ?
+             GROUP BY CAST(Hora AS DATE)
+             ORDER BY Dia
+        """, (desde, hasta))
+
+    @staticmethod
+    def por_producto(desde: datetime, hasta: datetime, limit: int = 100) -> List[Dict[str, Any]]:
+        """Productos más vendidos en [desde, hasta) (días completos) desde el resumen diario."""
+        return query_all(f"""
+            SELECT TOP {int(limit)} r.ProductoID, p.Nombre,
+                   SUM(r.Cantidad) AS Cantidad, SUM(r.Importe) AS Importe
+              FROM dbo.ResumenProductoDia r
+              JOIN dbo.Productos p ON p.ProductoID = r.ProductoID
+             WHERE r.Dia >= ? AND r.Dia < ?
+             GROUP BY r.ProductoID, p.Nombre
+             ORDER BY SUM(r.Importe) DESC
+        """, (desde.date(), hasta.date() if hasta.time() == datetime.min.time()
+              else (hasta + timedelta(days=1)).date()))
+
+    @staticmethod
+    def totales(desde: Optional[datetime] = None, hasta: Optional[datetime] = None) -> Optional[Dict[str, Any]]:
+        """
+        Cantidad de ventas y total en [desde, hasta) (horas completas) desde el resumen.
+        None si los resúmenes no existen.
+        """
+        where, params = [], []
+        if desde is not None:
+            where.append("Hora >= ?"); params.append(desde)
+        if hasta is not None:
+            where.append("Hora < ?"); params.append(hasta)
+        conn = get_connection()
+        try:
+            cur = conn.cursor()
+            if not ResumenRepo._disponible(cur):
+                return None
+            cur.execute(f"""
+                SELECT COALESCE(SUM(Ventas), 0), COALESCE(SUM(Total), 0)
+                  FROM dbo.ResumenVentasHora
+                {"WHERE " + " AND ".join(where) if where else ""}
+            """, tuple(params))
+            cant, total = cur.fetchone()
+            return {"Cantidad": int(cant), "Total": float(total)}
+        finally:
+            conn.close()
 
 
 class UsuarioRepo:
@@ -540,6 +1128,68 @@ class AuditRepo:
         finally:
             conn.close()
 
+class TicketArchivoRepo:
+    """Índice del archivo de tickets: VentaID -> hash del PDF vigente (ver ticket_archivo.py)."""
+    @staticmethod
+    def ultimos(venta_ids: List[int]) -> Dict[int, str]:
+        ids = sorted({int(v) for v in venta_ids})
+        out: Dict[int, str] = {}
+        if not ids:
+            return out
+        conn = get_connection()
+        try:
+            cur = conn.cursor()
+            if not _table_exists(cur, "dbo", "TicketArchivo"):
+                return out
+            for lote in _chunks(ids, _LOTE_PARAMS):
+                cur.execute(f"""
+                    SELECT t.VentaID, t.Sha256
+                    FROM dbo.TicketArchivo t
+                    WHERE t.TicketArchivoID IN (
+                        SELECT MAX(TicketArchivoID) FROM dbo.TicketArchivo
+                        WHERE VentaID IN ({_marks(len(lote))})
+                        GROUP BY VentaID
+                    )
+                """, lote)
+                out.update({int(r[0]): r[1] for r in cur.fetchall()})
+            return out
+        finally:
+            conn.close()
+
+    @staticmethod
+    def registrar(entradas: List[Tuple[int, str, int]]) -> int:
+        """
+        entradas: (VentaID, Sha256, Bytes). Sólo agrega fila si el hash difiere
+        del vigente de esa venta (reimprimir lo mismo no crece el índice).
+        Devuelve cuántas filas se insertaron.
+        """
+        if not entradas:
+            return 0
+        conn = get_connection()
+        try:
+            cur = conn.cursor()
+            if not _table_exists(cur, "dbo", "TicketArchivo"):
+                return 0
+            n = 0
+            for lote in _chunks(list(entradas), _LOTE_PARAMS // 3):
+                valores = ", ".join("(?,?,?)" for _ in lote)
+                cur.execute(f"""
+                    INSERT INTO dbo.TicketArchivo(VentaID, Sha256, Bytes)
+                    SELECT v.VentaID, v.Sha256, v.Bytes
+                    FROM (VALUES {valores}) v(VentaID, Sha256, Bytes)
+                    WHERE NOT EXISTS (
+                        SELECT 1 FROM dbo.TicketArchivo t
+                        WHERE t.TicketArchivoID = (SELECT MAX(TicketArchivoID) FROM dbo.TicketArchivo
+                                                   WHERE VentaID = v.VentaID)
+                          AND t.Sha256 = v.Sha256
+                    )
+                """, [x for e in lote for x in (int(e[0]), e[1], int(e[2]))])
+                n += max(0, cur.rowcount)
+            conn.commit()
+            return n
+        finally:
+            conn.close()
+
 class IngresoStockRepo:
     @staticmethod
     def ingresar(
@@ -593,19 +1243,20 @@ class IngresoStockRepo:
                 """, (producto_id, abs(float(cantidad)), ingreso_id))
 
             conn.commit()
-            return {
-                "producto_id": producto_id,
-                "stock_anterior": float(stock_anterior or 0),
-                "stock_nuevo": stock_nuevo,
-                "precio_anterior": float(precio_anterior or 0),
-                "precio_nuevo": float(precio_venta),
-                "ingreso_id": ingreso_id,
-            }
         except Exception:
             conn.rollback()
             raise
         finally:
             conn.close()
+        _notificar_productos([producto_id])
+        return {
+            "producto_id": producto_id,
+            "stock_anterior": float(stock_anterior or 0),
+            "stock_nuevo": stock_nuevo,
+            "precio_anterior": float(precio_anterior or 0),
+            "precio_nuevo": float(precio_venta),
+            "ingreso_id": ingreso_id,
+        }
 
     @staticmethod
     def listar_ingresos(limit: int = 200) -> List[Dict[str, Any]]:
@@ -632,8 +1283,19 @@ class IngresoStockRepo:
         return query_all(sql, (producto_id,))
 
 class EmpresaRepo:
+    # Los datos de la empresa se leen en cada ticket y en la barra superior pero
+    # casi nunca cambian: quedan en memoria hasta invalidar() (guardar() lo llama).
+    _cache: Optional[Dict[str, Any]] = None
+    _version = 0
+    _lock = threading.Lock()
+
     @staticmethod
-    def obtener() -> Dict[str, Any]:
+    def obtener(forzar: bool = False) -> Dict[str, Any]:
+        """Devuelve una copia: quien la modifique no ensucia el cache."""
+        with EmpresaRepo._lock:
+            cache, version = EmpresaRepo._cache, EmpresaRepo._version
+        if cache is not None and not forzar:
+            return dict(cache)
         sql = """
             SELECT TOP 1 EmpresaID, Nombre, CUIT, CondicionIVA, Direccion, Telefono, Email, LogoPath, ActualizadoEn
             FROM dbo.Empresa ORDER BY EmpresaID
@@ -641,9 +1303,19 @@ class EmpresaRepo:
         row = query_one(sql)
         if not row:
             # fallback vacío si la tabla existe pero sin filas (no debería pasar)
-            return {"EmpresaID": None, "Nombre": "Empresa", "CUIT": None, "CondicionIVA": None,
-                    "Direccion": None, "Telefono": None, "Email": None, "LogoPath": None}
-        return row
+            row = {"EmpresaID": None, "Nombre": "Empresa", "CUIT": None, "CondicionIVA": None,
+                   "Direccion": None, "Telefono": None, "Email": None, "LogoPath": None}
+        with EmpresaRepo._lock:
+            # si alguien invalidó mientras se consultaba, lo leído puede ser viejo: no se guarda
+            if EmpresaRepo._version == version:
+                EmpresaRepo._cache = row
+        return dict(row)
+
+    @staticmethod
+    def invalidar() -> None:
+        with EmpresaRepo._lock:
+            EmpresaRepo._cache = None
+            EmpresaRepo._version += 1
 
     @staticmethod
     def guardar(nombre: str, cuit: str | None, condicion: str | None,
@@ -669,3 +1341,4 @@ class EmpresaRepo:
                 conn.commit()
         finally:
             conn.close()
+            EmpresaRepo.invalidar()
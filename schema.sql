@@ -35,8 +35,10 @@ BEGIN
         Precio       DECIMAL(18,2) NOT NULL CONSTRAINT DF_Productos_Precio DEFAULT(0),
         Stock        INT           NOT NULL CONSTRAINT DF_Productos_Stock  DEFAULT(0),
         Activo       BIT           NOT NULL CONSTRAINT DF_Productos_Activo DEFAULT(1),
-        CodigoBarras NVARCHAR(32)  NULL
+        CodigoBarras NVARCHAR(32)  NULL,
+        RowVer       ROWVERSION
     );
+    CREATE INDEX IX_Productos_RowVer ON dbo.Productos(RowVer);
 END;
 
 -- Clientes
@@ -63,8 +65,50 @@ BEGIN
         Entregado    DECIMAL(18,2) NULL,
         Vuelto       DECIMAL(18,2) NULL,
         DescuentoPct DECIMAL(5,2) NULL CONSTRAINT DF_Ventas_DescPct DEFAULT(0),
-        RecargoPct   DECIMAL(5,2) NULL CONSTRAINT DF_Ventas_RecPct DEFAULT(0)
+        RecargoPct   DECIMAL(5,2) NULL CONSTRAINT DF_Ventas_RecPct DEFAULT(0),
+        UsuarioID    INT NULL,
+        ClaveIdem    VARCHAR(64) NULL      -- clave del carrito: reintentar no duplica la venta
     );
+    CREATE INDEX IX_Ventas_Fecha ON dbo.Ventas(Fecha DESC);
+    CREATE INDEX IX_Ventas_Cliente_Fecha ON dbo.Ventas(ClienteID, Fecha DESC);
+    CREATE INDEX IX_Ventas_Total ON dbo.Ventas(Total DESC);
+    CREATE UNIQUE INDEX UX_Ventas_ClaveIdem ON dbo.Ventas(ClaveIdem) WHERE ClaveIdem IS NOT NULL;
+END;
+
+-- Resúmenes de ventas (los mantiene VentaRepo.crear_venta)
+IF OBJECT_ID('dbo.ResumenVentasHora','U') IS NULL
+BEGIN
+    CREATE TABLE dbo.ResumenVentasHora(
+        Hora       DATETIME2(0)  NOT NULL,
+        Medio      NVARCHAR(30)  NOT NULL,
+        UsuarioID  INT           NOT NULL,   -- 0 = sin usuario
+        Ventas     INT           NOT NULL,
+        Total      DECIMAL(18,2) NOT NULL,
+        CONSTRAINT PK_ResumenVentasHora PRIMARY KEY (Hora, Medio, UsuarioID)
+    );
+END;
+
+IF OBJECT_ID('dbo.ResumenProductoDia','U') IS NULL
+BEGIN
+    CREATE TABLE dbo.ResumenProductoDia(
+        Dia        DATE          NOT NULL,
+        ProductoID INT           NOT NULL,
+        Cantidad   DECIMAL(18,3) NOT NULL,
+        Importe    DECIMAL(18,2) NOT NULL,
+        CONSTRAINT PK_ResumenProductoDia PRIMARY KEY (Dia, ProductoID)
+    );
+END;
+
+IF OBJECT_ID('dbo.TicketArchivo','U') IS NULL
+BEGIN
+    CREATE TABLE dbo.TicketArchivo(
+        TicketArchivoID INT IDENTITY(1,1) PRIMARY KEY,
+        VentaID         INT          NOT NULL,
+        Sha256          CHAR(64)     NOT NULL,
+        Bytes           INT          NOT NULL,
+        CreadoEn        DATETIME2(0) NOT NULL CONSTRAINT DF_TicketArchivo_CreadoEn DEFAULT SYSUTCDATETIME()
+    );
+    CREATE INDEX IX_TicketArchivo_Venta ON dbo.TicketArchivo(VentaID, TicketArchivoID DESC) INCLUDE (Sha256);
 END;
 
 -- VentaDetalle
@@ -0,0 +1,256 @@
+"""
+Tareas en segundo plano para la interfaz Tk.
+
+Tk no es thread-safe: los widgets sólo se tocan desde el hilo del mainloop.
+Las consultas a la DB corren en hilos de fondo y el resultado vuelve al hilo
+de Tk por una cola que se revisa con after(); ahí se llaman on_done / on_error.
+
+    runner = tareas.de(self)          # uno por raíz Tk, compartido por todos los frames
+    runner.submit(ProductoRepo.listar, on_done=self._render_rows,
+                  grupo=self, descripcion="Cargando productos…")
+
+Dentro de la función de fondo se puede informar avance y consultar si la
+tarea se canceló (la cancelación es cooperativa: una consulta ya lanzada no
+se interrumpe, sólo se descarta su resultado):
+
+    tareas.progreso("Leyendo ventas…", 0.4)
+    if tareas.cancelada(): return
+"""
+import itertools
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+WORKERS = 3
+POLL_MS = 30
+
+_local = threading.local()
+
+
+class Tarea:
+    """Handle de una tarea enviada al runner."""
+    __slots__ = ("id", "grupo", "clave", "descripcion", "fn", "args", "kwargs",
+                 "on_done", "on_error", "on_cancel", "estado", "avance", "creada", "_cancel")
+
+    def __init__(self, tid, fn, args, kwargs, on_done, on_error, on_cancel, grupo, clave, descripcion):
+        self.id = tid
+        self.fn, self.args, self.kwargs = fn, args, kwargs
+        self.on_done, self.on_error, self.on_cancel = on_done, on_error, on_cancel
+        self.grupo = grupo
+        self.clave = clave
+        self.descripcion = descripcion or ""
+        self.estado = "PENDIENTE"      # PENDIENTE / CORRIENDO / OK / ERROR / CANCELADA
+        self.avance = None             # último (texto, fraccion) informado con progreso()
+        self.creada = time.perf_counter()
+        self._cancel = threading.Event()
+
+    @property
+    def cancelada(self) -> bool:
+        return self._cancel.is_set()
+
+    def cancelar(self):
+        self._cancel.set()
+
+
+def progreso(texto: Optional[str] = None, fraccion: Optional[float] = None):
+    """Llamable desde la función de fondo: publica avance en la barra de estado."""
+    t = getattr(_local, "tarea", None)
+    runner = getattr(_local, "runner", None)
+    if t is not None and runner is not None and not t.cancelada:
+        runner._salida.put(("progreso", t, (texto, fraccion)))
+
+
+def cancelada() -> bool:
+    """Llamable desde la función de fondo: True si la tarea actual fue cancelada."""
+    t = getattr(_local, "tarea", None)
+    return bool(t is not None and t.cancelada)
+
+
+class TaskRunner:
+    """
+    Pool chico de hilos daemon + cola de resultados revisada desde Tk.
+    - grupo: para cancelar en bloque (ej. todo lo de una pestaña al salir de ella)
+    - clave: una tarea nueva con la misma clave cancela a la anterior (recargas repetidas)
+    """
+    def __init__(self, root, workers: int = WORKERS, poll_ms: int = POLL_MS):
+        self.root = root
+        self.poll_ms = poll_ms
+        self._entrada = queue.Queue()
+        self._salida = queue.Queue()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._activas: Dict[int, Tarea] = {}
+        self._por_clave: Dict[Any, Tarea] = {}
+        self._on_estado: Optional[Callable[[str], None]] = None
+        self._estado_txt = None
+        self._poll = None
+        self._cerrado = False
+        self._hilos = [
+            threading.Thread(target=self._loop, name=f"tareas-{i}", daemon=True)
+            for i in range(max(1, workers))
+        ]
+        for h in self._hilos:
+            h.start()
+
+    # ---------------- API (hilo de Tk) ----------------
+    def submit(self, fn: Callable, *args,
+               on_done: Optional[Callable[[Any], None]] = None,
+               on_error: Optional[Callable[[Exception], None]] = None,
+               on_cancel: Optional[Callable[[], None]] = None,
+               grupo: Any = None, clave: Any = None, descripcion: str = "", **kwargs) -> Tarea:
+        if self._cerrado:
+            raise RuntimeError("El runner de tareas está cerrado")
+        t = Tarea(next(self._ids), fn, args, kwargs, on_done, on_error, on_cancel,
+                  self._grupo(grupo), clave, descripcion)
+        with self._lock:
+            if clave is not None:
+                previa = self._por_clave.get(clave)
+                if previa is not None:
+                    previa.cancelar()
+                self._por_clave[clave] = t
+            self._activas[t.id] = t
+        self._entrada.put(t)
+        self._programar_poll()
+        self._publicar_estado()
+        return t
+
+    def cancelar_grupo(self, grupo) -> int:
+        g = self._grupo(grupo)
+        n = 0
+        with self._lock:
+            for t in self._activas.values():
+                if t.grupo == g and not t.cancelada:
+                    t.cancelar()
+                    n += 1
+        if n:
+            self._programar_poll()
+        return n
+
+    def pendientes(self, grupo=None) -> int:
+        g = self._grupo(grupo)
+        with self._lock:
+            return sum(1 for t in self._activas.values()
+                       if not t.cancelada and (grupo is None or t.grupo == g))
+
+    def on_estado(self, callback: Optional[Callable[[str], None]]):
+        """Registra quién muestra el estado (ej. la barra de VentasWindow). Reemplaza al anterior."""
+        self._on_estado = callback
+        self._estado_txt = None
+        self._publicar_estado()
+
+    def cerrar(self):
+        self._cerrado = True
+        with self._lock:
+            for t in self._activas.values():
+                t.cancelar()
+        for _ in self._hilos:
+            self._entrada.put(None)
+
+    # ---------------- hilos de fondo ----------------
+    def _loop(self):
+        _local.runner = self
+        while True:
+            t = self._entrada.get()
+            if t is None:
+                return
+            if t.cancelada:
+                self._salida.put(("cancelada", t, None))
+                continue
+            t.estado = "CORRIENDO"
+            _local.tarea = t
+            try:
+                res = t.fn(*t.args, **t.kwargs)
+                self._salida.put(("ok", t, res))
+            except Exception as e:
+                self._salida.put(("error", t, e))
+            finally:
+                _local.tarea = None
+
+    # ---------------- hilo de Tk ----------------
+    def _programar_poll(self):
+        if self._poll is None and not self._cerrado:
+            try:
+                self._poll = self.root.after(self.poll_ms, self._despachar)
+            except Exception:
+                self._poll = None
+
+    def _despachar(self):
+        self._poll = None
+        while True:
+            try:
+                tipo, t, dato = self._salida.get_nowait()
+            except queue.Empty:
+                break
+            if tipo == "progreso":
+                t.avance = dato
+                continue
+            with self._lock:
+                self._activas.pop(t.id, None)
+                if t.clave is not None and self._por_clave.get(t.clave) is t:
+                    del self._por_clave[t.clave]
+            if t.cancelada or tipo == "cancelada":
+                t.estado = "CANCELADA"
+                self._llamar(t.on_cancel)
+            elif tipo == "ok":
+                t.estado = "OK"
+                self._llamar(t.on_done, dato)
+            else:
+                t.estado = "ERROR"
+                if t.on_error is not None:
+                    self._llamar(t.on_error, dato)
+                else:
+                    print(f"WARN tarea '{t.descripcion or t.fn}':", dato)
+
+        self._publicar_estado()
+        with self._lock:
+            quedan = bool(self._activas)
+        if quedan or not self._salida.empty():
+            self._programar_poll()
+
+    @staticmethod
+    def _llamar(cb, *args):
+        if cb is None:
+            return
+        try:
+            cb(*args)
+        except Exception as e:
+            # un widget destruido mientras la tarea corría no debe tirar el mainloop
+            print("WARN callback de tarea:", e)
+
+    def _publicar_estado(self):
+        if self._on_estado is None:
+            return
+        with self._lock:
+            # las tareas sin descripción (ej. sugerencias al tipear) no ensucian la barra
+            vivas = [t for t in self._activas.values() if not t.cancelada and t.descripcion]
+        if vivas:
+            t = min(vivas, key=lambda x: x.creada)
+            texto = t.descripcion
+            if t.avance is not None:
+                det, fraccion = t.avance
+                texto = det or texto
+                if fraccion is not None:
+                    texto = f"{texto} {int(max(0.0, min(1.0, fraccion)) * 100)}%"
+            if len(vivas) > 1:
+                texto = f"{texto}  (+{len(vivas) - 1} en cola)"
+        else:
+            texto = "Listo"
+        if texto != self._estado_txt:
+            self._estado_txt = texto
+            self._llamar(self._on_estado, texto)
+
+    @staticmethod
+    def _grupo(grupo):
+        # los widgets se agrupan por su nombre Tk (str): estable y hashable
+        return str(grupo) if grupo is not None else None
+
+
+def de(widget) -> TaskRunner:
+    """Runner compartido de la raíz Tk del widget (se crea la primera vez)."""
+    root = widget._root()
+    runner = getattr(root, "_task_runner", None)
+    if runner is None or runner._cerrado:
+        runner = TaskRunner(root)
+        root._task_runner = runner
+    return runner
@@ -0,0 +1,78 @@
+"""
+Archivo de tickets PDF direccionado por contenido.
+
+- Cada PDF se guarda una sola vez como <sha256>.pdf dentro de
+  config.TICKET_ARCHIVO_DIR, repartido en subcarpetas ab/cd/ (los dos
+  primeros pares del hash) para que ninguna carpeta junte cientos de miles
+  de archivos.
+- dbo.TicketArchivo dice qué hash tiene cada venta. Si la empresa cambia de
+  datos y se vuelve a generar, queda el hash nuevo y el historial.
+- El render es determinista (pdf_ticket usa Canvas(invariant=1)): generar
+  dos veces la misma venta da los mismos bytes y no duplica nada.
+- Reimprimir sirve el archivo guardado sin volver a renderizar.
+"""
+import hashlib
+import os
+import tempfile
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import config
+from repos import TicketArchivoRepo
+
+
+def ruta_de(sha: str) -> str:
+    return os.path.join(config.TICKET_ARCHIVO_DIR, sha[:2], sha[2:4], f"{sha}.pdf")
+
+
+def guardar_bytes(datos: bytes) -> Tuple[str, str]:
+    """Escribe el PDF si no estaba (escritura atómica). Devuelve (sha256, ruta)."""
+    sha = hashlib.sha256(datos).hexdigest()
+    ruta = ruta_de(sha)
+    if os.path.isfile(ruta) and os.path.getsize(ruta) == len(datos):
+        return sha, ruta
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    # temporal único por llamada: la cola de impresión y una reimpresión pueden
+    # archivar el mismo ticket a la vez desde dos hilos del mismo proceso
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(ruta), prefix=f"{sha}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(datos)
+        os.chmod(tmp, 0o644)     # mkstemp lo crea 0600; el archivo lo leen todas las cajas
+        os.replace(tmp, ruta)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+    return sha, ruta
+
+
+def archivar_lote(items: Iterable[Tuple[int, bytes]]) -> Dict[int, str]:
+    """[(VentaID, pdf)] -> {VentaID: ruta}; el índice se actualiza en una sola ida a la DB."""
+    rutas: Dict[int, str] = {}
+    entradas: List[Tuple[int, str, int]] = []
+    for venta_id, datos in items:
+        sha, ruta = guardar_bytes(datos)
+        rutas[int(venta_id)] = ruta
+        entradas.append((int(venta_id), sha, len(datos)))
+    TicketArchivoRepo.registrar(entradas)
+    return rutas
+
+
+def archivar(venta_id: int, datos: bytes) -> str:
+    return archivar_lote([(venta_id, datos)])[int(venta_id)]
+
+
+def buscar_lote(venta_ids: Iterable[int]) -> Dict[int, str]:
+    """{VentaID: ruta} de las ventas que ya tienen su ticket archivado (y el archivo existe)."""
+    out = {}
+    for vid, sha in TicketArchivoRepo.ultimos(list(venta_ids)).items():
+        ruta = ruta_de(sha)
+        if os.path.isfile(ruta):
+            out[vid] = ruta
+    return out
+
+
+def buscar(venta_id: int) -> Optional[str]:
+    return buscar_lote([venta_id]).get(int(venta_id))
@@ -0,0 +1,94 @@
+"""
+Emisión de tickets de venta.
+
+Hay dos formatos y cada caja elige el suyo en config.TICKET_BACKEND:
+- "pdf":    A4 con ReportLab (pdf_ticket), se abre con el visor del sistema
+- "escpos": bytes ESC/POS para impresora térmica de 58/80 mm (escpos_ticket),
+            se mandan a un archivo, a un dispositivo o a tcp://host:puerto
+
+    emitir_ticket(venta_id)               # con el backend configurado
+    emitir_ticket(venta_id, "pdf")        # forzando uno
+
+Acá también están las lecturas de datos que comparten ambos formatos.
+"""
+from typing import Dict, List, Optional, Tuple
+
+import config
+from config import get_connection
+from repos import EmpresaRepo, _chunks, _marks, _LOTE_PARAMS
+
+BACKENDS = ("pdf", "escpos")
+
+# "1,234.50" -> "1.234,50" en una sola pasada (en vez de tres replace por número)
+_AR = str.maketrans(",.", ".,")
+_SPECS = {d: f",.{d}f" for d in range(5)}
+
+
+def fmt_ar(value: float, dec: int = 2) -> str:
+    """Número con formato argentino: punto de miles y coma decimal."""
+    return format(value, _SPECS.get(dec) or f",.{dec}f").translate(_AR)
+
+
+def datos_empresa() -> dict:
+    return EmpresaRepo.obtener()
+
+
+def datos_ventas(venta_ids) -> Dict[int, Tuple[tuple, List[tuple]]]:
+    """
+    Cabecera y detalle de muchas ventas con una sola consulta por lote de IDs
+    (cabecera LEFT JOIN detalle, agrupado acá). Devuelve {VentaID: (cab, det)}
+    con tuplas planas, que se pueden mandar a otro proceso.
+    """
+    ids = sorted({int(v) for v in venta_ids})
+    out: Dict[int, Tuple[tuple, List[tuple]]] = {}
+    if not ids:
+        return out
+    conn = get_connection()
+    try:
+        cur = conn.cursor()
+        for lote in _chunks(ids, _LOTE_PARAMS):
+            cur.execute(f"""
+                SELECT v.VentaID, v.Fecha, v.Total, c.Nombre AS ClienteNombre,
+                       d.ProductoID, p.Nombre, d.Cantidad, d.PrecioUnitario
+                FROM dbo.Ventas v
+                LEFT JOIN dbo.Clientes c ON c.ClienteID = v.ClienteID
+                LEFT JOIN dbo.VentaDetalle d ON d.VentaID = v.VentaID
+                LEFT JOIN dbo.Productos p ON p.ProductoID = d.ProductoID
+                WHERE v.VentaID IN ({_marks(len(lote))})
+                ORDER BY v.VentaID, d.DetalleID
+            """, lote)
+            for r in cur.fetchall():
+                vid = int(r[0])
+                if vid not in out:
+                    out[vid] = ((r[0], r[1], r[2], r[3]), [])
+                if r[4] is not None:
+                    out[vid][1].append((r[4], r[5], r[6], r[7]))
+        return out
+    finally:
+        conn.close()
+
+
+def datos_venta(venta_id: int):
+    ventas = datos_ventas([venta_id])
+    if int(venta_id) not in ventas:
+        raise ValueError(f"Venta {venta_id} no existe")
+    return ventas[int(venta_id)]
+
+
+def emitir_ticket(venta_id: int, backend: Optional[str] = None, abrir: bool = True,
+                  reimpresion: bool = False) -> str:
+    """
+    Genera/imprime el ticket con el backend pedido (o el de config) y devuelve
+    dónde quedó: la ruta del PDF o el destino ESC/POS. En una reimpresión el
+    PDF sale del archivo de tickets si ya estaba.
+    """
+    backend = (backend or config.TICKET_BACKEND or "pdf").lower()
+    if backend == "escpos":
+        import escpos_ticket
+        return escpos_ticket.imprimir_ticket(venta_id)
+    if backend == "pdf":
+        import pdf_ticket
+        if reimpresion:
+            return pdf_ticket.reimprimir_ticket(venta_id, abrir=abrir)
+        return pdf_ticket.generar_ticket_pdf(venta_id, abrir=abrir)
+    raise ValueError(f"Backend de ticket desconocido: {backend!r} (opciones: {', '.join(BACKENDS)})")
@@ -1,14 +1,22 @@
+import time
+import uuid
 import tkinter as tk
+from collections import deque
 from tkinter import ttk, messagebox, simpledialog
-from config import ensure_schema
+import config
+from config import ensure_schema, es_db_no_disponible
 from repos import ProductoRepo, ClienteRepo, VentaRepo, UsuarioRepo
 import ttkbootstrap as tb
 from productos import ProductosFrame
-from pdf_ticket import generar_ticket_pdf
+import cola_impresion
+import diario_ventas
 from cierredecaja import CierreDeCajaFrame 
-from repos import ProductoRepo, ClienteRepo, VentaRepo, UsuarioRepo, EmpresaRepo
+from repos import ProductoRepo, ClienteRepo, VentaRepo, UsuarioRepo, EmpresaRepo, VentaIncierta
 from datosdelaempresa import DatosEmpresaFrame
 from reporte_ventas import ReporteVentasFrame
+import catalogo
+import tareas
+from vlista import VirtualTree
 
 def center_to_parent(win, parent=None, pad=(0, 0)):
     win.update_idletasks()
@@ -165,6 +173,8 @@ class VentasWindow(tk.Toplevel):
 
         self.protocol("WM_DELETE_WINDOW", self._on_close)
 
+        self.tareas = tareas.de(self)
+
         topbar = ttk.Frame(self)
         topbar.pack(side=tk.TOP, fill=tk.X)
 
@@ -181,8 +191,22 @@ class VentasWindow(tk.Toplevel):
         ttk.Button(topbar, text="Cerrar sesión", style="danger.TButton", command=self._logout).pack(side=tk.RIGHT, padx=6)
 
 
-        self.status = ttk.Label(self, text="Listo", anchor="w")
-        self.status.pack(side="bottom", fill="x")
+        barra = ttk.Frame(self)
+        barra.pack(side="bottom", fill="x")
+        self.status = ttk.Label(barra, text="Listo", anchor="w")
+        self.status.pack(side="left", fill="x", expand=True)
+        self.lbl_impresion = ttk.Label(barra, text="", anchor="e", cursor="hand2")
+        self.lbl_impresion.pack(side="right", padx=8)
+        self.lbl_impresion.bind("<Button-1>", lambda e: self._reintentar_impresion())
+        self.tareas.on_estado(self._set_status)
+        self._poll_imp = self.after(1000, self._poll_impresion)
+
+        # catálogo local para que la caja resuelva códigos sin ir a la DB;
+        # mientras carga, NuevaVentaFrame consulta la DB directamente
+        self.tareas.submit(catalogo.cargar, on_error=lambda e: print("WARN catálogo:", e),
+                           descripcion="Cargando catálogo…")
+        self._sync_cat_prox = time.monotonic() + config.CATALOGO_SYNC_SEG
+        self._sync_cat = self.after(1000, self._sincronizar_catalogo)
 
         self.nb = ttk.Notebook(self)
         self.nb.pack(fill=tk.BOTH, expand=True)
@@ -209,12 +233,76 @@ class VentasWindow(tk.Toplevel):
             self.nb.add(self.tab_nueva_venta, text="Nueva Venta")
 
 
+        self._tab_actual = self.nb.select()
+        self._tabs_cancelados = set()
+        self.nb.bind("<<NotebookTabChanged>>", self._on_tab_changed)
+
         self.bind_all("<F11>", lambda e: self._toggle_fullscreen())
         self.bind_all("<Escape>", lambda e: self._exit_fullscreen())
         self.bind_all("<Control-n>", lambda e: self._nueva_venta_atajo())
         self.bind_all("<Control-l>", lambda e: self._logout())
         self.bind_all("<Insert>", self._handle_insert)
 
+    def _set_status(self, texto: str):
+        if self.winfo_exists():
+            self.status.config(text=texto)
+
+    def _poll_impresion(self):
+        """Muestra ventas del diario sin enviar y tickets que esperan en la cola o fallaron."""
+        try:
+            d = diario_ventas.diario().resumen()
+            r = cola_impresion.cola().resumen()
+            partes = []
+            sin_enviar = d["PENDIENTE"] + d["ENVIANDO"]
+            if sin_enviar:
+                partes.append(f"Ventas sin conexión por enviar: {sin_enviar}")
+            if d["ERROR"] + d["REVISAR"]:
+                partes.append(f"Ventas del diario a revisar: {d['ERROR'] + d['REVISAR']}")
+            pendientes = r["PENDIENTE"] + r["IMPRIMIENDO"]
+            if pendientes:
+                partes.append(f"Tickets en cola: {pendientes}")
+            if r["ERROR"]:
+                partes.append(f"Tickets con error: {r['ERROR']} (clic para reintentar)")
+            alerta = r["ERROR"] or d["ERROR"] or d["REVISAR"]
+            self.lbl_impresion.config(text="  •  ".join(partes),
+                                      foreground="#B91C1C" if alerta else "#374151")
+        except Exception as e:
+            self.lbl_impresion.config(text="Cola de impresión no disponible", foreground="#B91C1C")
+            print("WARN cola de impresión:", e)
+        self._poll_imp = self.after(2000, self._poll_impresion)
+
+    def _sincronizar_catalogo(self):
+        """
+        Trae los precios/stock cambiados desde otras cajas o la PC de administración:
+        sin esto un escaneo resuelto del catálogo vendería al precio viejo.
+        Cada CATALOGO_SYNC_SEG, o al segundo si esta caja avisó un cambio.
+        """
+        if catalogo.cargado() and (catalogo.pendiente() or time.monotonic() >= self._sync_cat_prox):
+            self._sync_cat_prox = time.monotonic() + config.CATALOGO_SYNC_SEG
+            self.tareas.submit(catalogo.sincronizar, clave="catalogo-sync",
+                               on_error=lambda e: print("WARN sincronizando catálogo:", e))
+        self._sync_cat = self.after(1000, self._sincronizar_catalogo)
+
+    def _reintentar_impresion(self):
+        try:
+            cola_impresion.cola().reintentar()
+        except Exception as e:
+            messagebox.showerror("Impresión", str(e))
+
+    def _on_tab_changed(self, event=None):
+        """Cancela lo que la pestaña anterior tenía en curso; si quedó a medias, se recarga al volver."""
+        nueva = self.nb.select()
+        if self._tab_actual and self._tab_actual != nueva:
+            if self.tareas.cancelar_grupo(self._tab_actual):
+                self._tabs_cancelados.add(self._tab_actual)
+        self._tab_actual = nueva
+        if nueva in self._tabs_cancelados:
+            self._tabs_cancelados.discard(nueva)
+            frame = self.nb.nametowidget(nueva)
+            recargar = getattr(frame, "load", None) or getattr(frame, "_load", None)
+            if callable(recargar):
+                recargar()
+
     def _empresa_text(self) -> str:
         try:
             e = EmpresaRepo.obtener()
@@ -263,6 +351,14 @@ class VentasWindow(tk.Toplevel):
 
     def _logout(self):
 
+        for tab in self.nb.tabs():
+            self.tareas.cancelar_grupo(tab)
+        self.tareas.on_estado(None)
+        for pendiente in (self._poll_imp, self._sync_cat):
+            try:
+                self.after_cancel(pendiente)
+            except Exception:
+                pass
         self.master.withdraw()
         self.destroy()
 
@@ -305,14 +401,18 @@ class ClientesFrame(ttk.Frame):
         self.load()
 
     def load(self):
+        tareas.de(self).submit(
+            ClienteRepo.listar,
+            on_done=self._render,
+            on_error=lambda e: messagebox.showerror("Error", str(e)),
+            grupo=self, clave=(str(self), "load"), descripcion="Cargando clientes…",
+        )
+
+    def _render(self, data):
         for i in self.tree.get_children():
             self.tree.delete(i)
-        try:
-            data = ClienteRepo.listar()
-            for d in data:
-                self.tree.insert('', tk.END, values=(d['ClienteID'], d['Nombre'], d['Email'] or '', d['Telefono'] or '', 'Sí' if d['Activo'] else 'No'))
-        except Exception as e:
-            messagebox.showerror("Error", str(e))
+        for d in data:
+            self.tree.insert('', tk.END, values=(d['ClienteID'], d['Nombre'], d['Email'] or '', d['Telefono'] or '', 'Sí' if d['Activo'] else 'No'))
 
     def add_cliente(self):
         nombre = simpledialog.askstring("Cliente", "Nombre:", parent=self)
@@ -331,7 +431,11 @@ class NuevaVentaFrame(ttk.Frame):
         super().__init__(parent)
         self.items = []
         self._producto_actual = None
-        
+        # clave de idempotencia del carrito: la misma en cada reintento hasta que se registra
+        self._clave = uuid.uuid4().hex
+        # venta enviada a la base y sin respuesta todavía: el carrito no se toca
+        self._cobrando = False
+
 
 
         top = ttk.Frame(self); top.grid(row=0, column=0, columnspan=2, sticky="ew", padx=10, pady=(10, 6))
@@ -400,6 +504,9 @@ class NuevaVentaFrame(ttk.Frame):
         self._sug_win = None
         self._sug_list = None
         self._type_after = None
+        # sugerencias en segundo plano: pedidos numerados, sólo vale la respuesta al último
+        self._sug_seq = 0
+        self._sug_latencias = deque(maxlen=200)
 
 
         self.cb_cliente.configure(state="normal")
@@ -446,11 +553,7 @@ class NuevaVentaFrame(ttk.Frame):
             messagebox.showinfo("Búsqueda", "Escribí código o parte del nombre")
             return
 
-        p = None
-        try:
-            p = ProductoRepo.buscar_por_codigo(q)
-        except Exception:
-            p = None
+        p = self._resolver_codigo(q)
         if p:
             self._set_producto_inputs(p); self.add_item()
             self.ent_input.delete(0, tk.END); self._hide_suggestions()
@@ -458,7 +561,7 @@ class NuevaVentaFrame(ttk.Frame):
             return
 
         try:
-            lst = ProductoRepo.buscar_nombre_contiene(q)
+            lst = self._buscar_nombre(q)
         except Exception:
             lst = []
 
@@ -475,6 +578,24 @@ class NuevaVentaFrame(ttk.Frame):
 
         self._show_product_suggestions()
 
+    def _resolver_codigo(self, q: str):
+        """Código de barras / ID / nombre exacto: primero el catálogo local, la DB sólo si no está."""
+        p = catalogo.por_codigo(q)
+        if p:
+            return p
+        try:
+            p = ProductoRepo.buscar_por_codigo(q)
+        except Exception:
+            p = None
+        if p and catalogo.cargado():
+            catalogo.actualizar([p])   # alta hecha desde otra caja
+        return p
+
+    def _buscar_nombre(self, q: str):
+        if catalogo.cargado():
+            return catalogo.buscar(q)
+        return ProductoRepo.buscar_nombre_contiene(q)
+
     def _on_type_product(self, event):
 
         if event.keysym in ("Up","Down","Left","Right","Escape","Return","Tab","Shift_L","Shift_R","Control_L","Control_R","Alt_L","Alt_R"):
@@ -482,18 +603,49 @@ class NuevaVentaFrame(ttk.Frame):
         if self._type_after:
             try: self.after_cancel(self._type_after)
             except Exception: pass
+        self._sug_seq += 1   # invalida la búsqueda en curso: el usuario sigue tipeando
         self._type_after = self.after(120, self._show_product_suggestions)
 
 
     def _show_product_suggestions(self):
         q = (self.ent_input.get() or "").strip()
+        self._sug_seq += 1
         if len(q) < 2:
             self._hide_suggestions()
-            return 
-        try:
-            rows = ProductoRepo.buscar_nombre_contiene(q)
-        except Exception:
-            rows = []
+            return
+        seq, t0 = self._sug_seq, time.perf_counter()
+        # misma clave: un pedido nuevo cancela el anterior si todavía no arrancó
+        tareas.de(self).submit(
+            self._buscar_nombre, q,
+            on_done=lambda rows: self._sug_recibir(seq, q, t0, rows),
+            on_error=lambda e: self._sug_recibir(seq, q, t0, []),
+            grupo=self, clave=(str(self), "sugerencias"),
+        )
+
+    def _sug_recibir(self, seq, q, t0, rows):
+        """Corre en el hilo de Tk: pinta la respuesta sólo si sigue siendo la vigente."""
+        ms = (time.perf_counter() - t0) * 1000.0
+        self._sug_latencias.append(ms)
+        if ms > 500:
+            print(f"WARN sugerencias lentas: {ms:.0f} ms para '{q}'")
+        # si el usuario siguió tipeando o el texto cambió, la respuesta ya no sirve
+        if seq != self._sug_seq or q != (self.ent_input.get() or "").strip():
+            return
+        self._render_suggestions(rows)
+
+    def metricas_sugerencias(self) -> dict:
+        """Latencia (ms) de las últimas búsquedas de sugerencias, desde el pedido hasta la respuesta."""
+        lat = sorted(self._sug_latencias)
+        if not lat:
+            return {"n": 0, "p50_ms": 0.0, "p95_ms": 0.0, "max_ms": 0.0}
+        return {
+            "n": len(lat),
+            "p50_ms": round(lat[len(lat) // 2], 2),
+            "p95_ms": round(lat[min(len(lat) - 1, int(len(lat) * 0.95))], 2),
+            "max_ms": round(lat[-1], 2),
+        }
+
+    def _render_suggestions(self, rows):
         if not rows:
             self._hide_suggestions(); return
 
@@ -558,12 +710,17 @@ class NuevaVentaFrame(ttk.Frame):
     def _total_actual(self) -> float:
         return round(sum(it['cantidad'] * it['precio'] for it in self.items), 2)
     def _load_clientes(self):
-        try:
-            data = ClienteRepo.listar()
-            self.clientes = data
-            self.cb_cliente['values'] = [f"{c['ClienteID']} - {c['Nombre']}" for c in data]
-            if data: self.cb_cliente.current(0)
-        except Exception as e: messagebox.showerror("Error",str(e))
+        tareas.de(self).submit(
+            ClienteRepo.listar,
+            on_done=self._set_clientes,
+            on_error=lambda e: messagebox.showerror("Error", str(e)),
+            grupo=self, clave=(str(self), "clientes"), descripcion="Cargando clientes…",
+        )
+
+    def _set_clientes(self, data):
+        self.clientes = data
+        self.cb_cliente['values'] = [f"{c['ClienteID']} - {c['Nombre']}" for c in data]
+        if data: self.cb_cliente.current(0)
 
     def _load_productos_initial(self):
 
@@ -571,13 +728,10 @@ class NuevaVentaFrame(ttk.Frame):
 
     def _buscar_producto(self, texto:str):
 
-        p = None
-        try:
-            p = ProductoRepo.buscar_por_codigo(texto)
-        except: pass
+        p = self._resolver_codigo(texto)
         if p: return p
 
-        lst = ProductoRepo.buscar_nombre_contiene(texto)
+        lst = self._buscar_nombre(texto)
         return lst[0] if lst else None
 
 
@@ -587,6 +741,8 @@ class NuevaVentaFrame(ttk.Frame):
         self.ent_cantidad.delete(0,tk.END); self.ent_cantidad.insert(0,"1")
 
     def add_item(self):
+        if self._cobrando:
+            return
         p = self._producto_actual
         if not p:
             messagebox.showerror("Error","Seleccioná/buscá un producto"); return
@@ -608,6 +764,8 @@ class NuevaVentaFrame(ttk.Frame):
 
 
     def eliminar_item(self):
+        if self._cobrando:
+            return
         sel = self.tree.selection()
         if not sel: return
         idx = self.tree.index(sel[0]); del self.items[idx]
@@ -634,6 +792,9 @@ class NuevaVentaFrame(ttk.Frame):
         self.txt_ticket.config(state="disabled")
 
     def pagar(self):
+        if self._cobrando:
+            messagebox.showinfo("Info", "La venta anterior se está registrando")
+            return
         if not self.items:
             messagebox.showinfo("Info", "No hay ítems en la venta")
             return
@@ -643,6 +804,8 @@ class NuevaVentaFrame(ttk.Frame):
 
 
     def _confirmar_pago(self, forma, entregado, descuento):
+        if self._cobrando:
+            return
         cliente_id = None
         if self.cb_cliente.current() >= 0 and self.cb_cliente.get():
             try:
@@ -653,39 +816,94 @@ class NuevaVentaFrame(ttk.Frame):
         total_ui = self._total_actual()
         total_con_desc = round(total_ui * (1 - max(descuento,0)/100.0), 2)
         vuelto_arg = (entregado or 0) - total_con_desc if forma == "Efectivo" else 0
+        items = [
+            {'producto_id': it['producto_id'], 'cantidad': it['cantidad'], 'precio': it['precio']}
+            for it in self.items
+        ]
+        usuario = getattr(self.winfo_toplevel(), "current_user", None) or {}
+        venta = dict(
+            cliente_id=cliente_id,
+            items=items,
+            metodo_pago=forma,
+            entregado=entregado,
+            descuento_pct=descuento,
+            vuelto=vuelto_arg,
+            usuario_id=usuario.get("UsuarioID"),
+            clave=self._clave,
+        )
+        diario = diario_ventas.diario()
         try:
-            items = [
-                {'producto_id': it['producto_id'], 'cantidad': it['cantidad'], 'precio': it['precio']}
-                for it in self.items
-            ]
-
-            venta_id, total_repo, _ = VentaRepo.crear_venta(
-                cliente_id,
-                items,
-                metodo_pago=forma,
-                entregado=entregado,
-                descuento_pct=descuento,  
-                vuelto=vuelto_arg
-            )
-
-            try:
-                generar_ticket_pdf(venta_id, abrir=True)
-            except Exception as e:
-                print("WARN PDF:", e) 
-
-            messagebox.showinfo(
-                "Éxito",
-                f"Venta {venta_id} registrada.\n"
-                f"Total: ${total_repo:.2f}\n"
-                f"Forma: {forma}\n"
-                f"Entregado: ${entregado:.2f}\n"
-                f"Vuelto: ${vuelto_arg:.2f}"
-            )
-            self.items.clear()
-            self._refresh_items()
+            if diario.hay_pendientes():
+                # hay ventas del diario sin enviar: ésta va detrás, para respetar el orden del stock
+                self._venta_offline(diario, venta, total_con_desc, forma, entregado, vuelto_arg)
+                return
+        except Exception as e:
+            messagebox.showerror("Error", str(e))
+            return
 
+        # con la base caída crear_venta tarda lo que el timeout de conexión: va en segundo
+        # plano para no congelar la caja. Sin grupo, así cambiar de pestaña no descarta la respuesta.
+        self._cobrando = True
+        # (la venta va en un lambda: su "clave" es la de idempotencia, no la del runner)
+        tareas.de(self).submit(
+            lambda: VentaRepo.crear_venta(**venta),
+            on_done=lambda res: self._venta_registrada(res, forma, entregado, vuelto_arg),
+            on_error=lambda e: self._venta_fallida(e, diario, venta, total_con_desc,
+                                                   forma, entregado, vuelto_arg),
+            # si se descarta la respuesta el carrito conserva su clave: reintentar no duplica
+            on_cancel=lambda: setattr(self, "_cobrando", False),
+            descripcion="Registrando venta…",
+        )
+
+    def _venta_registrada(self, res, forma, entregado, vuelto):
+        self._cobrando = False
+        venta_id, total_repo, _ = res
+        # el ticket lo emite la cola en segundo plano: la caja queda libre ya
+        try:
+            cola_impresion.cola().encolar(venta_id)
         except Exception as e:
+            print("WARN ticket:", e)
+        self._nuevo_carrito()
+
+        messagebox.showinfo(
+            "Éxito",
+            f"Venta {venta_id} registrada.\n"
+            f"Total: ${total_repo:.2f}\n"
+            f"Forma: {forma}\n"
+            f"Entregado: ${entregado:.2f}\n"
+            f"Vuelto: ${vuelto:.2f}"
+        )
+
+    def _venta_fallida(self, e, diario, venta, total, forma, entregado, vuelto):
+        self._cobrando = False
+        # VentaIncierta sólo sale con la clave aplicada en la base: el reenvío desde
+        # el diario no la duplica, si ya estaba grabada recibe la venta original
+        if not isinstance(e, VentaIncierta) and not es_db_no_disponible(e):
             messagebox.showerror("Error", str(e))
+            return
+        try:
+            self._venta_offline(diario, venta, total, forma, entregado, vuelto)
+        except Exception as e2:
+            messagebox.showerror("Error", str(e2))
+
+    def _nuevo_carrito(self):
+        self.items.clear()
+        self._clave = uuid.uuid4().hex
+        self._refresh_items()
+
+    def _venta_offline(self, diario, venta, total, forma, entregado, vuelto):
+        """La base no responde: la venta queda en el diario local y se envía sola al volver."""
+        nro = diario.registrar(venta, total)
+        self._nuevo_carrito()
+        messagebox.showwarning(
+            "Venta guardada sin conexión",
+            f"No se pudo confirmar en la base de datos. La venta quedó en el diario local (N° D-{nro})\n"
+            f"y se registrará cuando vuelva la conexión; el ticket se imprime en ese momento.\n\n"
+            f"Total: ${total:.2f}\n"
+            f"Forma: {forma}\n"
+            f"Entregado: ${entregado:.2f}\n"
+            f"Vuelto: ${vuelto:.2f}"
+        )
 
 
 class PaymentDialog(tk.Toplevel):
@@ -804,14 +1022,15 @@ class ProductPickerDialog(tk.Toplevel):
         ttk.Label(top, text="Buscar:").grid(row=0, column=0, sticky="w")
         self.e_q = ttk.Entry(top, width=38)
         self.e_q.grid(row=0, column=1, sticky="ew", padx=(6, 6))
-        self.e_q.bind("<KeyRelease>", lambda e: self._apply_filter())
+        self.e_q.bind("<KeyRelease>", self._on_key_q)
+        self.e_q.bind("<Return>", lambda e: self._choose())
 
         self.var_activos = tk.BooleanVar(value=True)
         ttk.Checkbutton(top, text="Sólo activos", variable=self.var_activos,
                         command=self._apply_filter).grid(row=0, column=2, sticky="w")
 
         cols = ("id", "codigo", "nombre", "precio", "stock")
-        self.tree = ttk.Treeview(self, columns=cols, show="headings", height=14)
+        self.tree = VirtualTree(self, columns=cols, formatter=self._fmt_row, height=14)
         self.tree.grid(row=1, column=0, sticky="nsew", padx=10, pady=(0, 10))
 
         self.tree.heading("id", text="ID")
@@ -826,13 +1045,9 @@ class ProductPickerDialog(tk.Toplevel):
         self.tree.column("precio", width=100, anchor="e")
         self.tree.column("stock", width=90, anchor="e")
 
-        yscroll = ttk.Scrollbar(self, orient="vertical", command=self.tree.yview)
-        self.tree.configure(yscroll=yscroll.set)
-        yscroll.grid(row=1, column=1, sticky="ns", pady=(0, 10))
-
         # acciones
-        self.tree.bind("<Return>", lambda e: self._choose())
-        self.tree.bind("<Double-Button-1>", lambda e: self._choose())
+        self.tree.tree.bind("<Return>", lambda e: self._choose())
+        self.tree.tree.bind("<Double-Button-1>", lambda e: self._choose())
         self.bind("<Escape>", lambda e: self.destroy())
 
         btns = ttk.Frame(self)
@@ -841,18 +1056,31 @@ class ProductPickerDialog(tk.Toplevel):
                    style="Accent.TButton").pack(side="left", padx=(0, 6))
         ttk.Button(btns, text="Cancelar", command=self.destroy).pack(side="left")
 
-        # cargar productos
-        try:
-            self._all = ProductoRepo.listar()  # debe devolver CodigoBarras si lo agregaste al repo
-        except Exception as e:
-            self._all = []
-            messagebox.showerror("DB", str(e), parent=self)
+        # cargar productos (del catálogo local, trayendo sólo los cambios) sin frenar la ventana
+        self._all = []
+        tareas.de(self).submit(
+            catalogo.listar_productos,
+            on_done=self._on_loaded,
+            on_error=lambda e: messagebox.showerror("DB", str(e), parent=self),
+            grupo=self, descripcion="Cargando productos…",
+        )
 
-        self._render(self._all)
         self.update_idletasks()
         self._center(master)
         self.e_q.focus_set()
 
+    def _on_loaded(self, rows):
+        self._all = rows
+        self._apply_filter()
+
+    def _on_key_q(self, event):
+        # ↑/↓ desde el buscador mueven la selección de la lista
+        nav = {"Up": -1, "Down": 1, "Prior": -10, "Next": 10}
+        if event.keysym in nav:
+            self.tree.mover(nav[event.keysym])
+        elif event.keysym not in ("Return", "Escape"):
+            self._apply_filter()
+
     def _center(self, parent):
         try:
             px, py = parent.winfo_rootx(), parent.winfo_rooty()
@@ -866,25 +1094,19 @@ class ProductPickerDialog(tk.Toplevel):
             x = (sw - ww)//2; y = (sh - wh)//2
         self.geometry(f"+{max(0,x)}+{max(0,y)}")
 
+    @staticmethod
+    def _fmt_row(d, idx):
+        return ((
+            d["ProductoID"],
+            d.get("CodigoBarras") or "",
+            d["Nombre"],
+            f"{float(d['Precio'] or 0):.2f}",
+            f"{float(d['Stock'] or 0):.3f}",
+        ), ())
+
     def _render(self, rows):
-        for iid in self.tree.get_children():
-            self.tree.delete(iid)
-        for d in rows:
-            self.tree.insert(
-                "", tk.END,
-                values=(
-                    d["ProductoID"],
-                    d.get("CodigoBarras") or "",
-                    d["Nombre"],
-                    f"{float(d['Precio'] or 0):.2f}",
-                    f"{float(d['Stock'] or 0):.3f}",
-                )
-            )
-        # seleccionar primera fila
-        kids = self.tree.get_children()
-        if kids:
-            self.tree.selection_set(kids[0])
-            self.tree.focus(kids[0])
+        # la primera fila queda seleccionada; sólo se pintan las visibles
+        self.tree.set_rows(rows)
 
     def _apply_filter(self):
         q = (self.e_q.get() or "").strip().lower()
@@ -900,11 +1122,10 @@ class ProductPickerDialog(tk.Toplevel):
         self._render(rows)
 
     def _choose(self):
-        sel = self.tree.selection()
-        if not sel:
+        d = self.tree.selected_row()
+        if not d:
             return
-        vals = self.tree.item(sel[0], "values")
-        pid = int(vals[0])
+        pid = int(d["ProductoID"])
         try:
             prod = ProductoRepo.buscar_por_id(pid)
         except Exception:
@@ -933,14 +1154,18 @@ class UsuariosFrame(ttk.Frame):
         self.load()
 
     def load(self):
+        tareas.de(self).submit(
+            UsuarioRepo.listar,
+            on_done=self._render,
+            on_error=lambda e: messagebox.showerror("Error", str(e)),
+            grupo=self, clave=(str(self), "load"), descripcion="Cargando usuarios…",
+        )
+
+    def _render(self, data):
         for i in self.tree.get_children():
             self.tree.delete(i)
-        try:
-            data = UsuarioRepo.listar()
-            for d in data:
-                self.tree.insert('', tk.END, values=(d['UsuarioID'], d['Numero'], d['Nombre'] or '', d['Rol'], 'Sí' if d['Activo'] else 'No', 'Sí' if d['ForzarCambio'] else 'No', str(d['CreadoEn'])))
-        except Exception as e:
-            messagebox.showerror("Error", str(e))
+        for d in data:
+            self.tree.insert('', tk.END, values=(d['UsuarioID'], d['Numero'], d['Nombre'] or '', d['Rol'], 'Sí' if d['Activo'] else 'No', 'Sí' if d['ForzarCambio'] else 'No', str(d['CreadoEn'])))
 
     def _selected_id(self):
         sel = self.tree.selection()
@@ -1013,6 +1238,10 @@ if __name__ == '__main__':
         db_ok = False
 
 
+    # ventas guardadas sin conexión: se mandan a la base en segundo plano y su ticket
+    # sale por la cola de impresión cuando quedan registradas
+    diario_ventas.diario().on_replicada(lambda diario_id, venta_id: cola_impresion.cola().encolar(venta_id))
+
     style = tb.Style(theme="flatly")
     root = style.master
     root.title("Sistema de Ventas")
@@ -1037,7 +1266,8 @@ if __name__ == '__main__':
         except Exception:
             pass
         if not db_ok:
-            messagebox.showwarning("Aviso", "La base de datos no está disponible. Algunas funciones pueden fallar.")
+            messagebox.showwarning("Aviso", "La base de datos no está disponible. Algunas funciones pueden fallar;\n"
+                                            "las ventas se guardan en el diario local y se envían al volver.")
         root.mainloop()                
     else:
         root.destroy()
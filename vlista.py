@@ -0,0 +1,260 @@
+"""
+Treeview virtualizado para listas grandes (productos, ventas).
+
+Un ttk.Treeview con 50k filas tarda en insertar/borrar y cada filtro rehace
+todo. VirtualTree guarda las filas como datos y sólo materializa las que
+entran en pantalla (un puñado de items que se reutilizan); al scrollear,
+filtrar u ordenar se reescriben sólo los items cuyo contenido cambió. El
+costo de pintar depende del alto de la ventana, no del tamaño de la lista.
+
+    vt = VirtualTree(parent, columns=("id", "nombre"),
+                     formatter=lambda row, i: ((row["ProductoID"], row["Nombre"]), ()))
+    vt.heading("id", text="ID"); vt.column("id", width=60)
+    vt.set_rows(rows)
+    vt.selected_row()     # el dict original de la fila seleccionada
+"""
+import tkinter as tk
+from tkinter import ttk
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+Formatter = Callable[[Any, int], Tuple[Sequence[Any], Tuple[str, ...]]]
+
+_ROW_HEIGHT = 20
+
+
+class VirtualTree(ttk.Frame):
+    """
+    - formatter(row, indice) -> (values, tags): convierte una fila de datos en lo que se ve
+    - la selección se guarda como índice de datos, así sobrevive al scroll
+    - <<VirtualSelect>> se emite (en .tree) cuando cambia la fila seleccionada
+    """
+    def __init__(self, parent, columns, formatter: Formatter, height: int = 16, **tree_kw):
+        super().__init__(parent)
+        self._fmt = formatter
+        self._rows: List[Any] = []
+        self._offset = 0
+        self._visibles = max(1, height)
+        self._sel: Optional[int] = None
+        self._pintado = {}        # iid -> (values, tags) que tiene hoy en pantalla
+        self._iids: List[str] = []
+        self._sincronizando = False
+        self._on_fin = None       # callback cuando se scrollea cerca del final (carga perezosa)
+        self._margen_fin = 0
+
+        tree_kw.setdefault("show", "headings")
+        tree_kw.setdefault("selectmode", "browse")
+        self.tree = ttk.Treeview(self, columns=columns, height=height, **tree_kw)
+        self.tree.pack(side="left", fill=tk.BOTH, expand=True)
+        self.yscroll = ttk.Scrollbar(self, orient="vertical", command=self._on_scrollbar)
+        self.yscroll.pack(side="right", fill="y")
+
+        self._row_h = self._leer_row_height()
+        self.tree.bind("<Configure>", self._on_configure)
+        self.tree.bind("<<TreeviewSelect>>", self._on_tree_select)
+        self.tree.bind("<MouseWheel>", self._on_wheel)
+        self.tree.bind("<Button-4>", lambda e: self._scroll(-3))
+        self.tree.bind("<Button-5>", lambda e: self._scroll(3))
+        for key, fn in (("<Up>", lambda: self.mover(-1)), ("<Down>", lambda: self.mover(1)),
+                        ("<Prior>", lambda: self.mover(-self._visibles)),
+                        ("<Next>", lambda: self.mover(self._visibles)),
+                        ("<Home>", lambda: self.select_index(0)),
+                        ("<End>", lambda: self.select_index(len(self._rows) - 1))):
+            self.tree.bind(key, lambda e, fn=fn: (fn(), "break")[1])
+
+        self._asegurar_items()
+
+    # ---------------- passthrough al Treeview ----------------
+    def heading(self, *a, **kw):
+        return self.tree.heading(*a, **kw)
+
+    def column(self, *a, **kw):
+        return self.tree.column(*a, **kw)
+
+    def tag_configure(self, *a, **kw):
+        return self.tree.tag_configure(*a, **kw)
+
+    def focus_set(self):
+        self.tree.focus_set()
+
+    def identify_index(self, y: int) -> Optional[int]:
+        """Índice de datos de la fila bajo la coordenada y (para menús contextuales)."""
+        iid = self.tree.identify_row(y)
+        if not iid:
+            return None
+        i = self._offset + self._iids.index(iid)
+        return i if i < len(self._rows) else None
+
+    # ---------------- datos ----------------
+    def set_rows(self, rows: List[Any], keep_position: bool = False, key: Optional[Callable[[Any], Any]] = None):
+        """
+        Reemplaza las filas. Con keep_position se mantiene el scroll (recargas);
+        si se pasa key, la selección sigue a la misma fila (por ej. el ProductoID).
+        """
+        prev = self.selected_row() if key else None
+        self._rows = list(rows)
+        if not keep_position:
+            self._offset = 0
+        self._sel = None
+        if prev is not None:
+            k = key(prev)
+            for i, r in enumerate(self._rows):
+                if key(r) == k:
+                    self._sel = i
+                    break
+        if self._sel is None and self._rows and not keep_position:
+            self._sel = 0
+        self._clamp()
+        self._pintar()
+        self.tree.event_generate("<<VirtualSelect>>")
+
+    def append_rows(self, rows: List[Any]):
+        """Agrega filas al final (página siguiente) sin mover el scroll ni la selección."""
+        if not rows:
+            return
+        self._rows.extend(rows)
+        self._pintar()
+
+    def on_fin(self, callback: Optional[Callable[[], None]], margen: int = 50):
+        """callback() cuando lo visible queda a menos de `margen` filas del final."""
+        self._on_fin = callback
+        self._margen_fin = margen
+
+    def rows(self) -> List[Any]:
+        return self._rows
+
+    def __len__(self):
+        return len(self._rows)
+
+    # ---------------- selección ----------------
+    def selected_index(self) -> Optional[int]:
+        return self._sel
+
+    def selected_row(self):
+        if self._sel is None or self._sel >= len(self._rows):
+            return None
+        return self._rows[self._sel]
+
+    def select_index(self, i: int):
+        if not self._rows:
+            return
+        i = max(0, min(len(self._rows) - 1, i))
+        cambio = i != self._sel
+        self._sel = i
+        self.see(i)
+        if cambio:
+            self.tree.event_generate("<<VirtualSelect>>")
+
+    def mover(self, delta: int):
+        self.select_index((self._sel if self._sel is not None else -1 if delta > 0 else 0) + delta)
+
+    def see(self, i: int):
+        if i < self._offset:
+            self._offset = i
+        elif i >= self._offset + self._visibles:
+            self._offset = i - self._visibles + 1
+        self._clamp()
+        self._pintar()
+
+    # ---------------- render ----------------
+    def _leer_row_height(self) -> int:
+        try:
+            h = ttk.Style(self).lookup("Treeview", "rowheight")
+            return int(h) if h else _ROW_HEIGHT
+        except Exception:
+            return _ROW_HEIGHT
+
+    def _asegurar_items(self):
+        # una fila extra para que la última parcialmente visible no quede en blanco
+        need = self._visibles + 1
+        while len(self._iids) < need:
+            iid = f"v{len(self._iids)}"
+            self.tree.insert("", tk.END, iid=iid, values=())
+            self._iids.append(iid)
+            self._pintado[iid] = None
+        while len(self._iids) > need:
+            iid = self._iids.pop()
+            self.tree.delete(iid)
+            self._pintado.pop(iid, None)
+
+    def _clamp(self):
+        maximo = max(0, len(self._rows) - self._visibles)
+        self._offset = max(0, min(self._offset, maximo))
+
+    def _pintar(self):
+        """Escribe en cada item reutilizable lo que le toca; sólo toca Tk si cambió."""
+        self._sincronizando = True
+        try:
+            sel_iid = None
+            for pos, iid in enumerate(self._iids):
+                i = self._offset + pos
+                if i < len(self._rows):
+                    values, tags = self._fmt(self._rows[i], i)
+                    nuevo = (tuple(values), tuple(tags))
+                    if i == self._sel:
+                        sel_iid = iid
+                else:
+                    nuevo = ((), ("vacia",))
+                if self._pintado.get(iid) != nuevo:
+                    self.tree.item(iid, values=nuevo[0], tags=nuevo[1])
+                    self._pintado[iid] = nuevo
+            actual = self.tree.selection()
+            if sel_iid is None:
+                if actual:
+                    self.tree.selection_remove(*actual)
+            elif actual != (sel_iid,):
+                self.tree.selection_set(sel_iid)
+                self.tree.focus(sel_iid)
+            total = len(self._rows)
+            if total <= self._visibles:
+                self.yscroll.set(0.0, 1.0)
+            else:
+                self.yscroll.set(self._offset / total, (self._offset + self._visibles) / total)
+        finally:
+            self._sincronizando = False
+        if self._on_fin is not None and self._offset + self._visibles + self._margen_fin >= len(self._rows):
+            self._on_fin()
+
+    # ---------------- eventos ----------------
+    def _on_configure(self, event):
+        header = self._row_h + 4 if "headings" in str(self.tree.cget("show")) else 0
+        n = max(1, (event.height - header) // max(1, self._row_h))
+        if n != self._visibles:
+            self._visibles = n
+            self._asegurar_items()
+            self._clamp()
+            self._pintar()
+
+    def _on_tree_select(self, event):
+        if self._sincronizando:
+            return
+        sel = self.tree.selection()
+        if not sel or sel[0] not in self._iids:
+            return
+        i = self._offset + self._iids.index(sel[0])
+        if i < len(self._rows) and i != self._sel:
+            self._sel = i
+            self.tree.event_generate("<<VirtualSelect>>")
+        elif i >= len(self._rows):
+            self._pintar()      # clic en una fila vacía: se restaura la selección real
+
+    def _on_wheel(self, event):
+        self._scroll(-3 if event.delta > 0 else 3)
+        return "break"
+
+    def _scroll(self, filas: int):
+        self._offset += filas
+        self._clamp()
+        self._pintar()
+        return "break"
+
+    def _on_scrollbar(self, *args):
+        total = len(self._rows)
+        if not total:
+            return
+        if args[0] == "moveto":
+            self._offset = int(float(args[1]) * total)
+        elif args[0] == "scroll":
+            n = int(args[1])
+            self._offset += n * (self._visibles if args[2] == "pages" else 1)
+        self._clamp()
+        self._pintar()